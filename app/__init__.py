@@ -30,6 +30,9 @@ from app.routes.control_vm import control_vm_bp
 from app.routes.custom_fields import custom_fields_bp
 from app.routes.health import health_bp
 from app.routes.cache_stats import cache_stats_bp
+from app.routes.ssh_pool_stats import ssh_pool_stats_bp
+from app.routes.db_replica_stats import db_replica_stats_bp
+from app.routes.metrics import metrics_bp
 
 
 def create_app():
@@ -64,6 +67,13 @@ def create_app():
     app.register_blueprint(control_vm_bp)
     app.register_blueprint(custom_fields_bp)
     app.register_blueprint(cache_stats_bp)
+    app.register_blueprint(ssh_pool_stats_bp)
+    app.register_blueprint(db_replica_stats_bp)
+    app.register_blueprint(metrics_bp)
+
+    # 请求耗时、SQL 指标（METRICS_ENABLED）
+    from app.utils.metrics import init_metrics
+    init_metrics(app)
 
     @app.route('/')
     def index():
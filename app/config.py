@@ -5,6 +5,17 @@ import os
 class SecretConfig:
     SECRET_KEY = os.environ.get('SECRET_KEY')
 
+def _replica_binds(hosts, default_port, user, password, database, engine_options):
+    """从库 bind 配置：replica_0、replica_1 ...，账号和库名与主库相同"""
+    binds = {}
+    for index, host in enumerate(hosts):
+        address, _, port = host.partition(':')
+        binds[f'replica_{index}'] = {
+            'url': f"mysql+pymysql://{user}:{password}@{address}:{port or default_port}/{database}?charset=utf8mb4",
+            **engine_options
+        }
+    return binds
+
 class MysqlConfig:
     MYSQL_USER = os.environ.get('MYSQL_USER')
     MYSQL_DATABASE_PORT = os.environ.get('MYSQL_DATABASE_PORT')
@@ -25,6 +36,14 @@ class MysqlConfig:
         }
     }
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # 只读从库（逗号分隔的 host[:port]，端口默认与主库相同），为空时所有查询走主库
+    MYSQL_REPLICA_HOSTS = [h.strip() for h in os.environ.get('MYSQL_REPLICA_HOSTS', '').split(',') if h.strip()]
+    MYSQL_REPLICA_MAX_LAG = int(os.environ.get('MYSQL_REPLICA_MAX_LAG', 5))                       # 复制延迟超过该秒数的从库暂不使用
+    MYSQL_REPLICA_LAG_CHECK_INTERVAL = int(os.environ.get('MYSQL_REPLICA_LAG_CHECK_INTERVAL', 10))  # 复制延迟检查间隔：10秒
+    MYSQL_REPLICA_STICKY_SECONDS = int(os.environ.get('MYSQL_REPLICA_STICKY_SECONDS', 10))          # 用户写入后该秒数内的查询都走主库（读己之写）
+    SQLALCHEMY_BINDS = _replica_binds(
+        MYSQL_REPLICA_HOSTS, MYSQL_DATABASE_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DATABASE, SQLALCHEMY_ENGINE_OPTIONS
+    )
 
 class RedisConfig:
     REDIS_HOST = os.environ.get('REDIS_HOST', 'localhost')
@@ -40,3 +59,86 @@ class RedisConfig:
     
     # 延迟双删配置
     DELAYED_DELETE_SECONDS = float(os.environ.get('DELAYED_DELETE_SECONDS', 0.5))  # 默认延迟删除间隔：0.5秒
+
+    # 自定义字段定义进程内缓存（按 Valkey 版本号失效）
+    CUSTOM_FIELD_SCHEMA_FALLBACK_TTL = int(os.environ.get('CUSTOM_FIELD_SCHEMA_FALLBACK_TTL', 30))  # Valkey不可用时快照重新加载间隔：30秒
+
+    # 仪表盘增量计数（Valkey 哈希 counters:hosts / counters:vms）
+    STATS_COUNTERS_ENABLED = os.environ.get('STATS_COUNTERS_ENABLED', 'false').lower() in ('1', 'true', 'yes')  # 是否使用增量计数代替聚合查询
+    STATS_RECONCILE_INTERVAL = int(os.environ.get('STATS_RECONCILE_INTERVAL', 600))                            # 计数与数据库对账间隔：10分钟
+
+    # 进程内本地缓存（dict: / host: / vm: 键，pub/sub 失效）
+    LOCAL_CACHE_ENABLED = os.environ.get('LOCAL_CACHE_ENABLED', 'false').lower() in ('1', 'true', 'yes')  # 是否在每个 worker 内存中缓存热点对象
+    LOCAL_CACHE_MAX_ENTRIES = int(os.environ.get('LOCAL_CACHE_MAX_ENTRIES', 10000))                        # 每个 worker 最多缓存的条目数
+    LOCAL_CACHE_TTL = int(os.environ.get('LOCAL_CACHE_TTL', 10))                                           # 本地条目过期时间：10秒
+    LOCAL_CACHE_CHANNEL = os.environ.get('LOCAL_CACHE_CHANNEL', 'cache:invalidate')                        # 失效消息频道
+
+class SSHConfig:
+    # SSH 连接池配置（每个 worker 进程独立的连接池）
+    SSH_POOL_ENABLED = os.environ.get('SSH_POOL_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    SSH_POOL_MAX_CONNECTIONS_PER_HOST = int(os.environ.get('SSH_POOL_MAX_CONNECTIONS_PER_HOST', 2))  # 每个宿主机最多保持的连接数
+    SSH_POOL_MAX_CHANNELS = int(os.environ.get('SSH_POOL_MAX_CHANNELS', 8))                          # 每个连接同时打开的channel上限（需小于sshd MaxSessions）
+    SSH_POOL_IDLE_TIMEOUT = int(os.environ.get('SSH_POOL_IDLE_TIMEOUT', 300))                        # 空闲连接淘汰时间：5分钟
+    SSH_POOL_MAX_LIFETIME = int(os.environ.get('SSH_POOL_MAX_LIFETIME', 3600))                       # 连接最大存活时间：1小时
+    SSH_POOL_KEEPALIVE = int(os.environ.get('SSH_POOL_KEEPALIVE', 30))                               # keepalive间隔：30秒（0为关闭）
+    SSH_POOL_HEALTH_CHECK_INTERVAL = int(os.environ.get('SSH_POOL_HEALTH_CHECK_INTERVAL', 60))       # 复用前健康检查间隔：60秒
+
+class SyncConfig:
+    # VM 状态同步配置
+    SYNC_KVM_BATCH = os.environ.get('SYNC_KVM_BATCH', 'true').lower() in ('1', 'true', 'yes')  # KVM宿主机一次 virsh list --all 获取全部状态
+    SYNC_ENGINE = os.environ.get('SYNC_ENGINE', 'thread').lower()                       # 采集引擎：thread（线程池）/ asyncio（事件循环）
+    SYNC_ASYNC_CONCURRENCY = int(os.environ.get('SYNC_ASYNC_CONCURRENCY', 100))          # asyncio引擎同时连接的宿主机上限
+    SYNC_HOST_TIMEOUT = int(os.environ.get('SYNC_HOST_TIMEOUT', 30))                     # 单台宿主机采集超时：30秒
+    SYNC_TOTAL_TIMEOUT = int(os.environ.get('SYNC_TOTAL_TIMEOUT', 0))                    # 整次采集超时（0为不限制），超时后取消剩余宿主机
+    SYNC_UPDATE_CHUNK_SIZE = int(os.environ.get('SYNC_UPDATE_CHUNK_SIZE', 1000))          # 状态批量写回时每条 UPDATE 的 id 数量上限
+
+    # 后台同步调度器配置
+    SYNC_SCHEDULER_ENABLED = os.environ.get('SYNC_SCHEDULER_ENABLED', 'false').lower() in ('1', 'true', 'yes')  # 是否随 gunicorn worker 启动后台调度器
+    SYNC_SCHEDULER_TICK = int(os.environ.get('SYNC_SCHEDULER_TICK', 10))                       # 调度循环间隔：10秒
+    SYNC_SCHEDULER_MIN_INTERVAL = int(os.environ.get('SYNC_SCHEDULER_MIN_INTERVAL', 60))       # 状态变化/失败宿主机的轮询间隔：1分钟
+    SYNC_SCHEDULER_MAX_INTERVAL = int(os.environ.get('SYNC_SCHEDULER_MAX_INTERVAL', 900))      # 稳定宿主机的最长轮询间隔：15分钟
+    SYNC_SCHEDULER_BACKOFF = float(os.environ.get('SYNC_SCHEDULER_BACKOFF', 2.0))              # 稳定宿主机轮询间隔的增长倍数
+    SYNC_SCHEDULER_LOCK_TTL = int(os.environ.get('SYNC_SCHEDULER_LOCK_TTL', 30))               # leader 锁过期时间：30秒
+    SYNC_SCHEDULER_MAX_HOSTS_PER_RUN = int(os.environ.get('SYNC_SCHEDULER_MAX_HOSTS_PER_RUN', 500))  # 单轮最多同步的宿主机数量
+
+    # 同步任务配置
+    SYNC_JOB_WORKERS = int(os.environ.get('SYNC_JOB_WORKERS', 2))                    # 每个进程执行同步任务的线程数
+    SYNC_JOB_TTL = int(os.environ.get('SYNC_JOB_TTL', 24 * 60 * 60))                # 任务进度保留时间：24小时
+    SYNC_JOB_LOCK_TTL = int(os.environ.get('SYNC_JOB_LOCK_TTL', 600))               # scope 锁过期时间：10分钟（每完成一台宿主机续期）
+    SYNC_JOB_STREAM_INTERVAL = float(os.environ.get('SYNC_JOB_STREAM_INTERVAL', 1.0))  # SSE 推送进度的轮询间隔：1秒
+    SYNC_JOB_STREAM_TIMEOUT = int(os.environ.get('SYNC_JOB_STREAM_TIMEOUT', 45))    # 单个 SSE 连接最长保持时间：45秒，必须小于 gunicorn timeout（60秒），到期后客户端带 offset 重连
+
+class CustomFieldConfig:
+    # 自定义字段宽表（读模型）配置
+    CUSTOM_FIELD_PROJECTION_ENABLED = os.environ.get('CUSTOM_FIELD_PROJECTION_ENABLED', 'false').lower() in ('1', 'true', 'yes')  # 列表按自定义字段过滤/排序时使用宽表
+    CUSTOM_FIELD_PROJECTION_CHUNK_SIZE = int(os.environ.get('CUSTOM_FIELD_PROJECTION_CHUNK_SIZE', 1000))  # 增量同步时每条语句的资源ID数量上限
+
+class ListConfig:
+    # 列表分页与导出配置
+    LIST_EXACT_COUNT_THRESHOLD = int(os.environ.get('LIST_EXACT_COUNT_THRESHOLD', 100000))  # 游标分页无过滤条件时，估算行数低于该值才精确 COUNT(*)
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))                      # CSV 导出时服务端游标每批读取的行数
+    SEARCH_INDEX_ENABLED = os.environ.get('SEARCH_INDEX_ENABLED', 'false').lower() in ('1', 'true', 'yes')  # 宿主机/VM 列表搜索是否使用 FULLTEXT 搜索索引
+    SEARCH_INDEX_MIN_TERM_LENGTH = int(os.environ.get('SEARCH_INDEX_MIN_TERM_LENGTH', 2))     # 使用索引的最短关键字长度，与 MySQL ngram_token_size 一致
+    SEARCH_INDEX_CHUNK_SIZE = int(os.environ.get('SEARCH_INDEX_CHUNK_SIZE', 1000))           # 搜索文档同步/重建时每批处理的资源数量
+
+class ImportConfig:
+    # CSV 批量导入配置
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 500))              # 每条多行 INSERT 的行数
+    IMPORT_ASYNC_THRESHOLD = int(os.environ.get('IMPORT_ASYNC_THRESHOLD', 1000))    # 超过该行数时转为后台任务执行
+    IMPORT_JOB_WORKERS = int(os.environ.get('IMPORT_JOB_WORKERS', 1))               # 每个进程执行导入任务的线程数
+    IMPORT_JOB_TTL = int(os.environ.get('IMPORT_JOB_TTL', 24 * 60 * 60))            # 任务进度保留时间：24小时
+
+class LogConfig:
+    # 变更日志异步批量写入配置
+    CHANGE_LOG_ASYNC = os.environ.get('CHANGE_LOG_ASYNC', 'true').lower() in ('1', 'true', 'yes')  # 是否由后台线程批量写入变更日志
+    CHANGE_LOG_QUEUE_SIZE = int(os.environ.get('CHANGE_LOG_QUEUE_SIZE', 10000))              # 进程内队列容量
+    CHANGE_LOG_BATCH_SIZE = int(os.environ.get('CHANGE_LOG_BATCH_SIZE', 200))                # 每条多行 INSERT 的最大行数
+    CHANGE_LOG_FLUSH_INTERVAL = float(os.environ.get('CHANGE_LOG_FLUSH_INTERVAL', 1.0))      # 攒批最长等待时间：1秒
+    CHANGE_LOG_ENQUEUE_TIMEOUT = float(os.environ.get('CHANGE_LOG_ENQUEUE_TIMEOUT', 0.5))    # 队列满时等待时间，超时后调用方同步写入
+    CHANGE_LOG_SHUTDOWN_TIMEOUT = float(os.environ.get('CHANGE_LOG_SHUTDOWN_TIMEOUT', 10))   # worker 退出时等待写完剩余日志的时间
+
+class MetricsConfig:
+    # Prometheus 指标（各 worker 的数据汇总到 Valkey）
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'false').lower() in ('1', 'true', 'yes')  # 是否记录指标并开放 /metrics
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))      # 进程内增量写入 Valkey 的间隔：5秒
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')                               # /metrics 的 Bearer 令牌，为空时不校验
@@ -65,7 +65,7 @@ def get_sqlalchemy_type_string(column):
         return "BIGINT"
     
     elif isinstance(col_type, Integer):
-        return "INT"
+        return "INT UNSIGNED" if getattr(col_type, 'unsigned', False) else "INT"
     
     elif isinstance(col_type, SmallInteger):
         return "SMALLINT"
@@ -124,6 +124,15 @@ def get_column_definition_sql(column, is_primary=False):
     type_str = get_sqlalchemy_type_string(column)
     parts = [f"`{column.name}`", type_str]
     
+    # 生成列：GENERATED ALWAYS AS (表达式) VIRTUAL / STORED，不能有默认值
+    if column.computed is not None:
+        parts.append(f"GENERATED ALWAYS AS ({column.computed.sqltext}) {'STORED' if column.computed.persisted else 'VIRTUAL'}")
+        parts.append("NULL" if column.nullable else "NOT NULL")
+        if column.comment:
+            comment = column.comment.replace("'", "\\'")
+            parts.append(f"COMMENT '{comment}'")
+        return " ".join(parts)
+    
     if is_primary:
         parts.append("NOT NULL AUTO_INCREMENT")
     else:
@@ -235,7 +244,11 @@ def create_table_from_model(connection, model_class):
         if column.unique and column.name not in pk_names:
             constraints.append(f"UNIQUE KEY `unique_{column.name}` (`{column.name}`)")
     
-    # 4. 合并所有部分，统一用逗号连接
+    # 4. 处理 __table_args__ 中声明的普通索引和联合索引
+    for index_name, index_def in get_model_indexes(model_class).items():
+        constraints.append(get_index_definition_sql(index_name, index_def))
+    
+    # 5. 合并所有部分，统一用逗号连接
     all_parts = columns + constraints
     
     create_sql = f"""
@@ -260,6 +273,108 @@ def get_existing_unique_keys(connection, table_name):
     return {row['INDEX_NAME'] for row in cursor.fetchall()}
 
 
+def get_model_indexes(model_class):
+    """获取模型 __table_args__ 中声明的索引：{索引名: {'columns': [列名], 'unique': bool}}"""
+    indexes = {}
+    for index in model_class.__table__.indexes:
+        indexes[index.name] = {
+            'columns': [col.name for col in index.columns],
+            'unique': bool(index.unique)
+        }
+    return indexes
+
+
+def get_existing_indexes(connection, table_name):
+    """获取表中已存在的索引（不含主键）：{索引名: {'columns': [列名], 'unique': bool}}"""
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT INDEX_NAME, COLUMN_NAME, NON_UNIQUE
+        FROM information_schema.STATISTICS 
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND INDEX_NAME != 'PRIMARY'
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+    """, (DB_NAME, table_name))
+    indexes = {}
+    for row in cursor.fetchall():
+        index = indexes.setdefault(row['INDEX_NAME'], {'columns': [], 'unique': int(row['NON_UNIQUE']) == 0})
+        index['columns'].append(row['COLUMN_NAME'])
+    return indexes
+
+
+def get_index_definition_sql(index_name, index_def):
+    kind = "UNIQUE KEY" if index_def['unique'] else "KEY"
+    return f"{kind} `{index_name}` (`{'`, `'.join(index_def['columns'])}`)"
+
+
+# 添加唯一索引前清理重复数据的语句：{(表名, 索引名): SQL}
+# custom_field_values 早期没有唯一约束，同一字段+资源可能有多条值，只保留最新（ID最大）的一条
+UNIQUE_INDEX_DEDUPLICATE_SQL = {
+    ('custom_field_values', 'idx_cfv_field_id_resource_id'): """
+        DELETE older
+        FROM `custom_field_values` older
+        JOIN `custom_field_values` newer
+          ON newer.field_id = older.field_id
+         AND newer.resource_id = older.resource_id
+         AND newer.id > older.id
+    """
+}
+
+
+def check_and_alter_indexes(connection, model_class):
+    """
+    按模型声明创建或修改索引（幂等）：
+    - 索引不存在且没有列完全相同的索引时创建
+    - 同名索引的列或唯一性不一致时删除后重建
+    - 不删除模型中未声明的索引（外键或手工创建的索引）
+    """
+    table_name = model_class.__tablename__
+    existing_indexes = get_existing_indexes(connection, table_name)
+    
+    for index_name, index_def in get_model_indexes(model_class).items():
+        current = existing_indexes.get(index_name)
+        if current == index_def:
+            continue
+        
+        if current is None:
+            equivalent = next((name for name, d in existing_indexes.items() if d == index_def), None)
+            if equivalent:
+                logger.info(f"[INFO] Index [{index_name}] on [{table_name}] already covered by [{equivalent}]. Skipping...")
+                continue
+        
+        if index_def['unique']:
+            columns_sql = '`, `'.join(index_def['columns'])
+            cursor = connection.cursor()
+            cursor.execute(f"""
+                SELECT COUNT(*) AS count
+                FROM `{table_name}`
+                GROUP BY `{columns_sql}`
+                HAVING COUNT(*) > 1
+                LIMIT 1
+            """)
+            has_duplicates = cursor.fetchone() is not None
+            deduplicate_sql = UNIQUE_INDEX_DEDUPLICATE_SQL.get((table_name, index_name))
+            if has_duplicates and deduplicate_sql:
+                cursor.execute(deduplicate_sql)
+                connection.commit()
+                logger.warning(f"[ALTER] Removed {cursor.rowcount} duplicate rows from [{table_name}] before adding unique index [{index_name}].")
+                has_duplicates = False
+            if has_duplicates:
+                logger.warning(f"[ALTER] Cannot add unique index [{index_name}] to [{table_name}] because there are duplicate values.")
+                continue
+        
+        clauses = []
+        if current is not None:
+            clauses.append(f"DROP INDEX `{index_name}`")
+        clauses.append(f"ADD {get_index_definition_sql(index_name, index_def)}")
+        
+        cursor = connection.cursor()
+        cursor.execute(f"ALTER TABLE `{table_name}` {', '.join(clauses)}")
+        connection.commit()
+        if current is None:
+            logger.info(f"[ALTER] Missing index [{index_name}] in [{table_name}]. Adding now...")
+        else:
+            logger.info(f"[ALTER] Index definition mismatch for [{index_name}] in [{table_name}]. Rebuilding...")
+
+
 def check_and_alter_table(connection, model_class):
     table_name = model_class.__tablename__
     inspector = inspect(model_class)
@@ -357,6 +472,9 @@ def check_and_alter_table(connection, model_class):
                     cursor.execute(alter_sql)
                     connection.commit()
                     logger.info(f"[ALTER] Missing unique constraint [{index_name}] in [{table_name}]. Adding now...")
+    
+    # 检查并添加缺失的普通索引和联合索引
+    check_and_alter_indexes(connection, model_class)
 
 
 def table_exists(connection, table_name):
@@ -1,11 +1,13 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.dialects.mysql import ENUM, JSON
+from sqlalchemy.dialects.mysql import ENUM, JSON, INTEGER
 from sqlalchemy import func
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from datetime import datetime
+from app.utils.db_router import RoutingSession
 
-db = SQLAlchemy()
+# 列表、导出、仪表盘等只读路径的查询可路由到从库（见 app/utils/db_router.py）
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model, UserMixin):
     __tablename__ = 'users'
@@ -41,6 +43,10 @@ class User(db.Model, UserMixin):
 
 class Host(db.Model):
     __tablename__ = 'hosts'
+    __table_args__ = (
+        # 按 IP 排序、按网段 / 范围过滤
+        db.Index('idx_hosts_host_ip_num', 'host_ip_num'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True, comment='主机 id,自增主键')
     host_ipaddress = db.Column(db.String(255), unique=True, nullable=False, comment='主机 IP 地址，唯一标识')
@@ -52,13 +58,15 @@ class Host(db.Model):
     created_at = db.Column(db.DateTime, nullable=False, server_default=func.current_timestamp(), comment='创建时间')
     updated_at = db.Column(db.DateTime, nullable=False, server_default=func.current_timestamp(), onupdate=func.current_timestamp(), comment='更新时间,自动维护')
     vm_count = db.Column(db.Integer, nullable=False, server_default='0', comment='宿主机关联的VM数量')
+    host_ip_num = db.Column(INTEGER(unsigned=True), db.Computed('INET_ATON(`host_ipaddress`)', persisted=False), nullable=True, comment='host_ipaddress 的数值形式(生成列)')
 
     # 关系：一个主机包含多个VM
     vms = db.relationship('VM', back_populates='host', cascade='all, delete-orphan')
 
     def __getitem__(self, key):
         """支持通过字典访问方式获取自定义字段值（重构后适配新表结构）"""
-        from app.models import CustomField, CustomFieldValue
+        from app.models import CustomFieldValue
+        from app.utils.custom_field_schema import get_schema
         
         # 先尝试获取原生字段
         try:
@@ -66,27 +74,20 @@ class Host(db.Model):
         except AttributeError:
             pass
         
-        # 查找自定义字段 - 先尝试用 id 查找，再尝试用 field_name 查找
-        field = None
+        # 查找自定义字段 - 先尝试用 id 查找，再尝试用 field_name 查找（字段定义读取进程内缓存）
+        schema = get_schema()
         try:
-            field_id = int(key)
-            field = CustomField.query.filter_by(
-                resource_type='host',
-                id=field_id
-            ).first()
+            field = schema.get_field(int(key), resource_type='host')
         except ValueError:
             # 如果不是数字，尝试用 field_name 查找
-            field = CustomField.query.filter_by(
-                resource_type='host',
-                field_name=key
-            ).first()
+            field = schema.get_field_by_name('host', key)
         
         if not field:
             raise KeyError(key)
         
         # 查询对应资源的字段值
         field_value = CustomFieldValue.query.filter_by(
-            field_id=field.id,
+            field_id=field['id'],
             resource_id=self.id
         ).first()
         
@@ -94,19 +95,15 @@ class Host(db.Model):
             return None
         
         # 按字段类型返回对应值
-        if field.field_type == 'int':
+        if field['field_type'] == 'int':
             return field_value.int_value
-        elif field.field_type == 'varchar':
+        elif field['field_type'] == 'varchar':
             return field_value.varchar_value
-        elif field.field_type == 'datetime':
+        elif field['field_type'] == 'datetime':
             return field_value.datetime_value
-        elif field.field_type == 'enum':
-            from app.models import CustomFieldEnumOption
-            enum_opt = CustomFieldEnumOption.query.filter_by(
-                field_id=field.id,
-                option_key=field_value.enum_value
-            ).first()
-            return enum_opt.option_label if enum_opt else field_value.enum_value
+        elif field['field_type'] == 'enum':
+            label = schema.get_option_label(field['id'], field_value.enum_value)
+            return label if label is not None else field_value.enum_value
         
         return None
 
@@ -115,6 +112,12 @@ class Host(db.Model):
 
 class VM(db.Model):
     __tablename__ = 'vms'
+    __table_args__ = (
+        # 按宿主机查询VM、状态同步、按宿主机+状态统计
+        db.Index('idx_vms_host_id_status', 'host_id', 'status'),
+        # 按 IP 排序、按网段 / 范围过滤
+        db.Index('idx_vms_vm_ip_num', 'vm_ip_num'),
+    )
 
     id = db.Column(db.BigInteger, primary_key=True, autoincrement=True, comment='虚拟机id,自增主键')
     vm_ip = db.Column(db.String(15), unique=True, nullable=False, comment='虚拟机IP地址')
@@ -128,13 +131,15 @@ class VM(db.Model):
     status = db.Column(ENUM('running', 'stopped', 'unknown', name='vm_status_enum'), nullable=False, server_default='unknown', comment='虚拟机状态')
     created_at = db.Column(db.DateTime, nullable=False, server_default=func.current_timestamp(), comment='创建时间')
     updated_at = db.Column(db.DateTime, nullable=False, server_default=func.current_timestamp(), onupdate=func.current_timestamp(), comment='更新时间,自动维护')
+    vm_ip_num = db.Column(INTEGER(unsigned=True), db.Computed('INET_ATON(`vm_ip`)', persisted=False), nullable=True, comment='vm_ip 的数值形式(生成列)')
 
     # 关系：VM属于一个主机
     host = db.relationship('Host', back_populates='vms')
 
     def __getitem__(self, key):
         """支持通过字典访问方式获取自定义字段值（重构后适配新表结构）"""
-        from app.models import CustomField, CustomFieldValue
+        from app.models import CustomFieldValue
+        from app.utils.custom_field_schema import get_schema
         
         # 先尝试获取原生字段
         try:
@@ -142,27 +147,20 @@ class VM(db.Model):
         except AttributeError:
             pass
         
-        # 查找自定义字段 - 先尝试用 id 查找，再尝试用 field_name 查找
-        field = None
+        # 查找自定义字段 - 先尝试用 id 查找，再尝试用 field_name 查找（字段定义读取进程内缓存）
+        schema = get_schema()
         try:
-            field_id = int(key)
-            field = CustomField.query.filter_by(
-                resource_type='vm',
-                id=field_id
-            ).first()
+            field = schema.get_field(int(key), resource_type='vm')
         except ValueError:
             # 如果不是数字，尝试用 field_name 查找
-            field = CustomField.query.filter_by(
-                resource_type='vm',
-                field_name=key
-            ).first()
+            field = schema.get_field_by_name('vm', key)
         
         if not field:
             raise KeyError(key)
         
         # 查询对应资源的字段值
         field_value = CustomFieldValue.query.filter_by(
-            field_id=field.id,
+            field_id=field['id'],
             resource_id=self.id
         ).first()
         
@@ -170,19 +168,15 @@ class VM(db.Model):
             return None
         
         # 按字段类型返回对应值
-        if field.field_type == 'int':
+        if field['field_type'] == 'int':
             return field_value.int_value
-        elif field.field_type == 'varchar':
+        elif field['field_type'] == 'varchar':
             return field_value.varchar_value
-        elif field.field_type == 'datetime':
+        elif field['field_type'] == 'datetime':
             return field_value.datetime_value
-        elif field.field_type == 'enum':
-            from app.models import CustomFieldEnumOption
-            enum_opt = CustomFieldEnumOption.query.filter_by(
-                field_id=field.id,
-                option_key=field_value.enum_value
-            ).first()
-            return enum_opt.option_label if enum_opt else field_value.enum_value
+        elif field['field_type'] == 'enum':
+            label = schema.get_option_label(field['id'], field_value.enum_value)
+            return label if label is not None else field_value.enum_value
         
         return None
 
@@ -191,6 +185,10 @@ class VM(db.Model):
 
 class ChangeLog(db.Model):
     __tablename__ = 'change_logs'
+    __table_args__ = (
+        # 变更日志按时间排序/筛选
+        db.Index('idx_change_logs_time', 'time'),
+    )
 
     id = db.Column(db.BigInteger, primary_key=True, autoincrement=True, comment='日志ID,自增主键')
     time = db.Column(db.DateTime, nullable=False, server_default=func.current_timestamp(), comment='操作时间')
@@ -206,6 +204,12 @@ class ChangeLog(db.Model):
 
 class OperationLog(db.Model):
     __tablename__ = 'operation_logs'
+    __table_args__ = (
+        # 仪表盘最近操作、按用户/按VM查询操作记录
+        db.Index('idx_operation_logs_time', 'time'),
+        db.Index('idx_operation_logs_username_time', 'username', 'time'),
+        db.Index('idx_operation_logs_vm_ip_time', 'vm_ip', 'time'),
+    )
 
     id = db.Column(db.BigInteger, primary_key=True, autoincrement=True, comment='日志ID,自增主键')
     time = db.Column(db.DateTime, nullable=False, server_default=func.current_timestamp(), comment='操作时间')
@@ -269,7 +273,13 @@ class CustomFieldEnumOption(db.Model):
 
 class CustomFieldValue(db.Model):
     __tablename__ = 'custom_field_values'
-    __table_args__ = {'comment': '自定义字段值表'}
+    __table_args__ = (
+        # 按字段+资源查找单个值、按资源批量加载所有字段值
+        # 每个资源的每个字段只有一个值，批量编辑按此唯一键 INSERT ... ON DUPLICATE KEY UPDATE
+        db.Index('idx_cfv_field_id_resource_id', 'field_id', 'resource_id', unique=True),
+        db.Index('idx_cfv_resource_type_resource_id', 'resource_type', 'resource_id'),
+        {'comment': '自定义字段值表'}
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True, comment='值记录唯一主键ID')
     field_id = db.Column(db.Integer, db.ForeignKey('custom_fields.id', ondelete='CASCADE'), nullable=False, comment='关联的字段ID（级联删除）')
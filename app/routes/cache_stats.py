@@ -11,7 +11,9 @@
 
 from flask import Blueprint, jsonify
 from flask_login import login_required
+from app.config import MetricsConfig
 from app.utils.cache_manager import CacheService
+from app.utils.metrics import get_cache_namespace_totals
 
 cache_stats_bp = Blueprint('cache_stats', __name__, url_prefix='/api/cache')
 
@@ -27,12 +29,23 @@ def get_cache_stat():
         "cache_hit_total": 1234,
         "cache_miss_total": 456,
         "cache_hit_rate": "73.02%",
-        "cache_key_count": 789
+        "cache_key_count": 789,
+        "cache_keys_with_ttl": 700,
+        "cache_namespace_key_count": {"stats": 3, ...},
+        "cache_namespace_requests": {"vm": {"hits": 1000, "misses": 200}, ...}
     }
+    
+    命中数 / 命中率为响应请求的 worker 进程内的统计；
+    启用 METRICS_ENABLED 时 cache_namespace_requests 为所有 worker 汇总的按命名空间统计
+    键数量来自 DBSIZE / INFO keyspace 和命名空间登记集合，不遍历键空间
     """
     cache = CacheService()
     stats = cache.get_stats()
     stats['cache_key_count'] = cache.get_key_count()
+    stats['cache_keys_with_ttl'] = cache.get_keyspace_info().get('expires', 0)
+    stats['cache_namespace_key_count'] = cache.get_namespace_counts()
+    if MetricsConfig.METRICS_ENABLED:
+        stats['cache_namespace_requests'] = get_cache_namespace_totals()
     
     return jsonify({
         'success': True,
@@ -81,10 +81,13 @@ def get_vm_status_from_host(vm):
         return 'unknown', None, str(e)
 
 
-def get_vm_info_cached(vm):
-    """获取 VM 信息，优先从缓存读取（与 vms 路由共享同一份缓存），缓存未命中则通过 SSH 查询并更新缓存"""
+def get_vm_info_cached(vm, refresh=False):
+    """
+    获取 VM 信息，优先从缓存读取（与 vms 路由共享同一份缓存），缓存未命中则通过 SSH 查询并更新缓存
+    refresh=True 时跳过缓存读取，直接通过 SSH 查询
+    """
     # 使用与 vms 路由完全相同的缓存格式：键为 vm:{id}，值为序列化的 SQLAlchemy 对象
-    cached_vm_data = get_vm(vm.id)
+    cached_vm_data = None if refresh else get_vm(vm.id)
     
     if cached_vm_data is not None:
         current_app.logger.debug(f"[CACHE] HIT key=vm:{vm.id}")
@@ -186,6 +189,8 @@ def power_control():
 @login_required
 def get_status():
     ip = request.args.get('ip')
+    # refresh=1：不读缓存，直接查询宿主机
+    refresh = request.args.get('refresh') == '1'
     if not ip:
         return jsonify({'status': 'error', 'message': 'IP parameter is required'})
 
@@ -203,7 +208,7 @@ def get_status():
 
     try:
         # 使用缓存获取 VM 信息
-        status, identifier, err, vm_info = get_vm_info_cached(vm)
+        status, identifier, err, vm_info = get_vm_info_cached(vm, refresh=refresh)
         if err:
             details = err
             current_app.logger.warning(f"Status query with cache error: VM_IP={ip}, error={details}")
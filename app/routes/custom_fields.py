@@ -3,6 +3,8 @@ from flask_login import login_required, current_user
 from app.models import db, CustomField, CustomFieldEnumOption, CustomFieldValue
 from app.services.permission_service import admin_required
 from app.services.log_service import log_change, to_dict
+from app.utils.custom_field_schema import get_schema, bump_schema_version
+from app.services.custom_field_projection import sync_projection_schema
 from datetime import datetime
 
 custom_fields_bp = Blueprint('custom_fields', __name__, url_prefix='/')
@@ -43,11 +45,8 @@ def validate_field_type(field_type):
 
 
 def get_custom_fields(resource_type):
-    """获取指定资源类型的有效自定义字段"""
-    fields = CustomField.query.filter_by(
-        resource_type=resource_type
-    ).order_by(CustomField.sort).all()
-    return [field_to_dict(field) for field in fields]
+    """获取指定资源类型的有效自定义字段（读取进程内字段定义缓存）"""
+    return get_schema().get_fields(resource_type)
 
 
 # 宿主机自定义字段接口
@@ -137,6 +136,8 @@ def create_host_custom_field():
                     db.session.add(enum_opt)
         
         db.session.commit()
+        sync_projection_schema('host')
+        bump_schema_version()
         
         log_change('created', 'host', field_name, detail_obj=to_dict(new_field))
         
@@ -228,6 +229,8 @@ def update_host_custom_field(field_id):
                 db.session.delete(remaining_opt)
         
         db.session.commit()
+        sync_projection_schema('host')
+        bump_schema_version()
         
         log_change('update', 'host', field.field_name, detail_obj={'old': old_data, 'new': to_dict(field)})
         
@@ -268,6 +271,8 @@ def delete_host_custom_field(field_id):
         # 物理删除字段（级联删除会自动删除关联的枚举选项和值）
         db.session.delete(field)
         db.session.commit()
+        sync_projection_schema('host')
+        bump_schema_version()
         
         log_change('delete', 'host', field.field_name, detail_obj=old_data)
         
@@ -371,6 +376,8 @@ def create_vm_custom_field():
                     db.session.add(enum_opt)
         
         db.session.commit()
+        sync_projection_schema('vm')
+        bump_schema_version()
         
         log_change('create', 'vm', field_name, detail_obj=to_dict(new_field))
         
@@ -462,6 +469,8 @@ def update_vm_custom_field(field_id):
                 db.session.delete(remaining_opt)
         
         db.session.commit()
+        sync_projection_schema('vm')
+        bump_schema_version()
         
         log_change('update', 'vm', field.field_name, detail_obj={'old': old_data, 'new': to_dict(field)})
         
@@ -502,6 +511,8 @@ def delete_vm_custom_field(field_id):
         # 物理删除字段（级联删除会自动删除关联的枚举选项和值）
         db.session.delete(field)
         db.session.commit()
+        sync_projection_schema('vm')
+        bump_schema_version()
         
         log_change('delete', 'vm', field.field_name, detail_obj=old_data)
         
@@ -528,20 +539,21 @@ def get_host_custom_field_values(resource_id):
             resource_id=resource_id
         ).all()
         
+        schema = get_schema()
         result = {}
         for val in values:
-            field = val.field
+            field = schema.get_field(val.field_id)
             if not field:
                 continue
             
-            if field.field_type == 'int':
-                result[str(field.id)] = val.int_value
-            elif field.field_type == 'varchar':
-                result[str(field.id)] = val.varchar_value
-            elif field.field_type == 'datetime':
-                result[str(field.id)] = val.datetime_value.isoformat() if val.datetime_value else None
-            elif field.field_type == 'enum':
-                result[str(field.id)] = val.enum_value
+            if field['field_type'] == 'int':
+                result[str(val.field_id)] = val.int_value
+            elif field['field_type'] == 'varchar':
+                result[str(val.field_id)] = val.varchar_value
+            elif field['field_type'] == 'datetime':
+                result[str(val.field_id)] = val.datetime_value.isoformat() if val.datetime_value else None
+            elif field['field_type'] == 'enum':
+                result[str(val.field_id)] = val.enum_value
         
         return jsonify({
             'success': True,
@@ -565,20 +577,21 @@ def get_vm_custom_field_values(resource_id):
             resource_id=resource_id
         ).all()
         
+        schema = get_schema()
         result = {}
         for val in values:
-            field = val.field
+            field = schema.get_field(val.field_id)
             if not field:
                 continue
             
-            if field.field_type == 'int':
-                result[str(field.id)] = val.int_value
-            elif field.field_type == 'varchar':
-                result[str(field.id)] = val.varchar_value
-            elif field.field_type == 'datetime':
-                result[str(field.id)] = val.datetime_value.isoformat() if val.datetime_value else None
-            elif field.field_type == 'enum':
-                result[str(field.id)] = val.enum_value
+            if field['field_type'] == 'int':
+                result[str(val.field_id)] = val.int_value
+            elif field['field_type'] == 'varchar':
+                result[str(val.field_id)] = val.varchar_value
+            elif field['field_type'] == 'datetime':
+                result[str(val.field_id)] = val.datetime_value.isoformat() if val.datetime_value else None
+            elif field['field_type'] == 'enum':
+                result[str(val.field_id)] = val.enum_value
         
         return jsonify({
             'success': True,
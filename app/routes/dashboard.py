@@ -2,44 +2,18 @@
 
 from flask import Blueprint, render_template, jsonify
 from flask_login import login_required, current_user
-from app.models import Host, VM, OperationLog, db
+from app.models import VM, OperationLog, db
 from app.services.permission_service import role_required
 from sqlalchemy import func
 from types import SimpleNamespace
 from sqlalchemy.orm import joinedload
-from app.utils.cache_manager import get_stats_data, set_stats_data, CacheTTL
+from app.services.dashboard_stats_service import get_dashboard_stats
 
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/')
 
 
 
 
-def get_dashboard_stats():
-    """
-    获取仪表盘统计数据（带缓存）
-    使用L3层缓存：大盘统计数据缓存（TTL=60秒）
-    """
-    # 尝试从缓存获取
-    cached_stats = get_stats_data('dashboard')
-    if cached_stats is not None:
-        return cached_stats
-    
-    # 缓存未命中，从数据库查询
-    stats = {
-        'total_hosts': Host.query.count(),
-        'running_hosts': Host.query.filter_by(status='running').count(),
-        'stopped_hosts': Host.query.filter_by(status='stopped').count(),
-        'total_vms': VM.query.count(),
-        'running_vms': VM.query.filter_by(status='running').count(),
-        'stopped_vms': VM.query.filter_by(status='stopped').count()
-    }
-    
-    # 写入缓存（1分钟过期）
-    set_stats_data('dashboard', stats, ttl=CacheTTL.STATS)
-    
-    return stats
-
-
 @dashboard_bp.route('/dashboard/', methods=['GET'])
 @login_required
 def index():
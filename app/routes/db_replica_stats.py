@@ -0,0 +1,37 @@
+"""
+数据库从库状态接口
+
+提供当前 worker 进程内的从库路由情况和各从库的复制延迟，用于监控读写分离
+
+接口列表：
+- GET /api/db/replicas/stat - 获取从库复制延迟、可用状态和读请求路由统计（refresh=1 时立即重新检查延迟）
+"""
+
+from flask import Blueprint, jsonify, request
+from flask_login import login_required
+from app.models import db
+from app.utils.db_router import get_replica_router
+
+db_replica_stats_bp = Blueprint('db_replica_stats', __name__, url_prefix='/api/db')
+
+
+@db_replica_stats_bp.route('/replicas/stat', methods=['GET'])
+@login_required
+def get_replica_stat():
+    """
+    获取从库状态
+
+    返回格式：
+    {
+        "enabled": true,
+        "replicas": [{"name": "replica_0", "healthy": true, "lag_seconds": 0, "error": null, "checked_at": 1700000000.0}],
+        "max_lag_seconds": 5,
+        "replica_reads": 1234,
+        "primary_fallbacks": 0
+    }
+    """
+    refresh = request.args.get('refresh', '').lower() in ('1', 'true', 'yes')
+    return jsonify({
+        'success': True,
+        'data': get_replica_router().get_stats(db.engines, refresh=refresh)
+    })
@@ -1,20 +1,33 @@
-from flask import Blueprint, render_template, request, jsonify, url_for, session, redirect, flash, current_app, Response
+from flask import Blueprint, render_template, request, jsonify, url_for, session, redirect, flash, current_app, Response, stream_with_context
 from flask_login import login_required
 from flask_sqlalchemy.pagination import Pagination
-from app.models import VM, Host, User, db, ChangeLog, OperationLog, CustomField, CustomFieldEnumOption, CustomFieldValue
-from app.services.log_service import log_change, to_dict
+from app.models import VM, Host, User, db, ChangeLog, OperationLog, CustomFieldValue
+from app.services.log_service import log_change, log_changes_bulk, to_dict
 from app.services.permission_service import (
     role_required, admin_required, manager_or_admin_required,
     can_edit_model, can_delete_model, can_create_model
 )
-from app.services.vm_status_sync_service import VMStatusSyncService
+from app.services.sync_scheduler import request_sync_run, get_scheduler_status
+from app.services.sync_job_service import submit_sync_job, asyncio_engine_supported, SyncJobStore, FINISHED_STATUSES
+from app.services.import_service import (
+    prepare_import, run_import, submit_import_job, ImportJobStore, ImportValidationError
+)
+from app.services.bulk_edit_service import bulk_edit_custom_field, bulk_edit_native_field, bulk_delete
+from app.config import SyncConfig, ListConfig, ImportConfig
 from app.utils.ssh_helper import get_ssh_user
+from app.utils.custom_field_schema import get_schema
+from app.services.custom_field_projection import get_projection
+from app.services.search_index import search_condition as search_index_condition
+from app.utils.cursor_pagination import paginate_by_cursor, get_list_total
+from app.utils.ip_filter import IP_NUM_COLUMNS, ip_filter_condition
+from app.utils.db_router import replica_reads, get_read_engine, used_replica
 # 缓存服务导入在使用时动态导入，避免循环依赖
 import json
 import pytz
 from functools import wraps
 from datetime import datetime
-from sqlalchemy import or_, inspect, cast, String, func, case
+from sqlalchemy import or_, inspect, cast, String, case
+from sqlalchemy.orm import Session
 import csv
 import ipaddress
 import io
@@ -60,6 +73,9 @@ MODEL_CONFIG = {
     # （可选）排序配置：
     #   'default_sort': 默认排序字段（对应db_field）
     #   'default_order': 默认排序方向（'asc'升序/'desc'降序）
+    #
+    # （可选）分页配置：
+    #   'pagination': 'cursor' 时列表默认使用游标分页（按排序键+id定位，不执行COUNT和OFFSET，适合大表）
     'vms': {
         'model': VM,
         'field_config': [
@@ -168,6 +184,7 @@ MODEL_CONFIG = {
         'form_fields': [],
         'default_sort': 'id',
         'default_order': 'desc',
+        'pagination': 'cursor',
         'no_add': True,
         'no_edit': True,
         'no_delete': True,
@@ -203,6 +220,7 @@ MODEL_CONFIG = {
         'form_fields': [],
         'default_sort': 'id',
         'default_order': 'desc',
+        'pagination': 'cursor',
         'no_add': True,
         'no_edit': True,
         'no_delete': True,
@@ -263,6 +281,20 @@ def require_model(f):
     return wrapper
 
 
+def get_form_fields(config, model_name):
+    """
+    当前请求使用的表单字段
+    MODEL_CONFIG 由同一进程内的所有请求线程共享，不能在请求中修改，这里返回逐项拷贝并填充 VM 的宿主机选项
+    """
+    form_fields = [dict(field) for field in config.get('form_fields', [])]
+    if model_name == 'vms':
+        host_options = [host_info for (host_info,) in db.session.query(Host.host_info).all()]
+        for field in form_fields:
+            if field['name'] == 'host_id':
+                field['options'] = host_options
+    return form_fields
+
+
 def query_key_builder(config, model_name=None, include_pagination=True):
     """生成查询缓存的键"""
     sort = request.args.get('sort', config.get('default_sort', 'id'))
@@ -370,7 +402,7 @@ def assemble_vm_list_with_host(vm_list):
     执行流程：
     1. 收集所有VM的host_id列表（去重）
     2. 用batch_get_hosts批量获取对应的host缓存
-    3. 未命中的host缓存批量查数据库并回填缓存
+    3. 未命中的host缓存批量查数据库并一次 pipeline 回填缓存
     4. 给每个VM对象添加host_info字段
     
     注意：host_info不存储在VM缓存中，避免主机信息变化时产生脏数据
@@ -378,7 +410,7 @@ def assemble_vm_list_with_host(vm_list):
     :param vm_list: VM对象列表
     :return: 带host_info字段的VM对象列表
     """
-    from app.utils.cache_manager import batch_get_hosts, set_host, CacheTTL
+    from app.utils.cache_manager import batch_get_hosts, set_hosts, CacheTTL
     from app.utils.valkey_client import serialize_sqlalchemy_object
     from app.models import Host
     
@@ -406,11 +438,16 @@ def assemble_vm_list_with_host(vm_list):
     missing_host_ids = [hid for hid in host_ids_list if hid not in cached_hosts]
     if missing_host_ids:
         db_hosts = Host.query.filter(Host.id.in_(missing_host_ids)).all()
-        for host in db_hosts:
-            serialized = serialize_sqlalchemy_object(host)
+        # 整批序列化，自定义字段一次性加载，一次 pipeline 回填缓存
+        to_cache = {}
+        cache_versions = {}
+        for host, serialized in zip(db_hosts, serialize_sqlalchemy_object(db_hosts)):
             if serialized:
-                set_host(host.id, serialized, ttl=CacheTTL.OBJECT)
-                cached_hosts[host.id] = serialized
+                to_cache[host.id] = serialized
+                if isinstance(host.updated_at, datetime):
+                    cache_versions[host.id] = int(host.updated_at.timestamp())
+        set_hosts(to_cache, ttl=CacheTTL.OBJECT, versions=cache_versions)
+        cached_hosts.update(to_cache)
     
     # Step 4: 为每个VM添加host_info字段
     for vm in vm_list:
@@ -440,13 +477,13 @@ def get_query_data_with_cache(config, model_name=None, include_pagination=True):
     1. 只查数据库ID列表：SELECT id FROM host WHERE xxx ORDER BY id ASC LIMIT 20
     2. 用Redis的mget命令批量获取：["host:1", "host:2", ..., "host:20"]
     3. 把缓存命中的对象拿出来，没命中的ID再批量查一次数据库
-    4. 把查出来的新对象写入Redis缓存
+    4. 把查出来的新对象一次 pipeline 写入Redis缓存（updated_at 作为版本号）
     5. 按ID顺序组装成items数组，加上分页信息返回给前端
     
     注意：绝对不缓存整页数据！只缓存单个对象！
     """
     import time
-    from app.utils.cache_manager import batch_get_hosts, batch_get_vms, set_host, set_vm, CacheTTL
+    from app.utils.cache_manager import batch_get_hosts, batch_get_vms, set_hosts, set_vms, CacheTTL
     from app.utils.valkey_client import serialize_sqlalchemy_object, wrap_dict_to_object
     
     start_time = time.time()
@@ -476,54 +513,52 @@ def get_query_data_with_cache(config, model_name=None, include_pagination=True):
     
     current_app.logger.info(f"[CACHE] Cache hit for {len(cached_items)}/{len(item_ids)} items")
     
-    # Step 4: 缓存未命中的ID需要从数据库获取（已在第一步获取，直接使用）
-    # Step 5: 组装结果并写入缓存（保持原有顺序）
+    # Step 4: 缓存未命中的对象（已在第一步获取）整页一次性序列化，自定义字段批量加载
+    # 缓存数据没有包含自定义字段（旧数据）时也视为未命中
+    def is_usable_cache(cached_data):
+        return isinstance(cached_data, dict) and 'custom_fields' in cached_data
+    
+    miss_items = [item for item in items if not is_usable_cache(cached_items.get(item.id))]
+    serialized_misses = {}
+    if miss_items:
+        for item, serialized in zip(miss_items, serialize_sqlalchemy_object(miss_items)):
+            serialized_misses[item.id] = serialized
+    
+    # Step 5: 组装结果并写入缓存（保持原有顺序），本页所有未命中对象一次 pipeline 写入
+    # 以 updated_at 作为版本号，避免慢请求用旧数据覆盖其他请求刚写入的新数据
     result_items = []
+    to_cache = {}
+    cache_versions = {}
     for item in items:
         item_id = item.id
         
-        if item_id in cached_items:
-            # 缓存命中，检查是否包含自定义字段
-            cached_data = cached_items[item_id]
-            # 如果缓存数据没有包含自定义字段（旧数据），则视为未命中
-            has_custom_fields = False
-            if isinstance(cached_data, dict) and 'custom_fields' in cached_data:
-                has_custom_fields = True
-            
-            if has_custom_fields:
-                # 缓存数据包含自定义字段，直接使用
-                wrapped_item = wrap_dict_to_object(cached_data)
-                result_items.append(wrapped_item)
-                current_app.logger.debug(f"[CACHE] HIT key={model_name}:{item_id}")
-            else:
-                # 缓存数据不包含自定义字段，视为未命中，从数据库获取
-                current_app.logger.debug(f"[CACHE] HIT but missing custom fields, reloading key={model_name}:{item_id}")
-                serialized = serialize_sqlalchemy_object(item)
-                if serialized:
-                    if model_name == 'vms':
-                        set_vm(item_id, serialized, ttl=CacheTTL.OBJECT)
-                    elif model_name == 'hosts':
-                        set_host(item_id, serialized, ttl=CacheTTL.OBJECT)
-                    current_app.logger.debug(f"[CACHE] SET key={model_name}:{item_id} ttl={CacheTTL.OBJECT}s")
-                    wrapped_item = wrap_dict_to_object(serialized)
-                    result_items.append(wrapped_item)
-                else:
-                    result_items.append(item)
+        if item_id not in serialized_misses:
+            # 缓存命中且包含自定义字段，直接使用
+            wrapped_item = wrap_dict_to_object(cached_items[item_id])
+            result_items.append(wrapped_item)
+            current_app.logger.debug(f"[CACHE] HIT key={model_name}:{item_id}")
         else:
             # 缓存未命中，使用数据库数据并写入缓存
-            serialized = serialize_sqlalchemy_object(item)
+            serialized = serialized_misses[item_id]
             if serialized:
-                if model_name == 'vms':
-                    set_vm(item_id, serialized, ttl=CacheTTL.OBJECT)
-                elif model_name == 'hosts':
-                    set_host(item_id, serialized, ttl=CacheTTL.OBJECT)
-                current_app.logger.debug(f"[CACHE] SET key={model_name}:{item_id} ttl={CacheTTL.OBJECT}s")
+                to_cache[item_id] = serialized
+                updated_at = getattr(item, 'updated_at', None)
+                if isinstance(updated_at, datetime):
+                    cache_versions[item_id] = int(updated_at.timestamp())
                 # 使用序列化后的对象（包含自定义字段），而不是原始 SQLAlchemy 对象
                 wrapped_item = wrap_dict_to_object(serialized)
                 result_items.append(wrapped_item)
             else:
                 result_items.append(item)
     
+    # 从库读到的对象可能落后于主库，不写入对象缓存（缓存命中不受影响）
+    if to_cache and not used_replica(db.session):
+        if model_name == 'vms':
+            set_vms(to_cache, ttl=CacheTTL.OBJECT, versions=cache_versions)
+        elif model_name == 'hosts':
+            set_hosts(to_cache, ttl=CacheTTL.OBJECT, versions=cache_versions)
+        current_app.logger.debug(f"[CACHE] SET MANY {model_name} count={len(to_cache)} ttl={CacheTTL.OBJECT}s")
+    
     # 更新查询结果中的items
     query_data['items'] = result_items
     
@@ -574,14 +609,7 @@ def list_view(config, model_name):
     if not visible_columns:
         visible_columns = config['default_columns']
 
-    form_fields = config.get('form_fields', [])
-    if model_name == 'vms':
-        from app.models import Host as HostModel
-        hosts = HostModel.query.all()
-        host_options = [(host.host_info) for host in hosts]
-        for field in form_fields:
-            if field['name'] == 'host_id':
-                field['options'] = host_options
+    form_fields = get_form_fields(config, model_name)
 
     query_data = get_query_data_with_cache(config, include_pagination=True, model_name=model_name)
 
@@ -635,23 +663,40 @@ def list_view(config, model_name):
     )
 
 
+@generic_crud_bp.route('/<model_name>/api/list')
+@login_required
+@require_model
+def list_api(config, model_name):
+    """
+    列表数据接口（JSON），参数与列表页相同
+    游标分页时返回 next_cursor / prev_cursor，下一次请求带 cursor 参数翻页
+    """
+    from app.utils.valkey_client import serialize_sqlalchemy_object
+    
+    query_data = get_query_data_with_cache(config, include_pagination=True, model_name=model_name)
+    items = []
+    for item in query_data['items']:
+        if hasattr(item, 'to_dict') and hasattr(item, '_data'):
+            items.append(item.to_dict())
+        else:
+            items.append(serialize_sqlalchemy_object(item))
+    
+    return jsonify({
+        'success': True,
+        'items': items,
+        'pagination': query_data['pagination_info'],
+        'sort_by': query_data['sort_by'],
+        'sort_order': query_data['sort_order']
+    })
+
+
 @generic_crud_bp.route('/<model_name>/create', methods=['GET', 'POST'])
 @login_required
 @require_model
 @can_create_model(None)
 def create_view(config, model_name):
     model = config['model']
-    form_fields = config['form_fields']
-    
-    if model_name == 'vms':
-        from app.models import Host as HostModel
-        hosts = HostModel.query.all()
-        host_options = [(host.host_info) for host in hosts]
-        for field in form_fields:
-            if field['name'] == 'host_id':
-                field['label'] = 'HOST INFO'
-                field['type'] = 'select'
-                field['options'] = host_options
+    form_fields = get_form_fields(config, model_name)
     
     if request.method == 'POST':
         if request.is_json:
@@ -805,11 +850,8 @@ def create_view(config, model_name):
                             field_data['enum_value'] = field_value if field_value else None
                             # 对于枚举，获取显示标签
                             if field_value:
-                                enum_opt = CustomFieldEnumOption.query.filter_by(
-                                    field_id=field_id,
-                                    option_key=field_value
-                                ).first()
-                                custom_fields_for_log[log_field_key] = enum_opt.option_label if enum_opt else field_value
+                                label = get_schema().get_option_label(field_id, field_value)
+                                custom_fields_for_log[log_field_key] = label if label is not None else field_value
                             else:
                                 custom_fields_for_log[log_field_key] = None
                         
@@ -935,21 +977,12 @@ def create_view(config, model_name):
 def edit_view(config, model_name, id):
     model = config['model']
     item = model.query.get_or_404(id)
-    form_fields = config['form_fields']
-    
     # 确保表单字段配置存在
-    if not form_fields:
+    if not config['form_fields']:
         flash(f"No editable fields configured for {config['model_name']}", 'error')
         return redirect(url_for('generic_crud.list_view', model_name=model_name))
     
-    if model_name == 'vms':
-        from app.models import Host as HostModel
-        hosts = HostModel.query.all()
-        host_options = [(host.host_info) for host in hosts]
-        for field in form_fields:
-            if field['name'] == 'host_id':
-                field['type'] = 'select'
-                field['options'] = host_options
+    form_fields = get_form_fields(config, model_name)
     
     if request.method == 'POST':
         # 统一获取数据，确保即使空值也能被正确处理
@@ -1219,21 +1252,16 @@ def edit_view(config, model_name, id):
                             new_value_display = new_value
                             
                             if field_config['field_type'] == 'enum':
+                                schema = get_schema()
                                 if old_value:
-                                    old_opt = CustomFieldEnumOption.query.filter_by(
-                                        field_id=field_id,
-                                        option_key=old_value
-                                    ).first()
-                                    if old_opt:
-                                        old_value_display = old_opt.option_label
+                                    old_label = schema.get_option_label(field_id, old_value)
+                                    if old_label is not None:
+                                        old_value_display = old_label
                                 
                                 if new_value:
-                                    new_opt = CustomFieldEnumOption.query.filter_by(
-                                        field_id=field_id,
-                                        option_key=new_value
-                                    ).first()
-                                    if new_opt:
-                                        new_value_display = new_opt.option_label
+                                    new_label = schema.get_option_label(field_id, new_value)
+                                    if new_label is not None:
+                                        new_value_display = new_label
                             
                             # 添加到变更日志
                             changes.append({
@@ -1523,6 +1551,7 @@ def delete_view(config, model_name, id):
 @generic_crud_bp.route('/<model_name>/api/filter-options')
 @login_required
 @require_model
+@replica_reads()
 def get_filter_options(config, model_name):
     field_name = request.args.get('field')
     if not field_name:
@@ -1535,35 +1564,27 @@ def get_filter_options(config, model_name):
         resource_type = 'host' if model_name == 'hosts' else 'vm'
         
         # 获取该字段的配置
-        field_config = CustomField.query.filter_by(
-            resource_type=resource_type,
-            id=int(field_name)
-        ).first()
+        field_config = get_schema().get_field(field_name, resource_type=resource_type)
         
         if field_config:
-            # 获取该字段的所有值
-            query = db.session.query(CustomFieldValue).filter_by(
-                field_id=field_config.id
-            ).distinct()
-            
             # 根据字段类型获取对应的值
-            if field_config.field_type == 'int':
+            if field_config['field_type'] == 'int':
                 values = db.session.query(CustomFieldValue.int_value).filter_by(
-                    field_id=field_config.id
+                    field_id=field_config['id']
                 ).filter(CustomFieldValue.int_value.isnot(None)).distinct().all()
-            elif field_config.field_type == 'varchar':
+            elif field_config['field_type'] == 'varchar':
                 values = db.session.query(CustomFieldValue.varchar_value).filter_by(
-                    field_id=field_config.id
+                    field_id=field_config['id']
                 ).filter(CustomFieldValue.varchar_value.isnot(None)).distinct().all()
-            elif field_config.field_type == 'datetime':
+            elif field_config['field_type'] == 'datetime':
                 values = db.session.query(CustomFieldValue.datetime_value).filter_by(
-                    field_id=field_config.id
+                    field_id=field_config['id']
                 ).filter(CustomFieldValue.datetime_value.isnot(None)).distinct().all()
-            elif field_config.field_type == 'enum':
+            elif field_config['field_type'] == 'enum':
                 # 对于枚举类型，返回配置的选项
-                enum_options = field_config.enum_options.order_by(CustomFieldEnumOption.sort).all()
+                enum_options = field_config.get('enum_options', [])
                 
-                response_options = [{'value': opt.option_key, 'label': opt.option_label} for opt in enum_options]
+                response_options = [{'value': opt['option_key'], 'label': opt['option_label']} for opt in enum_options]
                 return jsonify({'options': response_options})
             else:
                 values = []
@@ -1573,7 +1594,7 @@ def get_filter_options(config, model_name):
                 value = value_tuple[0]
                 if value is None:
                     continue
-                if field_config.field_type == 'datetime':
+                if field_config['field_type'] == 'datetime':
                     label = value.strftime('%Y-%m-%d %H:%M:%S')
                     response_options.append({'value': label, 'label': label})
                 else:
@@ -1675,7 +1696,16 @@ def get_filter_options(config, model_name):
 
 
 # 2. 修改主查询逻辑，确保 host_id 过滤使用正确的关联条件
-def get_query_data(config, model_name=None, include_pagination=True):
+def build_list_query(config, model_name=None):
+    """
+    根据请求参数构建列表查询（搜索、过滤、排序），不分页
+
+    Returns:
+        {'query', 'sort', 'order', 'search', 'filter_mapping',
+         'sort_key': 游标分页使用的排序键表达式（按 id 排序时为 None），
+         'seekable': 是否支持游标分页（EAV 方式的自定义字段排序不支持），
+         'nulls_max': 排序键的空值是否按最大值排序（自定义字段：升序在最后，降序在最前）}
+    """
     model = config['model']
     field_config = config['field_config']   
     sort = request.args.get('sort', config.get('default_sort', 'id'))
@@ -1683,8 +1713,21 @@ def get_query_data(config, model_name=None, include_pagination=True):
     search = request.args.get('search', '').strip()
     query = model.query
     
+    # 自定义字段宽表（已开启且可用时，自定义字段的搜索/过滤/排序直接使用宽表的索引列）
+    projection = None
+    use_projection = False
+    if model_name in ['vms', 'hosts']:
+        projection = get_projection('host' if model_name == 'hosts' else 'vm')
+    
+    # 全局搜索索引（已开启且可用时，搜索直接使用 FULLTEXT 索引，不再逐列 LIKE）
+    indexed_search = None
+    if search and model_name in ['vms', 'hosts']:
+        indexed_search = search_index_condition(model, 'host' if model_name == 'hosts' else 'vm', search)
+    
     # 处理搜索
-    if search and (config.get('search_fields') or model_name in ['vms', 'hosts']):
+    if indexed_search is not None:
+        query = query.filter(indexed_search)
+    elif search and (config.get('search_fields') or model_name in ['vms', 'hosts']):
         conditions = []
         need_join_host = False
         for field in config.get('search_fields', []):
@@ -1703,29 +1746,27 @@ def get_query_data(config, model_name=None, include_pagination=True):
             for field_id_str, custom_field_config in custom_fields.items():
                 if custom_field_config.get('filterable', False):
                     resource_type = 'host' if model_name == 'hosts' else 'vm'
-                    try:
-                        field_id = int(field_id_str)
-                    except ValueError:
-                        continue
-                    custom_field = CustomField.query.filter_by(
-                        resource_type=resource_type,
-                        id=field_id
-                    ).first()
+                    custom_field = get_schema().get_field(field_id_str, resource_type=resource_type)
                     
-                    if custom_field:
+                    if custom_field and projection is not None:
+                        condition = projection.search_condition(custom_field, search)
+                        if condition is not None:
+                            conditions.append(condition)
+                            use_projection = True
+                    elif custom_field:
                         subquery = db.session.query(CustomFieldValue.resource_id).filter(
-                            CustomFieldValue.field_id == custom_field.id
+                            CustomFieldValue.field_id == custom_field['id']
                         )
                         
-                        if custom_field.field_type == 'int':
+                        if custom_field['field_type'] == 'int':
                             try:
                                 search_int = int(search)
                                 subquery = subquery.filter(CustomFieldValue.int_value == search_int)
                             except ValueError:
                                 continue
-                        elif custom_field.field_type == 'varchar':
+                        elif custom_field['field_type'] == 'varchar':
                             subquery = subquery.filter(CustomFieldValue.varchar_value.ilike(f'%{search}%'))
-                        elif custom_field.field_type == 'datetime':
+                        elif custom_field['field_type'] == 'datetime':
                             try:
                                 search_datetime = datetime.strptime(search, '%Y-%m-%d %H:%M:%S')
                                 subquery = subquery.filter(CustomFieldValue.datetime_value == search_datetime)
@@ -1735,7 +1776,7 @@ def get_query_data(config, model_name=None, include_pagination=True):
                                     subquery = subquery.filter(CustomFieldValue.datetime_value.like(f'{search}%'))
                                 except ValueError:
                                     continue
-                        elif custom_field.field_type == 'enum':
+                        elif custom_field['field_type'] == 'enum':
                             subquery = subquery.filter(CustomFieldValue.enum_value.ilike(f'%{search}%'))
                         
                         conditions.append(model.id.in_(subquery))
@@ -1784,6 +1825,15 @@ def get_query_data(config, model_name=None, include_pagination=True):
                 
                 if host_ids:
                     query = query.filter(model.host_id.in_(host_ids))
+            # IP 过滤：支持 CIDR、范围和粘贴的 IP 列表，按 INET_ATON 生成列走索引
+            elif field_name in IP_NUM_COLUMNS.get(model_name, {}):
+                condition = ip_filter_condition(
+                    getattr(model, field_name),
+                    getattr(model, IP_NUM_COLUMNS[model_name][field_name]),
+                    filter_value
+                )
+                if condition is not None:
+                    query = query.filter(condition)
             # 特殊处理host_id过滤，允许通过host_info过滤
             elif field_name == 'host_id' and hasattr(model, 'host'):
                 values = filter_value.split(',')
@@ -1852,16 +1902,14 @@ def get_query_data(config, model_name=None, include_pagination=True):
                 resource_type = 'host' if model_name == 'hosts' else 'vm'
                 
                 # 获取该字段的配置
-                try:
-                    field_id = int(param_name)
-                except ValueError:
-                    continue
-                custom_field = CustomField.query.filter_by(
-                    resource_type=resource_type,
-                    id=field_id
-                ).first()
+                custom_field = get_schema().get_field(param_name, resource_type=resource_type)
                 
-                if custom_field:
+                if custom_field and projection is not None:
+                    condition = projection.filter_condition(custom_field, filter_value.split(','))
+                    if condition is not None:
+                        query = query.filter(condition)
+                        use_projection = True
+                elif custom_field:
                     values = filter_value.split(',')
                     has_null_check = False
                     other_values = []
@@ -1874,7 +1922,7 @@ def get_query_data(config, model_name=None, include_pagination=True):
                     
                     # 构建子查询：找到匹配自定义字段值的资源ID
                     subquery = db.session.query(CustomFieldValue.resource_id).filter(
-                        CustomFieldValue.field_id == custom_field.id
+                        CustomFieldValue.field_id == custom_field['id']
                     )
                     
                     # 根据字段类型应用过滤条件
@@ -1884,28 +1932,28 @@ def get_query_data(config, model_name=None, include_pagination=True):
                         if has_null_check:
                             # 没有值的情况：资源不在自定义字段值表中
                             exists_null = ~db.session.query(CustomFieldValue).filter(
-                                CustomFieldValue.field_id == custom_field.id,
+                                CustomFieldValue.field_id == custom_field['id'],
                                 CustomFieldValue.resource_id == model.id
                             ).exists()
                             conditions.append(exists_null)
                         
                         if other_values:
                             # 有值的情况：根据字段类型匹配
-                            if custom_field.field_type == 'int':
+                            if custom_field['field_type'] == 'int':
                                 try:
                                     int_values = [int(v) for v in other_values]
                                     conditions.append(CustomFieldValue.int_value.in_(int_values))
                                 except ValueError:
                                     pass
-                            elif custom_field.field_type == 'varchar':
+                            elif custom_field['field_type'] == 'varchar':
                                 conditions.append(CustomFieldValue.varchar_value.in_(other_values))
-                            elif custom_field.field_type == 'datetime':
+                            elif custom_field['field_type'] == 'datetime':
                                 try:
                                     datetime_values = [datetime.strptime(v, '%Y-%m-%d %H:%M:%S') for v in other_values]
                                     conditions.append(CustomFieldValue.datetime_value.in_(datetime_values))
                                 except ValueError:
                                     pass
-                            elif custom_field.field_type == 'enum':
+                            elif custom_field['field_type'] == 'enum':
                                 conditions.append(CustomFieldValue.enum_value.in_(other_values))
                         
                         if conditions:
@@ -1919,6 +1967,9 @@ def get_query_data(config, model_name=None, include_pagination=True):
     
     # 处理排序（添加自定义字段支持）
     valid_sort_fields = [f['db_field'] for f in field_config if f.get('sortable', False)]
+    sort_key = None
+    seekable = True
+    nulls_max = False
     
     # 检查是否是自定义字段排序
     if model_name and sort not in valid_sort_fields:
@@ -1926,33 +1977,37 @@ def get_query_data(config, model_name=None, include_pagination=True):
         if sort in custom_fields:
             # 这是一个自定义字段，需要通过自定义字段值表排序
             resource_type = 'host' if model_name == 'hosts' else 'vm'
-            try:
-                field_id = int(sort)
-            except ValueError:
-                pass
-            else:
-                custom_field = CustomField.query.filter_by(
-                    resource_type=resource_type,
-                    id=field_id
-                ).first()
+            custom_field = get_schema().get_field(sort, resource_type=resource_type)
             
-            if custom_field:
+            if custom_field and projection is not None:
+                # 宽表列有索引，直接排序；空值顺序与 EAV 方式一致（升序在最后，降序在最前）
+                order_expr = projection.order_column(custom_field)
+                nulls_rank = case((order_expr.is_(None), 1), else_=0)
+                if order.lower() == 'asc':
+                    query = query.order_by(nulls_rank, order_expr.asc())
+                else:
+                    query = query.order_by(nulls_rank.desc(), order_expr.desc())
+                use_projection = True
+                sort_key = order_expr
+                nulls_max = True
+            elif custom_field:
+                seekable = False
                 # 使用 LEFT JOIN 连接自定义字段值表
                 # 这里使用子查询方式实现按自定义字段排序
                 query = query.outerjoin(
                     CustomFieldValue,
-                    (CustomFieldValue.field_id == custom_field.id) & 
+                    (CustomFieldValue.field_id == custom_field['id']) & 
                     (CustomFieldValue.resource_id == model.id)
                 )
                 
                 # 根据字段类型选择排序字段
-                if custom_field.field_type == 'int':
+                if custom_field['field_type'] == 'int':
                     order_expr = CustomFieldValue.int_value
-                elif custom_field.field_type == 'varchar':
+                elif custom_field['field_type'] == 'varchar':
                     order_expr = CustomFieldValue.varchar_value
-                elif custom_field.field_type == 'datetime':
+                elif custom_field['field_type'] == 'datetime':
                     order_expr = CustomFieldValue.datetime_value
-                elif custom_field.field_type == 'enum':
+                elif custom_field['field_type'] == 'enum':
                     order_expr = CustomFieldValue.enum_value
                 else:
                     order_expr = CustomFieldValue.id
@@ -1973,28 +2028,96 @@ def get_query_data(config, model_name=None, include_pagination=True):
                     )
                     query = query.order_by(nulls_first_case, order_expr.desc())
         elif sort in valid_sort_fields:
-            sort_column = getattr(model, sort)
-            if sort in ('vm_ip'):
-                order_expr = func.inet_aton(sort_column)
-            else:
-                order_expr = sort_column
+            ip_num_field = IP_NUM_COLUMNS.get(model_name, {}).get(sort)
+            # IP 按 INET_ATON 生成列排序（有索引）
+            order_expr = getattr(model, ip_num_field) if ip_num_field else getattr(model, sort)
+            sort_key = order_expr
        
             if order.lower() == 'asc':
                 query = query.order_by(order_expr.asc())
             else:
                 query = query.order_by(order_expr.desc())
     elif sort in valid_sort_fields:
-        sort_column = getattr(model, sort)
-        if sort in ('vm_ip'):
-            order_expr = func.inet_aton(sort_column)
-        else:
-            order_expr = sort_column
+        ip_num_field = IP_NUM_COLUMNS.get(model_name, {}).get(sort)
+        # IP 按 INET_ATON 生成列排序（有索引）
+        order_expr = getattr(model, ip_num_field) if ip_num_field else getattr(model, sort)
+        sort_key = order_expr
    
         if order.lower() == 'asc':
             query = query.order_by(order_expr.asc())
         else:
             query = query.order_by(order_expr.desc())
     
+    if use_projection:
+        query = projection.join(query, model)
+    
+    # 按主键排序时游标只需要 id
+    if sort_key is not None and sort == 'id':
+        sort_key = None
+    
+    return {
+        'query': query,
+        'sort': sort,
+        'order': order,
+        'search': search,
+        'filter_mapping': filter_mapping,
+        'sort_key': sort_key,
+        'seekable': seekable,
+        'nulls_max': nulls_max
+    }
+
+
+def use_cursor_pagination(config):
+    """
+    是否使用游标分页：
+    模型配置 'pagination': 'cursor'，或请求带 pagination=cursor / cursor 参数；
+    请求指定了大于1的页码（旧的页码链接）或 pagination=offset 时仍使用页码分页
+    """
+    if request.args.get('pagination') == 'offset':
+        return False
+    if request.args.get('cursor') or request.args.get('pagination') == 'cursor':
+        return True
+    return config.get('pagination') == 'cursor' and request.args.get('page', 1, type=int) <= 1
+
+
+@replica_reads()
+def get_query_data(config, model_name=None, include_pagination=True):
+    model = config['model']
+    built = build_list_query(config, model_name)
+    query = built['query']
+    sort = built['sort']
+    order = built['order']
+    search = built['search']
+    filter_mapping = built['filter_mapping']
+    
+    # 游标分页：按 (排序键, id) 定位，不执行 OFFSET，总数估算/缓存
+    if include_pagination and built['seekable'] and use_cursor_pagination(config):
+        per_page = request.args.get('per_page', 20, type=int)
+        total, approximate = get_list_total(query, model, model_name or config['route_base'], request.args)
+        page = paginate_by_cursor(
+            query, model.id, built['sort_key'], sort, order, per_page, request.args.get('cursor'),
+            nulls_max=built['nulls_max']
+        )
+        return {
+            'items': page['items'],
+            'pagination': None,
+            'pagination_info': {
+                'mode': 'cursor',
+                'per_page': per_page,
+                'total': total,
+                'total_approximate': approximate,
+                'count': len(page['items']),
+                'has_prev': page['has_prev'],
+                'has_next': page['has_next'],
+                'prev_cursor': page['prev_cursor'],
+                'next_cursor': page['next_cursor']
+            },
+            'filter_params': {k: v for k, v in request.args.items() if k in filter_mapping and v},
+            'search': search,
+            'sort_by': sort,
+            'sort_order': order
+        }
+    
     # 分页处理（保持不变）
     if include_pagination:
         page = request.args.get('page', 1, type=int)
@@ -2007,6 +2130,7 @@ def get_query_data(config, model_name=None, include_pagination=True):
             'items': pagination.items,
             'pagination': pagination,
             'pagination_info': {
+                'mode': 'offset',
                 'page': pagination.page,
                 'per_page': pagination.per_page,
                 'total': pagination.total,
@@ -2113,39 +2237,8 @@ def save_user_table_settings(user_id, model_name, settings):
 
 
 def get_resource_custom_fields(resource_type):
-    """获取指定资源类型的有效自定义字段配置"""
-    fields = CustomField.query.filter_by(
-        resource_type=resource_type
-    ).order_by(CustomField.sort).all()
-    
-    result = []
-    for field in fields:
-        field_dict = {
-            'id': field.id,
-            'resource_type': field.resource_type,
-            'field_name': field.field_name,
-            'field_type': field.field_type,
-            'field_length': field.field_length,
-            'is_required': field.is_required,
-            'default_value': field.default_value,
-            'sort': field.sort,
-            'create_time': field.create_time.isoformat() if field.create_time else None,
-            'update_time': field.update_time.isoformat() if field.update_time else None
-        }
-        
-        if field.field_type == 'enum':
-            enum_options = field.enum_options.order_by(CustomFieldEnumOption.sort).all()
-            field_dict['enum_options'] = [
-                {
-                    'id': opt.id,
-                    'option_key': opt.option_key,
-                    'option_label': opt.option_label,
-                    'sort': opt.sort
-                } for opt in enum_options
-            ]
-        
-        result.append(field_dict)
-    return result
+    """获取指定资源类型的有效自定义字段配置（读取进程内字段定义缓存）"""
+    return get_schema().get_fields(resource_type)
 
 
 def get_resource_field_values(resource_type, resource_id):
@@ -2155,34 +2248,32 @@ def get_resource_field_values(resource_type, resource_id):
         resource_id=resource_id
     ).all()
     
+    schema = get_schema()
     value_dict = {}
     value_map = {}
     
     for val in values:
-        field = val.field
+        field = schema.get_field(val.field_id)
         if not field:
             continue
         
-        if field.field_type == 'int':
+        if field['field_type'] == 'int':
             field_value = val.int_value
-        elif field.field_type == 'varchar':
+        elif field['field_type'] == 'varchar':
             field_value = val.varchar_value
-        elif field.field_type == 'datetime':
+        elif field['field_type'] == 'datetime':
             field_value = val.datetime_value
-        elif field.field_type == 'enum':
-            enum_opt = CustomFieldEnumOption.query.filter_by(
-                field_id=field.id,
-                option_key=val.enum_value
-            ).first()
+        elif field['field_type'] == 'enum':
+            label = schema.get_option_label(val.field_id, val.enum_value)
             field_value = {
                 'key': val.enum_value,
-                'label': enum_opt.option_label if enum_opt else val.enum_value
+                'label': label if label is not None else val.enum_value
             }
         else:
             field_value = None
         
-        value_dict[str(field.id)] = field_value
-        value_map[str(field.id)] = field_value
+        value_dict[str(val.field_id)] = field_value
+        value_map[str(val.field_id)] = field_value
     
     return value_dict, value_map
 
@@ -2321,19 +2412,15 @@ def get_custom_fields(model_name):
 
 
 def get_custom_fields_from_db(model_name):
-    """从数据库的custom_fields表中获取自定义字段配置"""
-    from app.models import CustomField
-    
+    """获取自定义字段配置（读取进程内字段定义缓存）"""
     resource_type = 'host' if model_name == 'hosts' else 'vm'
     
-    custom_fields = CustomField.query.filter_by(
-        resource_type=resource_type
-    ).order_by(CustomField.sort).all()
+    custom_fields = get_schema().get_fields(resource_type)
     
     field_config = {}
     for field in custom_fields:
-        field_config[str(field.id)] = {
-            'label': field.field_name,
+        field_config[str(field['id'])] = {
+            'label': field['field_name'],
             'sortable': True,
             'filterable': True,
             'default_visible': True
@@ -2483,92 +2570,9 @@ def bulk_delete_view(config, model_name):
         return jsonify({'error': 'No IDs provided'}), 400
 
     try:
-        items_to_delete = model.query.filter(model.id.in_(ids_to_delete)).all()
-        for item in items_to_delete:
-            # 记录主机自身的删除日志（新增部分）
-            if model_name == 'hosts':
-                # 记录主机自身的删除信息
-                host_identifier = getattr(item, 'host_info', str(item.id))
-                host_details = {
-                    'host_details': to_dict(item),
-                }
-                log_change('deleted', model_name, host_identifier, detail_obj=host_details)
-            
-            # 处理关联的VM（原逻辑保留）
-            if model_name == 'vms':
-                identifier = getattr(item, 'vm_ip', str(item.id))
-                # 确保使用正确的Host模型类
-                from app.models import Host as HostModel
-                host = HostModel.query.get(item.host_id)
-                # 处理host不存在的情况（可能是缓存数据与数据库不一致）
-                host_info = host.host_info if host else f"Unknown (host_id: {item.host_id})"
-                vm_details = {
-                    'vm_details': to_dict(item),
-                    'host_relation': {
-                        'host_info': host_info
-                    }
-                }
-                log_change('deleted', model_name, identifier, detail_obj=vm_details)
-            elif model_name == 'hosts' and hasattr(item, 'vms'):
-                # 记录主机下VM的删除信息
-                for vm in item.vms:
-                    vm_details = {
-                        'vm_details': to_dict(vm),
-                        'host_relation': {
-                            'host_info': item.host_info
-                        }
-                    }
-                    log_change('deleted', 'vms', vm.vm_ip, detail_obj=vm_details)
-            else:
-                # 其他模型的删除日志
-                identifier = getattr(item, 'host_info', getattr(item, 'vm_ip', str(item.id)))
-                log_change('deleted', model_name, identifier, detail_obj=to_dict(item))
-
-        # 如果是批量删除VM，统计每个主机需要减少的VM数量
-        if model_name == 'vms':
-            host_vm_count = {}
-            for item in items_to_delete:
-                if item.host_id:
-                    host_vm_count[item.host_id] = host_vm_count.get(item.host_id, 0) + 1
-            
-            # 在事务中批量更新主机的vm_count
-            from app.models import Host
-            for host_id, count in host_vm_count.items():
-                db.session.query(Host).filter_by(id=host_id).update({"vm_count": Host.vm_count - count})
-        
-        # 执行删除操作
-        if model_name == 'hosts':
-            # 对于主机，需要逐个删除以触发级联删除关联的VM
-            for item in items_to_delete:
-                db.session.delete(item)
-        else:
-            # 其他模型可以批量删除
-            model.query.filter(model.id.in_(ids_to_delete)).delete(synchronize_session=False)
-        db.session.commit()
-        
-        from app.utils.cache_manager import delayed_delete_vm, delayed_delete_host, invalidate_all_stats, delete_host
-        
-        if model_name == 'vms':
-            for vm_id in ids_to_delete:
-                delayed_delete_vm(vm_id)  # 延迟双删：先删缓存 → 更新数据库 → 延迟500ms再删一次
-            
-            # 删除所有相关主机的缓存（因为vm_count变化了）
-            import threading
-            for host_id in host_vm_count.keys():
-                delete_host(host_id)
-                threading.Timer(0.5, lambda hid=host_id: delete_host(hid)).start()
-        elif model_name == 'hosts':
-            for host_id in ids_to_delete:
-                delayed_delete_host(host_id)  # 延迟双删：先删缓存 → 更新数据库 → 延迟500ms再删一次
-            
-            # 删除所有关联VM的缓存（因为VM被级联删除了）
-            for item in items_to_delete:
-                if hasattr(item, 'vms'):
-                    for vm in item.vms:
-                        delayed_delete_vm(vm.id)
-        
-        # 失效统计缓存
-        invalidate_all_stats()
+        # 分块按ID集合删除（含自定义字段值和宿主机下的VM），删除日志一次批量写入
+        entries = bulk_delete(model, model_name, ids_to_delete)
+        log_changes_bulk(entries)
         
         return jsonify({'success': True, 'message': 'Bulk deletion successful'})
     
@@ -2580,8 +2584,9 @@ def bulk_delete_view(config, model_name):
 
 def log_bulk_edit_errors(items_to_edit, model_name, field_to_edit, new_value, errors):
     """
-    为批量编辑操作中的每个项目记录错误日志
+    为批量编辑操作中的每个项目记录错误日志（一次批量写入）
     """
+    entries = []
     for item in items_to_edit:
         # 构建错误详情
         error_detail = {
@@ -2602,8 +2607,15 @@ def log_bulk_edit_errors(items_to_edit, model_name, field_to_edit, new_value, er
         else:
             identifier = str(item.id)
         
-        # 记录错误日志
-        log_change('updated', model_name, identifier, status='failed', detail_obj=error_detail)
+        entries.append({
+            'action': 'updated',
+            'object_type': model_name,
+            'object_identifier': identifier,
+            'detail_obj': error_detail
+        })
+    
+    # 记录错误日志
+    log_changes_bulk(entries, status='failed')
     
 @generic_crud_bp.route('/<model_name>/bulk-edit', methods=['POST'])
 @login_required
@@ -2636,14 +2648,7 @@ def bulk_edit_view(config, model_name):
     resource_type = 'host' if model_name == 'hosts' else 'vm'
     custom_field = None
     if model_name in ['hosts', 'vms']:
-        try:
-            field_id = int(field_to_edit)
-            custom_field = CustomField.query.filter_by(
-                id=field_id,
-                resource_type=resource_type
-            ).first()
-        except ValueError:
-            pass
+        custom_field = get_schema().get_field(field_to_edit, resource_type=resource_type)
     
     # 验证必填字段（仅对原生字段）
     if field_config and field_config.get('required') and new_value in (None, '', ' '):
@@ -2711,292 +2716,48 @@ def bulk_edit_view(config, model_name):
         return jsonify({'success': False, 'message': 'Field not allowed for editing'}), 403
 
     try:
-        # 获取需要编辑的项目
-        items_to_edit = model.query.filter(model.id.in_(ids_to_edit)).all()
-        new_host_info = None
-        new_host_id = None  # 初始化变量，避免未定义错误
-        items_to_log = []  # 用于收集需要记录日志的项目
-
-        # 处理自定义字段的批量编辑
+        # 处理自定义字段的批量编辑：一次加载旧值，一条 upsert 写入
         if custom_field:
-            from datetime import datetime
-            
-            for item in items_to_edit:
-                # 获取当前自定义字段的旧值
-                old_field_value = CustomFieldValue.query.filter_by(
-                    field_id=custom_field.id,
-                    resource_id=item.id
-                ).first()
-                
-                old_value = None
-                if old_field_value:
-                    if custom_field.field_type == 'int':
-                        old_value = old_field_value.int_value
-                    elif custom_field.field_type == 'varchar':
-                        old_value = old_field_value.varchar_value
-                    elif custom_field.field_type == 'datetime':
-                        old_value = old_field_value.datetime_value
-                    elif custom_field.field_type == 'enum':
-                        old_value = old_field_value.enum_value
-                
-                # 比较值是否有变化
-                value_changed = False
-                if custom_field.field_type == 'int':
-                    try:
-                        new_val_int = int(new_value) if new_value not in ('', None) else None
-                        if old_value != new_val_int:
-                            value_changed = True
-                    except (ValueError, TypeError):
-                        pass
-                elif custom_field.field_type == 'varchar':
-                    if old_value != new_value:
-                        value_changed = True
-                elif custom_field.field_type == 'datetime':
-                    if old_value != new_value:
-                        value_changed = True
-                elif custom_field.field_type == 'enum':
-                    if old_value != new_value:
-                        value_changed = True
-                
-                if not value_changed:
-                    continue
-                
-                # 构建变更日志
-                # 获取旧值的显示名（用于日志）
-                old_value_display = old_value
-                if custom_field.field_type == 'enum' and old_value:
-                    old_opt = CustomFieldEnumOption.query.filter_by(
-                        field_id=custom_field.id,
-                        option_key=old_value
-                    ).first()
-                    if old_opt:
-                        old_value_display = old_opt.option_label
-                
-                # 获取新值的显示名（用于日志）
-                new_value_display = new_value
-                if custom_field.field_type == 'enum' and new_value:
-                    new_opt = CustomFieldEnumOption.query.filter_by(
-                        field_id=custom_field.id,
-                        option_key=new_value
-                    ).first()
-                    if new_opt:
-                        new_value_display = new_opt.option_label
-                
-                detail_log = {
-                    'changes': [{
-                        'field': custom_field.field_name,
-                        'old_value': old_value_display,
-                        'new_value': new_value_display
-                    }]
-                }
-                
-                items_to_log.append((item, detail_log))
-            
-            # 执行自定义字段的更新
-            for item, detail_log in items_to_log:
-                # 更新或创建自定义字段值
-                field_value = CustomFieldValue.query.filter_by(
-                    field_id=custom_field.id,
-                    resource_id=item.id
-                ).first()
-                
-                if not field_value:
-                    field_value = CustomFieldValue(
-                        field_id=custom_field.id, 
-                        resource_id=item.id,
-                        resource_type=resource_type
-                    )
-                    db.session.add(field_value)
-                
-                # 根据字段类型设置值
-                if custom_field.field_type == 'int':
-                    try:
-                        field_value.int_value = int(new_value) if new_value not in ('', None) else None
-                    except (ValueError, TypeError):
-                        field_value.int_value = None
-                elif custom_field.field_type == 'varchar':
-                    field_value.varchar_value = new_value
-                elif custom_field.field_type == 'datetime':
-                    if new_value:
-                        try:
-                            field_value.datetime_value = datetime.strptime(new_value, '%Y-%m-%dT%H:%M')
-                        except (ValueError, TypeError):
-                            field_value.datetime_value = None
-                    else:
-                        field_value.datetime_value = None
-                elif custom_field.field_type == 'enum':
-                    field_value.enum_value = new_value
-            
-            db.session.commit()
-            
-            from app.utils.cache_manager import delayed_delete_vm, delayed_delete_host, invalidate_all_stats
-            
-            if model_name == 'vms':
-                for item, _ in items_to_log:
-                    delayed_delete_vm(item.id)  # 延迟双删：先删缓存 → 更新数据库 → 延迟500ms再删一次
-            elif model_name == 'hosts':
-                for item, _ in items_to_log:
-                    delayed_delete_host(item.id)  # 延迟双删：先删缓存 → 更新数据库 → 延迟500ms再删一次
-            
-            # 失效统计缓存
-            invalidate_all_stats()
-            
-            for item, detail_log in items_to_log:
-                if model_name == 'vms':
-                    identifier = getattr(item, 'vm_ip', str(item.id))
-                elif model_name == 'hosts':
-                    identifier = getattr(item, 'host_info', str(item.id))
-                else:
-                    identifier = str(item.id)
-                log_change('updated', model_name, identifier, status='success', detail_obj=detail_log)
-            
+            entries = bulk_edit_custom_field(model, model_name, ids_to_edit, custom_field, new_value)
+            log_changes_bulk(entries)
             return jsonify({'success': True, 'message': 'Bulk edit successful'})
 
+        new_host = None
+        update_value = new_value.strip() if isinstance(new_value, str) else new_value
         # 处理host_id特殊逻辑（仅当编辑字段为host_id时）
         if model_name == 'vms' and field_to_edit == 'host_id' and new_value:
-            from app.models import Host as HostModel
-            # 处理主机信息的空格
-            trimmed_host_value = new_value.strip() if isinstance(new_value, str) else new_value
-            new_host = HostModel.query.filter_by(host_info=trimmed_host_value).first()
-            if new_host:
-                new_host_id = new_host.id
-                new_host_info = new_host.host_info
-            else:
+            new_host = Host.query.filter_by(host_info=update_value).first()
+            if not new_host:
                 # 获取需要编辑的项目以记录日志
                 items_to_edit = model.query.filter(model.id.in_(ids_to_edit)).all()
-                errors = {field_to_edit: f"Host '{trimmed_host_value}' does not exist"}
+                errors = {field_to_edit: f"Host '{update_value}' does not exist"}
                 log_bulk_edit_errors(items_to_edit, model_name, field_to_edit, new_value, errors)
-                return jsonify({'success': False, 'message': f"Host '{trimmed_host_value}' does not exist"}), 400
-
-        # 遍历项目，收集需要记录日志的项目（仅关注当前编辑字段）
-        for item in items_to_edit:
-            # 获取当前字段的旧值
-            old_value = getattr(item, field_to_edit)
-            
-            # 确定当前字段的更新值
-            update_value = new_value
-            if model_name == 'vms' and field_to_edit == 'host_id':
-                update_value = new_host_id  # 使用实际host_id
-            # 对字符串类型的更新值进行trim
-            elif isinstance(update_value, str):
-                update_value = update_value.strip()
-            
-            # 直接比较值（不转字符串），避免None误判
-            if old_value == update_value:
-                continue  # 无实际变化，跳过日志和更新
-
-            # 构建变更日志（仅包含当前编辑的字段）
-            detail_log = {
-                'changes': [{
-                    'field': field_to_edit,
-                    'old_value': old_value,
-                    'new_value': update_value
-                }]
-            }
+                return jsonify({'success': False, 'message': f"Host '{update_value}' does not exist"}), 400
+            update_value = new_host.id  # 使用实际host_id
 
-            # 仅当编辑host_id且主机实际变化时，补充host_info变更
-            if model_name == 'vms' and field_to_edit == 'host_id':
-                old_host = HostModel.query.get(old_value) if old_value else None
-                old_host_info = old_host.host_info if old_host else 'Unknown'
-                # 只有新旧主机信息不同时才添加host_info日志
-                if old_host_info != new_host_info:
-                    detail_log['changes'].append({
-                        'field': 'host_info',
-                        'old_value': old_host_info,
-                        'new_value': new_host_info
-                    })
-
-            # 将需要记录日志的项目和日志详情保存
-            items_to_log.append((item, detail_log))
-        
-        # 筛选真正需要更新的ID（基于实际值变化）
-        ids_to_actually_update = [
-            item.id for item, _ in items_to_log
-        ]
-        
-        # 执行实际更新操作
-        if ids_to_actually_update:
-            # 处理vm_ip唯一性校验
-            if model_name == 'vms' and field_to_edit == 'vm_ip' and new_value:
-                trimmed_value = new_value.strip() if isinstance(new_value, str) else new_value
-                existing_vm = model.query.filter_by(vm_ip=trimmed_value).first()
-                if existing_vm and existing_vm.id not in ids_to_edit:
-                    # 为每个受影响的项目生成单独的日志
-                    for item in items_to_edit:
-                        identifier = getattr(item, 'vm_ip', str(item.id))
-                        error_detail = {
-                            'error': True,
-                            'changes': [{
-                                'error': f"IP address '{trimmed_value}' already exists.",
-                                'field': field_to_edit,
-                                'new_value': new_value,
-                                'old_value': getattr(item, field_to_edit)
-                            }]
-                        }
-                        log_change('updated', model_name, identifier, status='failed', detail_obj=error_detail)
-                    
-                    return jsonify({
-                        'success': False, 
-                        'message': f"IP address '{trimmed_value}' already exists for another VM."
-                    }), 400
-            
-            try:
-                # 执行批量更新
-                model.query.filter(model.id.in_(ids_to_actually_update)).update(
-                    {field_to_edit: update_value}, 
-                    synchronize_session=False
+        try:
+            # 一次加载旧值，只对实际变化的记录执行一条批量 UPDATE
+            entries = bulk_edit_native_field(
+                model, model_name, ids_to_edit, field_to_edit, update_value, new_host=new_host
+            )
+        except Exception as update_error:
+            # 处理重复条目错误
+            if 'Duplicate entry' not in str(update_error):
+                raise
+            error_msg = "Bulk edit failed due to duplicate entry. "
+            if model_name == 'vms' and field_to_edit == 'vm_ip':
+                error_msg += f"IP address '{new_value}' already exists."
+                # 为每个受影响的项目生成单独的日志
+                items_to_edit = model.query.filter(model.id.in_(ids_to_edit)).all()
+                log_bulk_edit_errors(items_to_edit, model_name, field_to_edit, new_value, {field_to_edit: error_msg})
+            else:
+                log_change(
+                    'updated', model_name, f"bulk edit IDs: {ids_to_edit}",
+                    status='failed', detail_obj={'error': error_msg}
                 )
-                db.session.commit()
-                
-                from app.utils.cache_manager import delayed_delete_vm, delayed_delete_host, invalidate_all_stats
-                
-                if model_name == 'vms':
-                    for item, _ in items_to_log:
-                        delayed_delete_vm(item.id)  # 延迟双删：先删缓存 → 更新数据库 → 延迟500ms再删一次
-                        if field_to_edit == 'host_id':
-                            # 删除原主机的缓存
-                            if hasattr(item, 'host_id') and item.host_id:
-                                delayed_delete_host(item.host_id)
-                            # 删除新主机的缓存
-                            if new_host_id:
-                                delayed_delete_host(new_host_id)
-                elif model_name == 'hosts':
-                    for item, _ in items_to_log:
-                        delayed_delete_host(item.id)  # 延迟双删：先删缓存 → 更新数据库 → 延迟500ms再删一次
-                
-                # 失效统计缓存
-                invalidate_all_stats()
-                
-                for item, detail_log in items_to_log:
-                    # 记录操作日志
-                    if model_name == 'vms':
-                        identifier = getattr(item, 'vm_ip', str(item.id))
-                    elif model_name == 'hosts':
-                        identifier = getattr(item, 'host_info', str(item.id))
-                    else:
-                        identifier = str(item.id)
-                    log_change('updated', model_name, identifier, status='success', detail_obj=detail_log)
-            except Exception as update_error:
-                db.session.rollback()
-                # 处理重复条目错误
-                if 'Duplicate entry' in str(update_error):
-                    error_msg = f"Bulk edit failed due to duplicate entry. "
-                    if model_name == 'vms' and field_to_edit == 'vm_ip':
-                        error_msg += f"IP address '{new_value}' already exists."
-                        # 为每个受影响的项目生成单独的日志
-                        for item, detail_log in items_to_log:
-                            identifier = getattr(item, 'vm_ip', str(item.id))
-                            detail_log['error'] = error_msg
-                            log_change('updated', model_name, identifier, status='failed', detail_obj=detail_log)
-                    else:
-                        log_change(
-                            'updated', model_name, f"bulk edit IDs: {ids_to_edit}", 
-                            status='failed', detail_obj={'error': error_msg}
-                        )
-                    return jsonify({'success': False, 'message': error_msg}), 400
-                else:
-                    raise update_error
+            return jsonify({'success': False, 'message': error_msg}), 400
 
+        log_changes_bulk(entries)
         return jsonify({'success': True, 'message': 'Bulk edit successful'})
     except Exception as e:
         db.session.rollback()
@@ -3011,6 +2772,14 @@ def bulk_edit_view(config, model_name):
 @require_model
 @manager_or_admin_required
 def import_data_view(config, model_name):
+    """
+    CSV 批量导入
+    
+    校验在请求内完成（一次遍历，返回所有错误行）；行数不超过 IMPORT_ASYNC_THRESHOLD 时直接分批写入，
+    否则提交后台任务并返回 202，进度通过 /api/<model_name>/import-jobs/<job_id> 查询
+    """
+    from flask_login import current_user
+    
     if 'file' not in request.files:
         return jsonify({'error': 'No file provided'}), 400
     file = request.files['file']
@@ -3020,299 +2789,65 @@ def import_data_view(config, model_name):
     if not file.filename.endswith('.csv'):
         return jsonify({'error': 'File must be CSV format'}), 400
 
-    model = config['model']
-    form_fields = config.get('form_fields', [])
-    
-    label_to_name_map = {field['label']: field['name'] for field in form_fields}
-    required_labels = {field['label'] for field in form_fields if field.get('required')}
-
-    # 获取自定义字段配置
-    resource_type = None
-    if model_name == 'hosts':
-        resource_type = 'host'
-    elif model_name == 'vms':
-        resource_type = 'vm'
-    
-    custom_fields_config = []
-    custom_fields_name_to_config_map = {}
-    if resource_type:
-        custom_fields_config = get_resource_custom_fields(resource_type)
-        custom_fields_name_to_config_map = {f['field_name']: f for f in custom_fields_config}
-
+    username = getattr(current_user, 'username', None)
     try:
-        stream = file.stream.read().decode('utf-8-sig')
-        csv_data = list(csv.DictReader(stream.splitlines()))
-        
-        if not csv_data:
-            return jsonify({'error': 'CSV file is empty or has no content'}), 400
-
-        header = csv_data[0].keys()
-        missing_labels = required_labels - set(header)
-        if missing_labels:
-            return jsonify({'error': f'CSV file is missing required columns: {", ".join(missing_labels)}'}), 400
-
-        existing_vms_ips = set()
-        existing_hosts = {}
-        existing_hosts_info = set()
-        unique_field_name = None
-        if model_name == 'vms':
-            unique_field_name = 'vm_ip'
-            existing_vms_ips = {v.vm_ip for v in VM.query.with_entities(VM.vm_ip).all()}
-            existing_hosts = {h.host_info: h.id for h in Host.query.with_entities(Host.host_info, Host.id).all()}
-        elif model_name == 'hosts':
-            unique_field_name = 'host_info'
-            # 使用model代替Host，避免局部变量问题
-            existing_hosts_info = {h.host_info for h in model.query.with_entities(model.host_info).all()}
-        
-        unique_field_label = next((label for label, name in label_to_name_map.items() if name == unique_field_name), None)
-
-        # 暂存成功日志，待事务提交后再记录
-        success_logs = []
-        custom_fields_to_save = []  # 保存自定义字段值
-
-        for i, row in enumerate(csv_data, start=2):
-            if unique_field_label:
-                identifier_value = row.get(unique_field_label)
-                if model_name == 'vms' and identifier_value in existing_vms_ips:
-                    raise ValueError(f"Row {i} error: VM IP '{identifier_value}' already exists.")
-                if model_name == 'hosts' and identifier_value in existing_hosts_info:
-                    raise ValueError(f"Row {i} error: Host Info '{identifier_value}' already exists.")
-
-            missing_values = [label for label in required_labels if not row.get(label)]
-            if missing_values:
-                raise ValueError(f'Row {i} error: Missing values for required fields: {", ".join(missing_values)}')
-            
-            if model_name == 'vms':
-                vm_ip_label = 'IP ADDRESS'
-                host_info_label = 'HOST INFO'
-                status_label = 'STATUS'
-
-                ip_value = row.get(vm_ip_label)
-                if ip_value and not is_valid_ipv4(ip_value):
-                    raise ValueError(f'Row {i} error: Invalid IP address format: "{ip_value}"')
-                
-                host_info_value = row.get(host_info_label)
-                if host_info_value:
-                    if host_info_value not in existing_hosts:
-                        raise ValueError(f'Row {i} error: Host "{host_info_value}" does not exist.')
-                    host_id = existing_hosts[host_info_value]
-                
-                status_value = row.get(status_label)
-                status_field_config = next((f for f in form_fields if f['name'] == 'status'), None)
-                if status_value and status_field_config and status_value not in status_field_config.get('options', []):
-                    allowed = status_field_config.get('options', [])
-                    raise ValueError(f'Row {i} error: Invalid value "{status_value}" for field "{status_label}". Allowed values are: {allowed}.')
-
-            elif model_name == 'hosts':
-                status_label = 'STATUS'
-                virt_type_label = 'TYPE'
-
-                status_value = row.get(status_label)
-                status_field_config = next((f for f in form_fields if f['name'] == 'status'), None)
-                if status_value and status_field_config and status_value not in status_field_config.get('options', []):
-                    allowed = status_field_config.get('options', [])
-                    raise ValueError(f'Row {i} error: Invalid value "{status_value}" for field "{status_label}". Allowed values are: {allowed}.')
-                
-                virt_type_value = row.get(virt_type_label)
-                virt_field_config = next((f for f in form_fields if f['name'] == 'virtualization_type'), None)
-                if virt_type_value and virt_field_config and virt_type_value.lower() not in virt_field_config.get('options', []):
-                    allowed = virt_field_config.get('options', [])
-                    raise ValueError(f'Row {i} error: Invalid value "{virt_type_value}" for field "{virt_type_label}". Allowed values are: {", ".join(allowed)}.')
-
-            item_data = {}
-            for label, val in row.items():
-                if label in label_to_name_map:
-                    field_name = label_to_name_map[label]
-                    if field_name == 'host_id' and label == host_info_label:
-                        item_data[field_name] = host_id
-                    else:
-                        # 处理空值和 "None" 字符串，转换为 Python 的 None
-                        if val is None or val == '' or val == 'None':
-                            item_data[field_name] = None
-                        else:
-                            item_data[field_name] = val
-            
-            beijing_tz = pytz.timezone('Asia/Shanghai')
-            now = datetime.now(beijing_tz)
-            if hasattr(model, 'created_at'):
-                item_data['created_at'] = now
-            if hasattr(model, 'updated_at'):
-                item_data['updated_at'] = now
-            
-            new_item = model(**item_data)
-            db.session.add(new_item)
-            
-            try:
-                db.session.flush()  # 暂存到数据库缓冲区，未提交
-            except Exception as flush_error:
-                db.session.rollback()
-                if 'Duplicate entry' in str(flush_error):
-                    error_msg = str(flush_error)
-                    log_change('imported', model_name, 'unknown', status='failed', detail_obj={'error': error_msg, 'data': item_data})
-                    raise ValueError(f'Row {i} error: Data already exists in database. {error_msg}')
-                else:
-                    log_change('imported', model_name, 'unknown', status='failed', detail_obj={'error': str(flush_error), 'data': item_data})
-                    raise
-            
-            if unique_field_label and row.get(unique_field_label):
-                if model_name == 'vms':
-                    existing_vms_ips.add(row[unique_field_label])
-                elif model_name == 'hosts':
-                    existing_hosts_info.add(row[unique_field_label])
-
-            # 处理自定义字段
-            row_custom_fields = []
-            for label, val in row.items():
-                if label in custom_fields_name_to_config_map:
-                    field_config = custom_fields_name_to_config_map[label]
-                    
-                    # 处理值
-                    processed_value = val
-                    if processed_value is None or processed_value == '' or processed_value == 'None':
-                        processed_value = None
-                    
-                    row_custom_fields.append({
-                        'field_config': field_config,
-                        'value': processed_value
-                    })
-            
-            # 保存自定义字段值到临时列表，待事务提交后处理
-            if row_custom_fields:
-                custom_fields_to_save.append({
-                    'resource_id': new_item.id,
-                    'fields': row_custom_fields
-                })
-
-            # 准备日志数据（暂存，不立即记录）
-            log_item_data = item_data.copy()
-            if model_name == 'vms' and 'host_id' in log_item_data:
-                host = Host.query.get(log_item_data['host_id'])
-                if host:
-                    log_item_data['host_info'] = host.host_info
-            
-            # 添加自定义字段到日志数据
-            if row_custom_fields:
-                log_item_data['custom_fields'] = {}
-                for field_data in row_custom_fields:
-                    field_config = field_data['field_config']
-                    value = field_data['value']
-                    log_item_data['custom_fields'][field_config['field_name']] = value
-            
-            if model_name == 'hosts':
-                identifier = getattr(new_item, 'host_info', str(new_item.id))
-            elif model_name == 'vms':
-                identifier = getattr(new_item, 'vm_ip', str(new_item.id))
-            else:
-                identifier = str(new_item.id)
-            
-            # 暂存日志信息，待提交后记录
-            success_logs.append({
-                'action': 'imported',
-                'model_name': model_name,
-                'identifier': identifier,
-                'detail_obj': log_item_data
-            })
-
-        # 如果是导入VM，统计每个主机需要增加的VM数量
-        if model_name == 'vms':
-            host_vm_count = {}
-            for row in csv_data:
-                host_info_value = row.get('HOST INFO')
-                if host_info_value and host_info_value in existing_hosts:
-                    host_id = existing_hosts[host_info_value]
-                    host_vm_count[host_id] = host_vm_count.get(host_id, 0) + 1
-            
-            # 在事务中批量更新主机的vm_count
-            from app.models import Host
-            for host_id, count in host_vm_count.items():
-                db.session.query(Host).filter_by(id=host_id).update({"vm_count": Host.vm_count + count})
-        
-        # 所有行处理完成，提交事务
-        db.session.commit()
-        
-        # 失效统计缓存（导入会改变数据数量）
-        from app.utils.cache_manager import invalidate_all_stats, delete_host
-        invalidate_all_stats()
-        
-        # 如果是导入VM，删除所有相关主机的缓存（因为vm_count变化了）
-        if model_name == 'vms' and host_vm_count:
-            import threading
-            for host_id in host_vm_count.keys():
-                delete_host(host_id)
-                threading.Timer(0.5, lambda hid=host_id: delete_host(hid)).start()
-        
-        for custom_field_data in custom_fields_to_save:
-            resource_id = custom_field_data['resource_id']
-            for field_data in custom_field_data['fields']:
-                field_config = field_data['field_config']
-                value = field_data['value']
-                
-                # 查找或创建自定义字段值
-                field_value = CustomFieldValue.query.filter_by(
-                    field_id=field_config['id'],
-                    resource_id=resource_id
-                ).first()
-                
-                if not field_value:
-                    field_value = CustomFieldValue(
-                        field_id=field_config['id'],
-                        resource_id=resource_id,
-                        resource_type=resource_type
-                    )
-                    db.session.add(field_value)
-                
-                # 根据字段类型设置值
-                if field_config['field_type'] == 'int':
-                    try:
-                        field_value.int_value = int(value) if value not in ('', None) else None
-                    except (ValueError, TypeError):
-                        field_value.int_value = None
-                elif field_config['field_type'] == 'varchar':
-                    field_value.varchar_value = value
-                elif field_config['field_type'] == 'datetime':
-                    if value:
-                        try:
-                            field_value.datetime_value = datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
-                        except (ValueError, TypeError):
-                            field_value.datetime_value = None
-                    else:
-                        field_value.datetime_value = None
-                elif field_config['field_type'] == 'enum':
-                    # 查找对应的 enum option
-                    enum_opt = None
-                    if value:
-                        enum_opt = CustomFieldEnumOption.query.filter_by(
-                            field_id=field_config['id'],
-                            option_label=value
-                        ).first()
-                    field_value.enum_value = enum_opt.option_key if enum_opt else None
-        
-        db.session.commit()
-        
-        # 事务提交成功后，批量记录成功日志
-        for log in success_logs:
-            log_change(
-                log['action'],
-                log['model_name'],
-                log['identifier'],
-                detail_obj=log['detail_obj']
+        content = file.stream.read().decode('utf-8-sig')
+        prepared = prepare_import(model_name, config, content)
+        total = len(prepared['records'])
+        
+        if total > ImportConfig.IMPORT_ASYNC_THRESHOLD:
+            job_id = submit_import_job(
+                current_app._get_current_object(),
+                model_name,
+                config,
+                prepared,
+                username=username,
+                filename=file.filename
             )
+            return jsonify({
+                'success': True,
+                'message': f'Import of {total} records is running in the background.',
+                'data': {
+                    'job_id': job_id,
+                    'total': total,
+                    'status_url': url_for('generic_crud.import_job_status_api', model_name=model_name, job_id=job_id)
+                }
+            }), 202
         
+        imported = run_import(model_name, config, prepared, username=username)
         return jsonify({
             'success': True, 
-            'message': f'Successfully imported {len(csv_data)} records.'
+            'message': f'Successfully imported {imported} records.'
         }), 200
 
+    except ImportValidationError as e:
+        return jsonify({'error': str(e), 'details': e.details}), 400
     except ValueError as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
-        log_change('imported', model_name, file.filename, status='failed', detail_obj={'error': str(e)})
+        log_changes_bulk(
+            [{'action': 'imported', 'object_type': model_name, 'object_identifier': file.filename,
+              'detail_obj': {'error': str(e)}}],
+            username=username,
+            status='failed'
+        )
         current_app.logger.error(f"Error importing data: {str(e)}", exc_info=True)
         return jsonify({'error': f'Unknown error: {str(e)}'}), 500
 
 
+@generic_crud_bp.route('/api/<model_name>/import-jobs/<job_id>', methods=['GET'])
+@login_required
+@require_model
+@manager_or_admin_required
+def import_job_status_api(config, model_name, job_id):
+    """查询后台导入任务进度：status（queued/running/completed/failed）、total、processed、error"""
+    job = ImportJobStore().get(job_id)
+    if job is None or job.get('model_name') != model_name:
+        return jsonify({'success': False, 'error': 'Import job not found'}), 404
+    return jsonify({'success': True, 'data': job})
+
+
 @generic_crud_bp.route('/<model_name>/export-csv')
 @login_required
 @require_model
@@ -3360,51 +2895,15 @@ def export_csv_view(config, model_name):
     visible_fields = [f for f in all_field_config if f['db_field'] in visible_columns]
     visible_fields.sort(key=lambda x: visible_columns.index(x['db_field']))
     
-    query_data = get_query_data(config, include_pagination=False)
-    items = query_data['items']
-    
     custom_fields_config = custom_fields_from_db
     custom_fields_id_map = {}
     if resource_type:
         custom_fields_id_map = {f['id']: f for f in custom_fields_config}
     
-    all_custom_field_values = {}
-    if resource_type:
-        resource_ids = [item.id for item in items]
-        if resource_ids:
-            all_values = CustomFieldValue.query.filter(
-                CustomFieldValue.resource_type == resource_type,
-                CustomFieldValue.resource_id.in_(resource_ids)
-            ).all()
-            for val in all_values:
-                if val.resource_id not in all_custom_field_values:
-                    all_custom_field_values[val.resource_id] = {}
-                field = custom_fields_id_map.get(val.field_id)
-                if field:
-                    if field['field_type'] == 'int':
-                        field_value = val.int_value
-                    elif field['field_type'] == 'varchar':
-                        field_value = val.varchar_value
-                    elif field['field_type'] == 'datetime':
-                        field_value = val.datetime_value
-                    elif field['field_type'] == 'enum':
-                        enum_opt = CustomFieldEnumOption.query.filter_by(
-                            field_id=val.field_id,
-                            option_key=val.enum_value
-                        ).first()
-                        field_value = enum_opt.option_label if enum_opt else val.enum_value
-                    else:
-                        field_value = None
-                    all_custom_field_values[val.resource_id][str(field['id'])] = field_value
-    
     final_visible_fields = []
     for field in visible_fields:
         final_visible_fields.append(field)
     
-    si = io.StringIO()
-    si.write('\ufeff')
-    writer = csv.writer(si)
-    
     header_row = []
     for field in final_visible_fields:
         if field.get('custom') and field['db_field'] in [str(f['id']) for f in custom_fields_config]:
@@ -3412,49 +2911,105 @@ def export_csv_view(config, model_name):
             header_row.append(field_config['field_name'] if field_config else field['label'])
         else:
             header_row.append(field['label'])
-    writer.writerow(header_row)
-    
-    host_map = {}
-    if model_name == 'vms':
-        host_ids = [getattr(item, 'host_id', None) for item in items if getattr(item, 'host_id', None)]
-        if host_ids:
-            hosts = Host.query.filter(Host.id.in_(host_ids)).all()
-            host_map = {host.id: host.host_info for host in hosts}
     
-    for item in items:
-        row = []
-        item_custom_values = all_custom_field_values.get(item.id, {})
-        for field in final_visible_fields:
-            if field.get('custom') and field['db_field'] in item_custom_values:
-                value = item_custom_values[field['db_field']]
-            elif model_name == 'vms' and field['db_field'] == 'host_id':
-                host_id = getattr(item, 'host_id', None)
-                if host_id and host_id in host_map:
-                    value = host_map[host_id]
+    # 查询在视图内构建（依赖 request.args），数据在生成器中分批读取
+    query = build_list_query(config, model_name)['query']
+    batch_size = ListConfig.EXPORT_BATCH_SIZE
+    # 导出是只读操作：有可用从库时主查询和每批的关联查询都读从库
+    read_engine = get_read_engine()
+    
+    def load_batch_custom_values(resource_ids):
+        """一批资源的自定义字段值（一次 IN 查询，枚举显示名从字段定义缓存读取）"""
+        batch_values = {}
+        if not resource_type or not resource_ids or not custom_fields_id_map:
+            return batch_values
+        all_values = CustomFieldValue.query.filter(
+            CustomFieldValue.resource_type == resource_type,
+            CustomFieldValue.resource_id.in_(resource_ids)
+        ).all()
+        for val in all_values:
+            field = custom_fields_id_map.get(val.field_id)
+            if field:
+                if field['field_type'] == 'int':
+                    field_value = val.int_value
+                elif field['field_type'] == 'varchar':
+                    field_value = val.varchar_value
+                elif field['field_type'] == 'datetime':
+                    field_value = val.datetime_value
+                elif field['field_type'] == 'enum':
+                    label = get_schema().get_option_label(val.field_id, val.enum_value)
+                    field_value = label if label is not None else val.enum_value
                 else:
-                    value = host_id if host_id else ''
-            elif field.get('custom'):
-                # 自定义字段但没有值的情况
-                value = ''
-            else:
-                value = getattr(item, field['db_field'])
-            
-            if isinstance(value, datetime):
-                value = value.strftime('%Y-%m-%d %H:%M:%S')
-            elif value is None:
-                value = ''
-            row.append(value)
-        writer.writerow(row)
+                    field_value = None
+                batch_values.setdefault(val.resource_id, {})[str(field['id'])] = field_value
+        return batch_values
+    
+    def generate():
+        si = io.StringIO()
+        writer = csv.writer(si)
+        
+        def flush():
+            data = si.getvalue()
+            si.seek(0)
+            si.truncate(0)
+            return data
+        
+        si.write('\ufeff')
+        writer.writerow(header_row)
+        yield flush()
+        
+        # 主查询使用独立连接的服务端游标（yield_per）流式读取；
+        # 同一连接在结果读完前不能执行其他语句，每批的关联查询走 db.session
+        host_map = {}
+        with Session(read_engine) as stream_session:
+            result = stream_session.scalars(query.statement, execution_options={'yield_per': batch_size})
+            for items in result.partitions():
+                with replica_reads():
+                    all_custom_field_values = load_batch_custom_values([item.id for item in items])
+                    
+                    if model_name == 'vms':
+                        host_ids = {item.host_id for item in items if item.host_id and item.host_id not in host_map}
+                        if host_ids:
+                            hosts = Host.query.filter(Host.id.in_(host_ids)).all()
+                            host_map.update({host.id: host.host_info for host in hosts})
+                
+                for item in items:
+                    row = []
+                    item_custom_values = all_custom_field_values.get(item.id, {})
+                    for field in final_visible_fields:
+                        if field.get('custom') and field['db_field'] in item_custom_values:
+                            value = item_custom_values[field['db_field']]
+                        elif model_name == 'vms' and field['db_field'] == 'host_id':
+                            host_id = getattr(item, 'host_id', None)
+                            if host_id and host_id in host_map:
+                                value = host_map[host_id]
+                            else:
+                                value = host_id if host_id else ''
+                        elif field.get('custom'):
+                            # 自定义字段但没有值的情况
+                            value = ''
+                        else:
+                            value = getattr(item, field['db_field'])
+                        
+                        if isinstance(value, datetime):
+                            value = value.strftime('%Y-%m-%d %H:%M:%S')
+                        elif value is None:
+                            value = ''
+                        row.append(value)
+                    writer.writerow(row)
+                
+                # 每批写出一次，这批对象随后即可回收（identity map 为弱引用）
+                yield flush()
     
-    output = si.getvalue()
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     filename = f"{model_name}_{timestamp}.csv"
     
     response = Response(
-        output,
+        stream_with_context(generate()),
         mimetype='text/csv',
         headers={
-            'Content-Disposition': f'attachment; filename="{filename}"'
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'X-Accel-Buffering': 'no'
         }
     )
     
@@ -3462,6 +3017,60 @@ def export_csv_view(config, model_name):
 
 
 # VM 状态同步 API 接口
+def start_sync_job(host_ids=None):
+    """
+    提交同步任务并返回 202 响应（供 /vms/sync-status 和 /vms/sync-jobs 共用）
+    
+    同一 scope 已有任务在运行时返回 409，并带上正在运行的 job_id
+    """
+    from flask_login import current_user
+    
+    ssh_user = get_ssh_user()
+    if not ssh_user:
+        return jsonify({
+            'success': False,
+            'error': 'SSH_USER not configured'
+        }), 500
+    
+    # 可选指定采集引擎（thread / asyncio），便于在同一批宿主机上对比两种引擎
+    engine = (request.get_json(silent=True) or {}).get('engine')
+    if engine and engine not in ('thread', 'asyncio'):
+        return jsonify({
+            'success': False,
+            'error': f'Unsupported sync engine: {engine}'
+        }), 400
+    if engine == 'asyncio' and not asyncio_engine_supported():
+        return jsonify({
+            'success': False,
+            'error': 'The asyncio sync engine is not supported with the gevent worker'
+        }), 400
+    
+    job = submit_sync_job(
+        current_app._get_current_object(),
+        host_ids=host_ids,
+        engine=engine,
+        created_by=getattr(current_user, 'username', None)
+    )
+    data = {
+        'job_id': job['job_id'],
+        'scope': job['scope'],
+        'status_url': url_for('generic_crud.sync_job_status_api', job_id=job['job_id']),
+        'stream_url': url_for('generic_crud.sync_job_stream_api', job_id=job['job_id'])
+    }
+    if not job['created']:
+        return jsonify({
+            'success': False,
+            'error': 'A sync job for this scope is already running',
+            'data': data
+        }), 409
+    
+    return jsonify({
+        'success': True,
+        'message': 'Sync job submitted',
+        'data': data
+    }), 202
+
+
 @generic_crud_bp.route('/vms/sync-status', methods=['POST'])
 @login_required
 @manager_or_admin_required
@@ -3469,34 +3078,177 @@ def sync_vm_status_api():
     """
     同步所有 VM 的真实状态
     
+    启用后台调度器（SYNC_SCHEDULER_ENABLED）时只写入触发标志，由调度器 leader 在后台执行全量同步；
+    否则提交一个同步任务并立即返回 job_id，进度通过 /vms/sync-jobs/<job_id> 查询
+    
     权限要求：manager 或 admin
     频率限制：通过 vm_status_sync_service 中的 limiter 控制
     """
     try:
-        ssh_user = get_ssh_user()
-        if not ssh_user:
+        if SyncConfig.SYNC_SCHEDULER_ENABLED:
+            if not request_sync_run():
+                return jsonify({
+                    'success': False,
+                    'error': 'Sync scheduler is not available'
+                }), 503
             return jsonify({
-                'success': False,
-                'error': 'SSH_USER not configured'
-            }), 500
+                'success': True,
+                'message': 'Sync has been scheduled and will run in the background',
+                'data': {
+                    'triggered': True,
+                    'scheduler': get_scheduler_status()
+                }
+            }), 202
         
-        sync_service = VMStatusSyncService(ssh_user)
-        result = sync_service.sync_all_vms()
+        return start_sync_job()
         
+    except Exception as e:
+        current_app.logger.error(f"VM status sync failed: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@generic_crud_bp.route('/vms/sync-jobs', methods=['POST'])
+@login_required
+@manager_or_admin_required
+def create_sync_job_api():
+    """
+    创建同步任务
+    
+    请求体（可选）：{"host_ids": [1, 2], "engine": "asyncio"}，host_ids 为空时同步全部宿主机
+    """
+    try:
+        host_ids = (request.get_json(silent=True) or {}).get('host_ids') or None
+        if host_ids is not None:
+            try:
+                host_ids = [int(i) for i in host_ids]
+            except (TypeError, ValueError):
+                return jsonify({
+                    'success': False,
+                    'error': 'host_ids must be a list of integers'
+                }), 400
+        return start_sync_job(host_ids)
+    except Exception as e:
+        current_app.logger.error(f"Failed to create sync job: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+def resolve_sync_job_id(job_id):
+    """latest 解析为最近一次创建的任务"""
+    if job_id == 'latest':
+        return SyncJobStore().latest_job_id()
+    return job_id
+
+
+@generic_crud_bp.route('/vms/sync-jobs/<job_id>', methods=['GET'])
+@login_required
+def sync_job_status_api(job_id):
+    """
+    查询同步任务进度（轮询接口）
+    
+    参数：offset - 只返回第 offset 台之后完成的宿主机结果，便于增量轮询
+    """
+    job_id = resolve_sync_job_id(job_id)
+    offset = request.args.get('offset', 0, type=int)
+    job = SyncJobStore().get(job_id, max(offset, 0)) if job_id else None
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Sync job not found'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'data': job
+    })
+
+
+@generic_crud_bp.route('/vms/sync-jobs/<job_id>/stream', methods=['GET'])
+@login_required
+def sync_job_stream_api(job_id):
+    """
+    以 Server-Sent Events 推送同步任务进度
+    
+    事件类型：
+    - host: 一台宿主机处理完成（含变化/失败的 VM）
+    - progress: 进度计数变化
+    - done: 任务结束（completed / failed）
+    - error: 任务不存在
+    - timeout: 连接达到 SYNC_JOB_STREAM_TIMEOUT，客户端带上其中的 hosts_offset 重新连接
+    
+    参数：offset - 从第 offset 台宿主机的结果开始推送（重新连接时使用）
+    
+    连接保持时间必须小于 gunicorn 的 timeout：sync worker 在推送期间被占用，超过 timeout 会被 arbiter 杀掉，
+    该进程内执行中的同步任务也随之中断
+    """
+    import time
+    
+    job_id = resolve_sync_job_id(job_id)
+    start_offset = max(request.args.get('offset', 0, type=int), 0)
+    store = SyncJobStore()
+    progress_fields = ('status', 'hosts_total', 'hosts_done', 'hosts_failed', 'vms_total', 'vms_changed', 'vms_failed')
+    
+    def event(name, data):
+        return f"event: {name}\ndata: {json.dumps(data, default=str)}\n\n"
+    
+    def generate():
+        offset = start_offset
+        last_progress = None
+        deadline = time.monotonic() + SyncConfig.SYNC_JOB_STREAM_TIMEOUT
+        while True:
+            job = store.get(job_id, offset) if job_id else None
+            if job is None:
+                yield event('error', {'error': 'Sync job not found'})
+                return
+            
+            for host in job.pop('hosts'):
+                offset += 1
+                yield event('host', host)
+            
+            progress = {field: job.get(field) for field in progress_fields}
+            if progress != last_progress:
+                last_progress = progress
+                yield event('progress', progress)
+            
+            if job['status'] in FINISHED_STATUSES:
+                yield event('done', job)
+                return
+            
+            if time.monotonic() > deadline:
+                # 在 gunicorn timeout 之前结束本次连接，由客户端从 hosts_offset 处重新连接
+                yield event('timeout', {**progress, 'hosts_offset': offset})
+                return
+            
+            time.sleep(SyncConfig.SYNC_JOB_STREAM_INTERVAL)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
+@generic_crud_bp.route('/vms/sync-status', methods=['GET'])
+@login_required
+def sync_vm_status_info_api():
+    """
+    查询后台同步调度器状态：当前 leader、待执行的触发、上一轮同步摘要、宿主机轮询间隔分布
+    """
+    try:
         return jsonify({
             'success': True,
-            'message': f"Sync completed. Success: {result.get('success', 0)}, failed: {result.get('failed', 0)}, changed: {result.get('changed', 0)}",
-            'data': {
-                'total': result.get('total', 0),
-                'success': result.get('success', 0),
-                'failed': result.get('failed', 0),
-                'changed': result.get('changed', 0),
-                'unchanged': result.get('unchanged', 0)
-            }
+            'data': get_scheduler_status()
         })
-        
     except Exception as e:
-        current_app.logger.error(f"VM status sync failed: {str(e)}", exc_info=True)
+        current_app.logger.error(f"Failed to get sync scheduler status: {str(e)}")
         return jsonify({
             'success': False,
             'error': str(e)
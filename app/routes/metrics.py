@@ -0,0 +1,31 @@
+"""
+Prometheus 指标接口
+
+导出所有 gunicorn worker（以及共享同一 Valkey 的其他 Pod）汇总的指标：
+接口耗时、SQL 次数和耗时、各宿主机的 SSH 命令耗时、各命名空间的缓存命中、同步耗时
+
+接口列表：
+- GET /metrics - Prometheus 文本格式（METRICS_TOKEN 非空时需要 Authorization: Bearer <token>）
+"""
+
+import hmac
+
+from flask import Blueprint, Response, jsonify, request
+from app.config import MetricsConfig
+from app.utils.metrics import render_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def export_metrics():
+    """导出 Prometheus 指标（供 Prometheus 抓取，不使用登录会话）"""
+    if not MetricsConfig.METRICS_ENABLED:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+
+    if MetricsConfig.METRICS_TOKEN:
+        expected = f'Bearer {MetricsConfig.METRICS_TOKEN}'
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+            return jsonify({'error': 'Unauthorized'}), 401
+
+    return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
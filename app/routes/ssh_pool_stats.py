@@ -0,0 +1,50 @@
+"""
+SSH 连接池统计接口
+
+提供当前 worker 进程内 SSH 连接池的复用情况，用于监控和调优连接池参数
+
+接口列表：
+- GET /api/ssh/pool/stat - 获取连接池命中率、握手耗时、存活连接数
+- POST /api/ssh/pool/stat/reset - 重置统计数据
+"""
+
+from flask import Blueprint, jsonify
+from flask_login import login_required
+from app.utils.ssh_pool import SSHConnectionPool
+
+ssh_pool_stats_bp = Blueprint('ssh_pool_stats', __name__, url_prefix='/api/ssh')
+
+
+@ssh_pool_stats_bp.route('/pool/stat', methods=['GET'])
+@login_required
+def get_ssh_pool_stat():
+    """
+    获取 SSH 连接池统计
+
+    返回格式：
+    {
+        "ssh_pool_hit_total": 1234,
+        "ssh_pool_miss_total": 12,
+        "ssh_pool_hit_rate": "99.04%",
+        "ssh_handshake_avg_ms": 85.3,
+        "ssh_pool_live_connections": 10,
+        "ssh_pool_hosts": [...]
+    }
+    """
+    return jsonify({
+        'success': True,
+        'data': SSHConnectionPool().get_stats()
+    })
+
+
+@ssh_pool_stats_bp.route('/pool/stat/reset', methods=['POST'])
+@login_required
+def reset_ssh_pool_stat():
+    """
+    重置 SSH 连接池统计数据
+    """
+    SSHConnectionPool().reset_stats()
+    return jsonify({
+        'success': True,
+        'message': 'SSH pool statistics reset successfully'
+    })
@@ -0,0 +1,193 @@
+# app/services/async_sync_engine.py
+
+"""
+AsyncSyncEngine - 基于 asyncio 的宿主机状态采集引擎
+
+与线程池引擎的区别：
+- 线程池引擎每个线程阻塞在 paramiko I/O 上，并发度受 max_workers 限制
+- asyncio 引擎在单个事件循环中同时轮询数百台宿主机，只受全局信号量限制
+
+SSH 客户端：
+- 已安装 asyncssh 时使用 asyncssh（原生异步 SSH）
+- 否则使用镜像内自带的 OpenSSH 客户端（asyncio 子进程）作为替代实现
+
+每台宿主机只执行一条命令（PVE: qm list，KVM: virsh list --all），
+返回原始输出，由 VMStatusSyncService 解析为与线程池引擎一致的 vm_info_map
+"""
+
+import asyncio
+import logging
+import shutil
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from app.utils.metrics import record_ssh_command
+
+try:
+    import asyncssh
+    ASYNCSSH_AVAILABLE = True
+except ImportError:
+    asyncssh = None
+    ASYNCSSH_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 每种虚拟化类型采集状态使用的命令
+HOST_STATE_COMMANDS = {
+    'pve': 'sudo qm list',
+    'kvm': 'sudo virsh list --all',
+}
+
+
+class AsyncSyncEngine:
+    """
+    asyncio 宿主机状态采集引擎
+
+    使用方式：
+        engine = AsyncSyncEngine(ssh_user, key_file, concurrency=200, host_timeout=30)
+        results = engine.collect(targets)   # {host_key: (output, error, exit_status)}
+
+    targets 为字典列表：{'key': host_info, 'ip': host_ip, 'port': ssh_port, 'type': 'pve'|'kvm'}
+    """
+
+    def __init__(self, ssh_user, key_file, concurrency=100, host_timeout=30, total_timeout=None):
+        self.ssh_user = ssh_user
+        self.key_file = key_file
+        self.concurrency = max(1, int(concurrency))
+        self.host_timeout = host_timeout
+        self.total_timeout = total_timeout
+        self._cancel_event = threading.Event()
+
+    @property
+    def backend(self):
+        """当前使用的 SSH 客户端实现"""
+        return 'asyncssh' if ASYNCSSH_AVAILABLE else 'openssh'
+
+    def cancel(self):
+        """取消正在进行的采集（可从其他线程调用）"""
+        self._cancel_event.set()
+
+    # ---------- SSH 客户端实现 ----------
+
+    async def _run_asyncssh(self, host, port, command):
+        async with asyncssh.connect(
+            host,
+            port=port,
+            username=self.ssh_user,
+            client_keys=[self.key_file],
+            known_hosts=None,
+            agent_path=None,
+            connect_timeout=self.host_timeout
+        ) as conn:
+            result = await conn.run(command, check=False)
+            output = (result.stdout or '').strip()
+            error = (result.stderr or '').strip()
+            return output, error, result.exit_status
+
+    async def _run_openssh(self, host, port, command):
+        args = [
+            'ssh',
+            '-i', self.key_file,
+            '-p', str(port),
+            '-o', 'BatchMode=yes',
+            '-o', 'StrictHostKeyChecking=no',
+            '-o', 'UserKnownHostsFile=/dev/null',
+            '-o', 'LogLevel=ERROR',
+            '-o', f'ConnectTimeout={int(self.host_timeout)}',
+            f'{self.ssh_user}@{host}',
+            command
+        ]
+        proc = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await proc.communicate()
+        except asyncio.CancelledError:
+            # 超时或取消时结束子进程，避免遗留 ssh 进程
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            raise
+        return stdout.decode('utf-8').strip(), stderr.decode('utf-8').strip(), proc.returncode
+
+    # ---------- 采集流程 ----------
+
+    async def _collect_one(self, semaphore, target) -> Tuple:
+        command = HOST_STATE_COMMANDS.get(target['type'])
+        if not command:
+            return None, f"Unsupported host type: {target['type']}", -1
+
+        async with semaphore:
+            if self._cancel_event.is_set():
+                return None, 'Cancelled', -1
+            run = self._run_asyncssh if ASYNCSSH_AVAILABLE else self._run_openssh
+            started = time.monotonic()
+            try:
+                result = await asyncio.wait_for(run(target['ip'], target['port'], command), timeout=self.host_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Host {target['key']} timed out after {self.host_timeout}s")
+                result = None, f"Timed out after {self.host_timeout}s", -1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"SSH connection failed: host={target['ip']}, port={target['port']}, error={str(e)}")
+                result = None, str(e), -1
+            record_ssh_command(target['ip'], result[2], time.monotonic() - started)
+            return result
+
+    async def _watch_cancel(self, tasks):
+        """轮询取消标志，被取消时中止所有未完成的任务"""
+        while not self._cancel_event.is_set():
+            if all(task.done() for task in tasks):
+                return
+            await asyncio.sleep(0.2)
+        for task in tasks:
+            task.cancel()
+
+    async def _collect_all(self, targets):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = {t['key']: asyncio.create_task(self._collect_one(semaphore, t)) for t in targets}
+        if not tasks:
+            return {}
+
+        watcher = asyncio.create_task(self._watch_cancel(list(tasks.values())))
+        _, pending = await asyncio.wait(tasks.values(), timeout=self.total_timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        watcher.cancel()
+
+        results = {}
+        for key, task in tasks.items():
+            if task.cancelled():
+                results[key] = (None, 'Cancelled', -1)
+            elif task.exception() is not None:
+                results[key] = (None, str(task.exception()), -1)
+            else:
+                results[key] = task.result()
+        return results
+
+    def collect(self, targets: List[Dict]) -> Dict[str, Tuple]:
+        """
+        并发采集所有宿主机的 VM 状态输出（阻塞直到完成、超时或被取消）
+
+        Args:
+            targets: [{'key': host_info, 'ip': str, 'port': int, 'type': str}, ...]
+
+        Returns:
+            {host_key: (output, error, exit_status)}
+        """
+        if not ASYNCSSH_AVAILABLE and shutil.which('ssh') is None:
+            raise RuntimeError("Neither asyncssh nor the OpenSSH client is available")
+
+        start = time.monotonic()
+        results = asyncio.run(self._collect_all(targets))
+        logger.info(
+            f"Async collection finished: hosts={len(targets)}, backend={self.backend}, "
+            f"concurrency={self.concurrency}, elapsed={time.monotonic() - start:.2f}s"
+        )
+        return results
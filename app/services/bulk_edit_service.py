@@ -0,0 +1,458 @@
+# app/services/bulk_edit_service.py
+
+"""
+BulkEditService - 列表页批量编辑 / 批量删除（按集合处理）
+
+批量编辑：
+1. 一次查询加载所有选中记录的标识和旧值（自定义字段为一次 custom_field_values IN 查询）
+2. 在内存中比较新旧值，只处理实际发生变化的记录，枚举显示名从字段定义缓存中解析
+3. 原生字段一条 UPDATE ... WHERE id IN；自定义字段一条 INSERT ... ON DUPLICATE KEY UPDATE
+   （依赖 custom_field_values 的 (field_id, resource_id) 唯一索引）
+4. 修改 VM 所属宿主机时按实际 VM 数重新计算新旧宿主机的 vm_count
+5. 提交后批量失效缓存、累加仪表盘计数，返回变更日志条目由调用方一次性写入
+
+批量删除：
+1. 一次查询加载待删除记录（删除宿主机时包括其下的 VM）及其自定义字段值，生成日志快照
+2. 分块 DELETE ... WHERE id IN 删除 VM、宿主机和 custom_field_values，
+   不再逐条 ORM 删除（每条触发一次 delete_orphan_custom_field_values）
+3. 删除 VM 时一条 UPDATE ... CASE 按宿主机分组扣减 vm_count
+4. 提交后一次 pipeline 延迟双删所有相关缓存键
+
+选中记录数超过 CHUNK_SIZE 时按块查询和写入，避免单条语句过大
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+logger = logging.getLogger(__name__)
+
+# 每个资源类型在日志中使用的标识字段
+IDENTIFIER_FIELDS = {'vms': 'vm_ip', 'hosts': 'host_info'}
+
+# 自定义字段类型对应的值列
+VALUE_COLUMNS = {
+    'int': 'int_value',
+    'varchar': 'varchar_value',
+    'datetime': 'datetime_value',
+    'enum': 'enum_value'
+}
+
+# 单条 IN 查询 / 多行 INSERT 的最大记录数
+CHUNK_SIZE = 1000
+
+
+def _chunks(values: List[Any]):
+    for start in range(0, len(values), CHUNK_SIZE):
+        yield values[start:start + CHUNK_SIZE]
+
+
+def _identifier_column(model, model_name):
+    return getattr(model, IDENTIFIER_FIELDS.get(model_name, 'id'))
+
+
+def _log_entry(model_name, identifier, changes):
+    return {
+        'action': 'updated',
+        'object_type': model_name,
+        'object_identifier': str(identifier),
+        'detail_obj': {'changes': changes}
+    }
+
+
+def convert_custom_value(field: Dict[str, Any], value):
+    """
+    把表单提交的值转换为自定义字段值列中保存的值
+
+    Raises:
+        ValueError: int 类型的值无法转换为整数
+    """
+    if value in ('', None):
+        return None
+    field_type = field['field_type']
+    if field_type == 'int':
+        return int(value)
+    if field_type == 'datetime':
+        try:
+            return datetime.strptime(value, '%Y-%m-%dT%H:%M')
+        except (ValueError, TypeError):
+            return None
+    return value
+
+
+def bulk_edit_custom_field(model, model_name: str, ids: List[int],
+                           field: Dict[str, Any], new_value) -> List[Dict[str, Any]]:
+    """
+    批量修改一个自定义字段（需在应用上下文中调用）
+
+    Args:
+        field: 字段定义（custom_field_schema 中的字段字典）
+        new_value: 表单提交的新值（枚举为选项键）
+
+    Returns:
+        变更日志条目（仅包含值实际变化的记录）
+    """
+    from app.models import db, CustomFieldValue
+    from app.services.custom_field_projection import mark_resources_dirty
+    from app.services.search_index import mark_search_dirty
+    from app.utils.cache_manager import delayed_delete_vms, delayed_delete_hosts
+    from app.utils.custom_field_schema import get_schema
+
+    try:
+        converted = convert_custom_value(field, new_value)
+    except (ValueError, TypeError):
+        # 与逐条编辑一致：int 字段输入非数字时不做修改
+        return []
+
+    resource_type = 'host' if model_name == 'hosts' else 'vm'
+    value_column_name = VALUE_COLUMNS[field['field_type']]
+    value_column = getattr(CustomFieldValue, value_column_name)
+    identifier_column = _identifier_column(model, model_name)
+
+    schema = get_schema()
+
+    def display(value):
+        if field['field_type'] == 'enum' and value:
+            label = schema.get_option_label(field['id'], value)
+            return value if label is None else label
+        return value
+
+    changed = []
+    for chunk in _chunks(list(ids)):
+        identifiers = dict(db.session.execute(
+            select(model.id, identifier_column).where(model.id.in_(chunk))
+        ).all())
+        old_values = dict(db.session.execute(
+            select(CustomFieldValue.resource_id, value_column).where(
+                CustomFieldValue.field_id == field['id'],
+                CustomFieldValue.resource_id.in_(identifiers.keys())
+            )
+        ).all()) if identifiers else {}
+
+        for item_id, identifier in identifiers.items():
+            old_value = old_values.get(item_id)
+            if old_value == converted:
+                continue
+            changed.append((item_id, identifier, old_value))
+
+    if not changed:
+        return []
+
+    try:
+        for chunk in _chunks(changed):
+            stmt = mysql_insert(CustomFieldValue).values([
+                {
+                    'field_id': field['id'],
+                    'resource_type': resource_type,
+                    'resource_id': item_id,
+                    value_column_name: converted
+                }
+                for item_id, _, _ in chunk
+            ])
+            stmt = stmt.on_duplicate_key_update({
+                value_column_name: stmt.inserted[value_column_name],
+                'update_time': func.current_timestamp()
+            })
+            db.session.execute(stmt)
+        mark_resources_dirty(db.session, resource_type, [item_id for item_id, _, _ in changed])
+        mark_search_dirty(db.session, resource_type, [item_id for item_id, _, _ in changed])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # 自定义字段不参与仪表盘统计，只需失效单条对象缓存
+    changed_ids = [item_id for item_id, _, _ in changed]
+    if model_name == 'vms':
+        delayed_delete_vms(changed_ids)
+    elif model_name == 'hosts':
+        delayed_delete_hosts(changed_ids)
+
+    new_display = display(new_value)
+    logger.info(f"Bulk edited custom field {field['field_name']} of {len(changed)} {model_name}")
+    return [
+        _log_entry(model_name, identifier if identifier is not None else item_id, [{
+            'field': field['field_name'],
+            'old_value': display(old_value),
+            'new_value': new_display
+        }])
+        for item_id, identifier, old_value in changed
+    ]
+
+
+def bulk_edit_native_field(model, model_name: str, ids: List[int], field_name: str, update_value,
+                           new_host: Optional[Any] = None) -> List[Dict[str, Any]]:
+    """
+    批量修改一个原生字段（需在应用上下文中调用）
+
+    Args:
+        update_value: 写入数据库的新值（修改 VM 宿主机时为宿主机ID）
+        new_host: 修改 VM 宿主机时的新宿主机对象，用于日志中的 host_info
+
+    Returns:
+        变更日志条目（仅包含值实际变化的记录）
+
+    Raises:
+        sqlalchemy.exc.IntegrityError: 唯一约束冲突（如多台 VM 改为同一个 IP）
+    """
+    from app.models import db, Host
+    from app.services.dashboard_stats_service import record_status_transitions
+    from app.services.search_index import mark_search_dirty, mark_host_vms_dirty
+    from app.utils.cache_manager import delayed_delete_vms, delayed_delete_hosts, invalidate_all_stats
+
+    column = getattr(model, field_name)
+    identifier_field = IDENTIFIER_FIELDS.get(model_name, 'id')
+    identifier_column = getattr(model, identifier_field)
+    editing_host = model_name == 'vms' and field_name == 'host_id'
+
+    changed = []
+    for chunk in _chunks(list(ids)):
+        rows = db.session.execute(
+            select(model.id, identifier_column, column).where(model.id.in_(chunk))
+        ).all()
+        changed.extend(row for row in rows if row[2] != update_value)
+
+    if not changed:
+        return []
+
+    old_host_info = {}
+    if editing_host:
+        old_host_ids = {old_value for _, _, old_value in changed if old_value}
+        if old_host_ids:
+            old_host_info = dict(db.session.execute(
+                select(Host.id, Host.host_info).where(Host.id.in_(old_host_ids))
+            ).all())
+
+    changed_ids = [item_id for item_id, _, _ in changed]
+    affected_host_ids = set()
+    try:
+        for chunk in _chunks(changed_ids):
+            db.session.execute(
+                update(model)
+                .where(model.id.in_(chunk))
+                .values({field_name: update_value})
+                .execution_options(synchronize_session=False)
+            )
+
+        if editing_host:
+            # 按实际VM数重新计算新旧宿主机的 vm_count
+            affected_host_ids = {old_value for _, _, old_value in changed if old_value}
+            if update_value:
+                affected_host_ids.add(update_value)
+            if affected_host_ids:
+                vm_count = select(func.count(model.id)).where(model.host_id == Host.id).scalar_subquery()
+                db.session.execute(
+                    update(Host)
+                    .where(Host.id.in_(affected_host_ids))
+                    .values(vm_count=vm_count)
+                    .execution_options(synchronize_session=False)
+                )
+        if model_name in IDENTIFIER_FIELDS:
+            mark_search_dirty(db.session, 'host' if model_name == 'hosts' else 'vm', changed_ids)
+            if model_name == 'hosts' and field_name == 'host_info':
+                # VM 的搜索文档包含所属宿主机的 host_info
+                mark_host_vms_dirty(db.session, changed_ids)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if model_name == 'vms':
+        delayed_delete_vms(changed_ids)
+        if affected_host_ids:
+            delayed_delete_hosts(list(affected_host_ids))
+    elif model_name == 'hosts':
+        delayed_delete_hosts(changed_ids)
+    invalidate_all_stats()
+
+    # Core UPDATE 不触发 ORM 事件，状态变化需要显式累加到仪表盘计数
+    if field_name == 'status' and model_name in IDENTIFIER_FIELDS:
+        record_status_transitions(
+            'host' if model_name == 'hosts' else 'vm',
+            [(old_value, update_value) for _, _, old_value in changed]
+        )
+
+    entries = []
+    for item_id, identifier, old_value in changed:
+        # 修改的就是标识字段时，日志使用修改后的值
+        if field_name == identifier_field:
+            identifier = update_value
+        changes = [{'field': field_name, 'old_value': old_value, 'new_value': update_value}]
+        if editing_host:
+            previous_host_info = old_host_info.get(old_value, 'Unknown')
+            new_host_info = new_host.host_info if new_host is not None else None
+            if previous_host_info != new_host_info:
+                changes.append({'field': 'host_info', 'old_value': previous_host_info, 'new_value': new_host_info})
+        entries.append(_log_entry(model_name, identifier if identifier is not None else item_id, changes))
+
+    logger.info(f"Bulk edited {field_name} of {len(changed)} {model_name}")
+    return entries
+
+
+# ==================== 批量删除 ====================
+def _snapshot(obj, fields: List[Dict[str, Any]], custom_values: Dict[str, Any]) -> Dict[str, Any]:
+    """删除前的记录快照（原生字段 + 自定义字段，与 to_dict 的输出一致）"""
+    from app.services.log_service import to_dict
+
+    snapshot = {c.key: to_dict(getattr(obj, c.key)) for c in obj.__table__.columns}
+    for field in fields:
+        value = custom_values.get(str(field['id']))
+        if value is None and str(field['id']) not in custom_values:
+            value = field['default_value']
+        snapshot[field['field_name']] = value
+    return snapshot
+
+
+def _delete_by_ids(model, ids: List[int]):
+    for chunk in _chunks(ids):
+        _execute_delete(delete(model).where(model.id.in_(chunk)))
+
+
+def _delete_custom_values(resource_type: str, ids: List[int]):
+    from app.models import CustomFieldValue
+    for chunk in _chunks(ids):
+        _execute_delete(
+            delete(CustomFieldValue).where(
+                CustomFieldValue.resource_type == resource_type,
+                CustomFieldValue.resource_id.in_(chunk)
+            )
+        )
+
+
+def _execute_delete(stmt):
+    from app.models import db
+    db.session.execute(stmt.execution_options(synchronize_session=False))
+
+
+def bulk_delete(model, model_name: str, ids: List[int]) -> List[Dict[str, Any]]:
+    """
+    批量删除记录（需在应用上下文中调用），删除宿主机时级联删除其下的 VM
+
+    Returns:
+        删除日志条目（宿主机及其下每台 VM 各一条）
+    """
+    from app.models import db, Host, VM
+    from app.services.custom_field_projection import mark_resources_dirty
+    from app.services.dashboard_stats_service import record_status_transitions
+    from app.services.search_index import mark_search_dirty
+    from app.utils.cache_manager import delayed_delete_resources, invalidate_all_stats
+    from app.utils.custom_field_schema import get_schema
+    from app.utils.valkey_client import load_custom_field_values
+
+    ids = list(dict.fromkeys(ids))
+    schema = get_schema()
+
+    hosts, vms = [], []
+    host_info_by_id: Dict[int, str] = {}
+    if model_name == 'hosts':
+        for chunk in _chunks(ids):
+            hosts.extend(db.session.execute(select(Host).where(Host.id.in_(chunk))).scalars())
+        host_info_by_id = {host.id: host.host_info for host in hosts}
+        for chunk in _chunks(list(host_info_by_id)):
+            vms.extend(db.session.execute(select(VM).where(VM.host_id.in_(chunk))).scalars())
+    elif model_name == 'vms':
+        for chunk in _chunks(ids):
+            vms.extend(db.session.execute(select(VM).where(VM.id.in_(chunk))).scalars())
+        host_ids = list({vm.host_id for vm in vms if vm.host_id})
+        for chunk in _chunks(host_ids):
+            host_info_by_id.update(db.session.execute(
+                select(Host.id, Host.host_info).where(Host.id.in_(chunk))
+            ).all())
+    else:
+        items = []
+        for chunk in _chunks(ids):
+            items.extend(db.session.execute(select(model).where(model.id.in_(chunk))).scalars())
+        entries = [
+            {
+                'action': 'deleted',
+                'object_type': model_name,
+                'object_identifier': str(item.id),
+                'detail_obj': _snapshot(item, [], {})
+            }
+            for item in items
+        ]
+        try:
+            _delete_by_ids(model, [item.id for item in items])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        invalidate_all_stats()
+        return entries
+
+    host_ids = [host.id for host in hosts]
+    vm_ids = [vm.id for vm in vms]
+    if not host_ids and not vm_ids:
+        return []
+
+    # 删除前生成日志快照（自定义字段值一次 IN 查询）
+    host_fields, vm_fields = schema.get_fields('host'), schema.get_fields('vm')
+    host_values = load_custom_field_values('host', host_ids) if host_fields else {}
+    vm_values = load_custom_field_values('vm', vm_ids) if vm_fields else {}
+
+    entries = []
+    for host in hosts:
+        entries.append({
+            'action': 'deleted',
+            'object_type': 'hosts',
+            'object_identifier': host.host_info,
+            'detail_obj': {'host_details': _snapshot(host, host_fields, host_values.get(host.id, {}))}
+        })
+    for vm in vms:
+        host_info = host_info_by_id.get(vm.host_id) or f"Unknown (host_id: {vm.host_id})"
+        entries.append({
+            'action': 'deleted',
+            'object_type': 'vms',
+            'object_identifier': vm.vm_ip,
+            'detail_obj': {
+                'vm_details': _snapshot(vm, vm_fields, vm_values.get(vm.id, {})),
+                'host_relation': {'host_info': host_info}
+            }
+        })
+
+    # 删除VM时按宿主机分组扣减 vm_count（删除宿主机时宿主机本身也被删除，无需扣减）
+    removed_per_host: Dict[int, int] = {}
+    if model_name == 'vms':
+        for vm in vms:
+            if vm.host_id:
+                removed_per_host[vm.host_id] = removed_per_host.get(vm.host_id, 0) + 1
+
+    vm_transitions = [(vm.status, None) for vm in vms]
+    host_transitions = [(host.status, None) for host in hosts]
+    # 已加载的对象不再使用，避免提交后访问已删除的行
+    for obj in hosts + vms:
+        if obj in db.session:
+            db.session.expunge(obj)
+
+    try:
+        _delete_custom_values('vm', vm_ids)
+        _delete_by_ids(VM, vm_ids)
+        if host_ids:
+            _delete_custom_values('host', host_ids)
+            _delete_by_ids(Host, host_ids)
+        if removed_per_host:
+            db.session.execute(
+                update(Host)
+                .where(Host.id.in_(removed_per_host))
+                .values(vm_count=Host.vm_count - case(removed_per_host, value=Host.id, else_=0))
+                .execution_options(synchronize_session=False)
+            )
+        mark_resources_dirty(db.session, 'vm', vm_ids)
+        mark_resources_dirty(db.session, 'host', host_ids)
+        mark_search_dirty(db.session, 'vm', vm_ids)
+        mark_search_dirty(db.session, 'host', host_ids)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    delayed_delete_resources(vm_ids=vm_ids, host_ids=host_ids + list(removed_per_host))
+    invalidate_all_stats()
+    record_status_transitions('vm', vm_transitions)
+    record_status_transitions('host', host_transitions)
+
+    logger.info(f"Bulk deleted {len(host_ids)} hosts and {len(vm_ids)} vms")
+    return entries
@@ -0,0 +1,206 @@
+# app/services/change_log_writer.py
+
+"""
+ChangeLogWriter - 变更日志异步批量写入
+
+log_change 不再每条日志单独开会话提交：
+1. 日志行（已序列化的 dict）放入进程内有界队列，立即返回
+2. 后台线程攒够 CHANGE_LOG_BATCH_SIZE 条或等待 CHANGE_LOG_FLUSH_INTERVAL 秒后，一条多行 INSERT 写入
+3. 背压：队列满时等待 CHANGE_LOG_ENQUEUE_TIMEOUT 秒，仍然放不下则由调用方同步写入
+4. CHANGE_LOG_ASYNC=false、写入线程已关闭时直接同步写入
+5. gunicorn worker 退出（worker_exit）和进程退出（atexit）时写完队列中剩余的日志
+
+批量写入失败时逐条重试，避免一条异常数据导致整批日志丢失
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+import logging
+from typing import Any, Dict, List
+
+from sqlalchemy import insert
+
+from app.config import LogConfig
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeLogWriter:
+    """变更日志写入器（单例，每个进程一个写入线程）"""
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(ChangeLogWriter, cls).__new__(cls)
+                    cls._instance._init()
+        return cls._instance
+
+    def _init(self):
+        self._state_lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._engine = None
+        self._closed = False
+        self._atexit_registered = False
+        # 统计
+        self._written = 0
+        self._batches = 0
+        self._sync_writes = 0
+        self._failed = 0
+
+    # ---------- 写入线程 ----------
+
+    def _ensure_started(self, engine):
+        """按进程启动写入线程（gunicorn preload 时 fork 之后线程不存在，需要重新启动）"""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._state_lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(maxsize=LogConfig.CHANGE_LOG_QUEUE_SIZE)
+            self._stop = threading.Event()
+            self._engine = engine
+            self._thread = threading.Thread(target=self._run, name='change-log-writer', daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.shutdown)
+                self._atexit_registered = True
+
+    def _run(self):
+        batch_size = LogConfig.CHANGE_LOG_BATCH_SIZE
+        interval = LogConfig.CHANGE_LOG_FLUSH_INTERVAL
+        while True:
+            stopping = self._stop.is_set()
+            try:
+                first = self._queue.get(timeout=0 if stopping else interval)
+            except queue.Empty:
+                if stopping:
+                    break
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + (0 if stopping else interval)
+            while len(batch) < batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+
+            try:
+                self._write(self._engine, batch)
+                self._batches += 1
+            except Exception as e:
+                logger.error(f"Change log writer failed: {e}", exc_info=True)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, engine, rows: List[Dict[str, Any]]):
+        """多行 INSERT 写入；整批失败时逐条重试"""
+        from app.models import ChangeLog
+
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(ChangeLog), rows)
+            self._written += len(rows)
+            return
+        except Exception as e:
+            logger.error(f"Failed to write {len(rows)} change logs in batch, retrying one by one: {e}")
+
+        for row in rows:
+            try:
+                with engine.begin() as conn:
+                    conn.execute(insert(ChangeLog), [row])
+                self._written += 1
+            except Exception as e:
+                self._failed += 1
+                logger.error(
+                    f"Dropped change log: type={row.get('object_type')}, "
+                    f"identifier={row.get('object_identifier')}, action={row.get('action')}: {e}"
+                )
+
+    # ---------- 对外接口 ----------
+
+    def submit(self, engine, rows: List[Dict[str, Any]]):
+        """
+        提交日志行（ChangeLog 表的列字典）
+
+        Args:
+            engine: 数据库引擎（调用方在应用上下文中取 db.engine）
+            rows: 日志行列表
+        """
+        if not rows:
+            return
+        if not LogConfig.CHANGE_LOG_ASYNC or self._closed:
+            self._sync_writes += len(rows)
+            self._write(engine, rows)
+            return
+
+        self._ensure_started(engine)
+        for index, row in enumerate(rows):
+            try:
+                self._queue.put(row, timeout=LogConfig.CHANGE_LOG_ENQUEUE_TIMEOUT)
+            except queue.Full:
+                # 背压：写入线程跟不上，剩余条目由调用方同步写入
+                remaining = rows[index:]
+                logger.warning(f"Change log queue is full, writing {len(remaining)} entries synchronously")
+                self._sync_writes += len(remaining)
+                self._write(engine, remaining)
+                return
+
+    def flush(self, timeout: float = None) -> bool:
+        """等待队列中已提交的日志写完，返回是否在超时前完成"""
+        if self._queue is None or self._pid != os.getpid():
+            return True
+        timeout = LogConfig.CHANGE_LOG_SHUTDOWN_TIMEOUT if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def shutdown(self, timeout: float = None):
+        """停止写入线程并写完剩余日志，之后提交的日志同步写入"""
+        self._closed = True
+        if self._thread is None or self._pid != os.getpid():
+            return
+        timeout = LogConfig.CHANGE_LOG_SHUTDOWN_TIMEOUT if timeout is None else timeout
+        self._stop.set()
+        self._thread.join(timeout)
+
+        # 线程未能在超时内退出时，剩余条目在当前线程写入
+        remaining = []
+        while True:
+            try:
+                remaining.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if remaining:
+            self._sync_writes += len(remaining)
+            self._write(self._engine, remaining)
+        logger.info(f"Change log writer stopped: written={self._written}, failed={self._failed}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'async': LogConfig.CHANGE_LOG_ASYNC and not self._closed,
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'written': self._written,
+            'batches': self._batches,
+            'sync_writes': self._sync_writes,
+            'failed': self._failed
+        }
+
+
+def get_change_log_writer() -> ChangeLogWriter:
+    """获取变更日志写入器"""
+    return ChangeLogWriter()
@@ -0,0 +1,483 @@
+# app/services/custom_field_projection.py
+
+"""
+CustomFieldProjection - 自定义字段宽表（读模型）
+
+custom_field_values 为 EAV 结构，列表按自定义字段过滤时每个字段一个 id IN (子查询)，
+排序时 LEFT JOIN + CASE 处理空值，资源数量上千后无法利用索引。
+开启 CUSTOM_FIELD_PROJECTION_ENABLED 后为 host / vm 各维护一张宽表：
+- host_custom_field_projection / vm_custom_field_projection
+- 每个资源一行，resource_id 为主键并外键关联 hosts.id / vms.id（级联删除，资源删除时自动清理）
+- 每个自定义字段一列 cf_{field_id}：int→BIGINT，varchar/enum→VARCHAR(255)，datetime→DATETIME，每列一个普通索引
+
+同步方式：
+- 字段值写入：Session after_flush 记录被修改的 (resource_type, resource_id)，before_commit 时在同一事务的
+  SAVEPOINT 中按 custom_field_values 重新生成这些资源的宽表行；失败只把宽表标记为过期，不影响业务写入
+- 不经过 ORM 的批量写入调用 mark_resources_dirty() 加入同一机制
+- 字段定义变更：custom_fields.py 提交后调用 sync_projection_schema() 增删列，再递增字段定义版本号
+- 全量重建：python manage.py rebuildprojections
+
+宽表状态（ready / stale）保存在 Valkey。只有状态为 ready 且列与当前字段定义一致时列表查询才使用宽表，
+否则回退到 EAV 子查询
+"""
+
+import itertools
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import (
+    MetaData, Table, Column, Integer, BigInteger, String, DateTime,
+    or_, case, delete, event, func, insert, inspect, select, text
+)
+from sqlalchemy.orm import Session
+
+from app.config import CustomFieldConfig
+from app.utils.cache_manager import CacheService
+
+logger = logging.getLogger(__name__)
+
+PROJECTION_TABLES = {
+    'host': 'host_custom_field_projection',
+    'vm': 'vm_custom_field_projection',
+}
+
+# 资源表及其主键类型（宽表 resource_id 外键类型必须一致）
+_RESOURCE_TABLES = {
+    'host': ('hosts', 'INT', Integer),
+    'vm': ('vms', 'BIGINT', BigInteger),
+}
+
+# 字段类型 -> (宽表列 DDL 类型, SQLAlchemy 类型, custom_field_values 中的值列)
+_FIELD_TYPES = {
+    'int': ('BIGINT', BigInteger, 'int_value'),
+    'varchar': ('VARCHAR(255)', lambda: String(255), 'varchar_value'),
+    'datetime': ('DATETIME', DateTime, 'datetime_value'),
+    'enum': ('VARCHAR(255)', lambda: String(255), 'enum_value'),
+}
+
+STATE_READY = 'ready'
+STATE_STALE = 'stale'
+
+# 列信息缓存：字段定义未变化时最多每隔这么久重新读取一次表结构
+_META_RECHECK_SECONDS = 60
+
+# session.info 中记录待同步资源的键
+_DIRTY_KEY = 'custom_field_projection_dirty'
+
+
+def column_name(field_id) -> str:
+    """自定义字段在宽表中的列名"""
+    return f"cf_{int(field_id)}"
+
+
+def _index_name(field_id) -> str:
+    return f"idx_cf_{int(field_id)}"
+
+
+def _state_key(resource_type) -> str:
+    return f"dict:custom_field_projection:{resource_type}:state"
+
+
+# ==================== 宽表状态 ====================
+_local_state: Dict[str, str] = {}
+
+
+def get_projection_state(resource_type) -> Optional[str]:
+    """宽表状态：ready / stale / None（从未重建）"""
+    client = CacheService().get_client()
+    if client is None:
+        return _local_state.get(resource_type)
+    try:
+        return client.get(_state_key(resource_type))
+    except Exception as e:
+        logger.warning(f"Failed to read projection state for {resource_type}: {e}")
+        return None
+
+
+def set_projection_state(resource_type, state):
+    _local_state[resource_type] = state
+    client = CacheService().get_client()
+    if client is None:
+        return
+    try:
+        client.set(_state_key(resource_type), state)
+    except Exception as e:
+        logger.warning(f"Failed to set projection state for {resource_type}: {e}")
+
+
+# ==================== 表结构 ====================
+class ProjectionMeta:
+    """
+    某个资源类型的宽表结构快照
+
+    fields 为同时存在于字段定义和宽表中的字段，complete 表示字段定义中的字段全部有对应列
+    """
+
+    def __init__(self, resource_type, fields, complete):
+        self.resource_type = resource_type
+        self.fields = fields
+        self.complete = complete
+        _, _, id_type = _RESOURCE_TABLES[resource_type]
+        columns = [Column('resource_id', id_type, primary_key=True, autoincrement=False)]
+        for field in fields:
+            columns.append(Column(column_name(field['id']), _FIELD_TYPES[field['field_type']][1]()))
+        self.table = Table(PROJECTION_TABLES[resource_type], MetaData(), *columns)
+
+    def column(self, field_id):
+        """字段对应的宽表列，不存在返回 None"""
+        return self.table.c.get(column_name(field_id))
+
+    def join(self, query, model):
+        """在列表查询上 LEFT JOIN 宽表（资源没有任何自定义字段值时宽表中没有对应行）"""
+        return query.outerjoin(self.table, self.table.c.resource_id == model.id)
+
+    def search_condition(self, field, search):
+        """全局搜索条件（与 EAV 子查询的匹配规则一致），无法匹配时返回 None"""
+        column = self.column(field['id'])
+        if column is None:
+            return None
+        field_type = field['field_type']
+        if field_type == 'int':
+            try:
+                return column == int(search)
+            except ValueError:
+                return None
+        if field_type in ('varchar', 'enum'):
+            return column.ilike(f'%{search}%')
+        if field_type == 'datetime':
+            try:
+                return column == datetime.strptime(search, '%Y-%m-%d %H:%M:%S')
+            except ValueError:
+                try:
+                    datetime.strptime(search, '%Y-%m-%d')
+                    return column.like(f'{search}%')
+                except ValueError:
+                    return None
+        return None
+
+    def filter_condition(self, field, values):
+        """
+        列筛选条件
+
+        Args:
+            values: 前端传入的值列表，__NULL__ 表示没有值
+        """
+        column = self.column(field['id'])
+        if column is None:
+            return None
+
+        conditions = []
+        if '__NULL__' in values:
+            conditions.append(column.is_(None))
+        other_values = [v for v in values if v != '__NULL__']
+        if other_values:
+            field_type = field['field_type']
+            try:
+                if field_type == 'int':
+                    conditions.append(column.in_([int(v) for v in other_values]))
+                elif field_type == 'datetime':
+                    conditions.append(column.in_([datetime.strptime(v, '%Y-%m-%d %H:%M:%S') for v in other_values]))
+                else:
+                    conditions.append(column.in_(other_values))
+            except ValueError:
+                pass
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else or_(*conditions)
+
+    def order_column(self, field):
+        """排序列（宽表中的索引列，空值顺序由调用方处理）"""
+        return self.column(field['id'])
+
+
+_meta_lock = threading.Lock()
+_meta_cache: Dict[str, tuple] = {}
+
+
+def _existing_columns(resource_type) -> Optional[set]:
+    """读取宽表现有列，表不存在返回 None"""
+    from app.models import db
+    inspector = inspect(db.engine)
+    table_name = PROJECTION_TABLES[resource_type]
+    if not inspector.has_table(table_name):
+        return None
+    return {col['name'] for col in inspector.get_columns(table_name)}
+
+
+def _get_meta(resource_type) -> Optional[ProjectionMeta]:
+    """按字段定义缓存的版本缓存宽表结构，表不存在返回 None"""
+    from app.utils.custom_field_schema import get_schema
+
+    schema = get_schema()
+    fields = [f for f in schema.get_fields(resource_type) if f['field_type'] in _FIELD_TYPES]
+    generation = schema.get_generation()
+
+    cached = _meta_cache.get(resource_type)
+    if cached and cached[0] == generation and time.monotonic() - cached[1] < _META_RECHECK_SECONDS:
+        return cached[2]
+
+    with _meta_lock:
+        columns = _existing_columns(resource_type)
+        if columns is None:
+            meta = None
+        else:
+            present = [f for f in fields if column_name(f['id']) in columns]
+            meta = ProjectionMeta(resource_type, present, complete=len(present) == len(fields))
+        _meta_cache[resource_type] = (generation, time.monotonic(), meta)
+    return meta
+
+
+def get_projection(resource_type) -> Optional[ProjectionMeta]:
+    """
+    列表查询可用的宽表
+
+    Returns:
+        未开启、未重建、已过期或列与字段定义不一致时返回 None（调用方回退到 EAV 查询）
+    """
+    if not CustomFieldConfig.CUSTOM_FIELD_PROJECTION_ENABLED or resource_type not in PROJECTION_TABLES:
+        return None
+    try:
+        if get_projection_state(resource_type) != STATE_READY:
+            return None
+        meta = _get_meta(resource_type)
+        if meta is None or not meta.complete:
+            return None
+        return meta
+    except Exception as e:
+        logger.warning(f"Custom field projection for {resource_type} unavailable: {e}")
+        return None
+
+
+def _pivot_select(resource_type, fields, resource_ids=None):
+    """
+    按 custom_field_values 生成宽表行：每个资源一行，每个字段 MAX(CASE WHEN field_id = x THEN 值 END)
+    只包含资源表中仍存在的资源（宽表有外键）
+    """
+    from app.models import CustomFieldValue, Host, VM
+
+    values = CustomFieldValue.__table__
+    resource = (Host if resource_type == 'host' else VM).__table__
+    columns = [values.c.resource_id]
+    for field in fields:
+        value_column = values.c[_FIELD_TYPES[field['field_type']][2]]
+        columns.append(func.max(case((values.c.field_id == field['id'], value_column))).label(column_name(field['id'])))
+
+    stmt = select(*columns).select_from(
+        values.join(resource, resource.c.id == values.c.resource_id)
+    ).where(
+        values.c.resource_type == resource_type,
+        values.c.field_id.in_([f['id'] for f in fields])
+    )
+    if resource_ids is not None:
+        stmt = stmt.where(values.c.resource_id.in_(resource_ids))
+    return stmt.group_by(values.c.resource_id)
+
+
+def _load_fields_from_db(resource_type) -> List[Dict]:
+    """直接从数据库读取字段定义（字段定义变更时缓存尚未失效）"""
+    from app.models import CustomField
+    fields = CustomField.query.filter_by(resource_type=resource_type).order_by(CustomField.id).all()
+    return [{'id': f.id, 'field_type': f.field_type} for f in fields if f.field_type in _FIELD_TYPES]
+
+
+def _create_table_sql(resource_type, fields) -> str:
+    table_name = PROJECTION_TABLES[resource_type]
+    resource_table, id_sql_type, _ = _RESOURCE_TABLES[resource_type]
+    parts = [f"`resource_id` {id_sql_type} NOT NULL COMMENT '资源ID'"]
+    for field in fields:
+        parts.append(f"`{column_name(field['id'])}` {_FIELD_TYPES[field['field_type']][0]} NULL")
+    parts.append("PRIMARY KEY (`resource_id`)")
+    for field in fields:
+        parts.append(f"KEY `{_index_name(field['id'])}` (`{column_name(field['id'])}`)")
+    parts.append(
+        f"CONSTRAINT `fk_{table_name}_resource` FOREIGN KEY (`resource_id`) "
+        f"REFERENCES `{resource_table}` (`id`) ON DELETE CASCADE"
+    )
+    return (
+        f"CREATE TABLE IF NOT EXISTS `{table_name}` ({', '.join(parts)}) "
+        f"ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='{resource_type}自定义字段宽表'"
+    )
+
+
+def _alter_columns(resource_type, fields, columns):
+    """
+    按字段定义增删宽表列（新增列同时建索引）
+
+    Returns:
+        新增的字段列表
+    """
+    from app.models import db
+
+    wanted = {column_name(f['id']): f for f in fields}
+    existing = {c for c in columns if c.startswith('cf_')}
+    added = [f for name, f in wanted.items() if name not in existing]
+    dropped = sorted(c for c in existing if c not in wanted)
+    if not added and not dropped:
+        return []
+
+    clauses = []
+    for field in added:
+        clauses.append(f"ADD COLUMN `{column_name(field['id'])}` {_FIELD_TYPES[field['field_type']][0]} NULL")
+        clauses.append(f"ADD INDEX `{_index_name(field['id'])}` (`{column_name(field['id'])}`)")
+    for name in dropped:
+        clauses.append(f"DROP COLUMN `{name}`")
+
+    with db.engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE `{PROJECTION_TABLES[resource_type]}` {', '.join(clauses)}"))
+    _meta_cache.pop(resource_type, None)
+    logger.info(
+        f"Custom field projection columns altered for {resource_type}: "
+        f"added={[column_name(f['id']) for f in added]}, dropped={dropped}"
+    )
+    return added
+
+
+def _resync_rows(executor, resource_type, fields, resource_ids):
+    """
+    删除并重新生成指定资源的宽表行
+
+    Args:
+        executor: Session 或 Connection（在其当前事务中执行）
+        fields: 宽表中存在的字段
+    """
+    table = ProjectionMeta(resource_type, fields, complete=True).table
+    names = ['resource_id'] + [column_name(f['id']) for f in fields]
+    chunk_size = max(1, CustomFieldConfig.CUSTOM_FIELD_PROJECTION_CHUNK_SIZE)
+    resource_ids = sorted({rid for rid in resource_ids if rid is not None})
+    for i in range(0, len(resource_ids), chunk_size):
+        chunk = resource_ids[i:i + chunk_size]
+        executor.execute(delete(table).where(table.c.resource_id.in_(chunk)))
+        if fields:
+            executor.execute(insert(table).from_select(names, _pivot_select(resource_type, fields, chunk)))
+
+
+def sync_projection_schema(resource_type) -> bool:
+    """
+    字段定义变更后同步宽表列：新增字段加列和索引，已删除字段删列
+    宽表不存在时创建并全量重建
+
+    需在应用上下文中、字段定义事务提交之后调用；返回是否执行成功
+    """
+    if not CustomFieldConfig.CUSTOM_FIELD_PROJECTION_ENABLED or resource_type not in PROJECTION_TABLES:
+        return False
+
+    from app.models import db, CustomFieldValue
+
+    try:
+        columns = _existing_columns(resource_type)
+        if columns is None:
+            rebuild_projection(resource_type)
+            return True
+
+        fields = _load_fields_from_db(resource_type)
+        added = _alter_columns(resource_type, fields, columns)
+        if added:
+            # 回填字段创建到加列之间写入的值
+            with db.engine.begin() as conn:
+                resource_ids = conn.execute(
+                    select(CustomFieldValue.resource_id).where(
+                        CustomFieldValue.resource_type == resource_type,
+                        CustomFieldValue.field_id.in_([f['id'] for f in added])
+                    ).distinct()
+                ).scalars().all()
+                _resync_rows(conn, resource_type, fields, resource_ids)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to sync custom field projection schema for {resource_type}: {e}", exc_info=True)
+        set_projection_state(resource_type, STATE_STALE)
+        return False
+
+
+def rebuild_projection(resource_type) -> int:
+    """
+    全量重建宽表（创建表、补齐列、重新生成所有行），成功后标记为 ready
+
+    Returns:
+        宽表行数
+    """
+    from app.models import db
+
+    fields = _load_fields_from_db(resource_type)
+    with db.engine.begin() as conn:
+        conn.execute(text(_create_table_sql(resource_type, fields)))
+    # 表已存在时补齐列（新建表时为空操作）
+    _alter_columns(resource_type, fields, _existing_columns(resource_type))
+
+    # 同一事务中删除并重新生成，重建期间读请求看到的是旧数据
+    table = ProjectionMeta(resource_type, fields, complete=True).table
+    with db.engine.begin() as conn:
+        conn.execute(delete(table))
+        if fields:
+            names = ['resource_id'] + [column_name(f['id']) for f in fields]
+            conn.execute(insert(table).from_select(names, _pivot_select(resource_type, fields)))
+        rows = conn.execute(select(func.count()).select_from(table)).scalar() or 0
+
+    _meta_cache.pop(resource_type, None)
+    set_projection_state(resource_type, STATE_READY)
+    logger.info(f"Custom field projection rebuilt for {resource_type}: fields={len(fields)}, rows={rows}")
+    return rows
+
+
+# ==================== 增量同步 ====================
+def sync_resource_projections(session, resource_type, resource_ids):
+    """按 custom_field_values 重新生成指定资源的宽表行（在调用方事务内执行）"""
+    meta = _get_meta(resource_type)
+    if meta is None:
+        return
+    _resync_rows(session, resource_type, meta.fields, resource_ids)
+
+
+def mark_resources_dirty(session, resource_type, resource_ids: Iterable):
+    """不经过 ORM 写入 custom_field_values 时调用，提交前同步这些资源的宽表行"""
+    dirty = session.info.setdefault(_DIRTY_KEY, set())
+    dirty.update((resource_type, rid) for rid in resource_ids)
+
+
+def _after_flush(session, flush_context):
+    """记录本次 flush 中被修改的字段值所属资源"""
+    from app.models import CustomField, CustomFieldValue
+
+    if not CustomFieldConfig.CUSTOM_FIELD_PROJECTION_ENABLED:
+        return
+    # 删除字段时级联删除的字段值不需要同步（列随字段一起删除）
+    deleted_fields = {obj.id for obj in session.deleted if isinstance(obj, CustomField)}
+    dirty = session.info.setdefault(_DIRTY_KEY, set())
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, CustomFieldValue) and obj.field_id not in deleted_fields:
+            dirty.add((obj.resource_type, obj.resource_id))
+
+
+def _before_commit(session):
+    """提交前在同一事务中同步宽表，失败时回滚到 SAVEPOINT 并标记宽表过期"""
+    if not CustomFieldConfig.CUSTOM_FIELD_PROJECTION_ENABLED:
+        session.info.pop(_DIRTY_KEY, None)
+        return
+    session.flush()
+    dirty = session.info.pop(_DIRTY_KEY, None)
+    if not dirty:
+        return
+
+    by_type: Dict[str, set] = {}
+    for resource_type, resource_id in dirty:
+        if resource_type in PROJECTION_TABLES:
+            by_type.setdefault(resource_type, set()).add(resource_id)
+
+    for resource_type, resource_ids in by_type.items():
+        try:
+            with session.begin_nested():
+                sync_resource_projections(session, resource_type, resource_ids)
+        except Exception as e:
+            logger.error(f"Failed to sync custom field projection for {len(resource_ids)} {resource_type}(s): {e}")
+            set_projection_state(resource_type, STATE_STALE)
+
+
+def _discard_dirty(session, previous_transaction=None):
+    session.info.pop(_DIRTY_KEY, None)
+
+
+event.listen(Session, 'after_flush', _after_flush)
+event.listen(Session, 'before_commit', _before_commit)
+event.listen(Session, 'after_rollback', _discard_dirty)
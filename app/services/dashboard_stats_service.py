@@ -0,0 +1,257 @@
+# app/services/dashboard_stats_service.py
+
+"""
+DashboardStatsService - 仪表盘宿主机 / VM 状态统计
+
+全量模式（默认）：
+- 一条 UNION ALL 查询完成两张表的 GROUP BY status 聚合，结果缓存在 stats:dashboard
+
+增量模式（STATS_COUNTERS_ENABLED=true）：
+- Valkey 哈希 counters:hosts / counters:vms 保存每个状态的数量，仪表盘直接读取，不再查询数据库
+- Host / VM 的新增、删除和状态变化（CRUD、导入、单台同步）通过 ORM 事件收集，事务提交后 HINCRBY
+- 批量同步使用 Core UPDATE 不触发 ORM 事件，由 _apply_status_updates 显式调用 record_status_transitions
+- 每 STATS_RECONCILE_INTERVAL 秒由一个进程（SET NX 锁）按数据库重新计算计数，修正漏记或并发造成的偏差
+
+计数键不使用 stats: 前缀，invalidate_all_stats 不会删除它们
+"""
+
+import logging
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event, func, inspect, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from app.config import RedisConfig
+from app.utils.cache_manager import CacheService
+
+logger = logging.getLogger(__name__)
+
+COUNTER_KEYS = {'host': 'counters:hosts', 'vm': 'counters:vms'}
+RECONCILE_LOCK_KEY = 'counters:reconcile:lock'
+RECONCILED_AT_KEY = 'counters:reconciled_at'
+
+STATUSES = ('running', 'stopped', 'unknown')
+
+# session.info 中记录待提交的状态变化的键
+_PENDING_KEY = 'dashboard_status_transitions'
+
+# 计数哈希存在时才累加：哈希不存在说明尚未对账，累加出的部分计数会被误当作完整结果
+_HINCRBY_IF_EXISTS_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 0 then
+    return 0
+end
+for i = 1, #ARGV, 2 do
+    redis.call('hincrby', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+return 1
+"""
+
+
+# ==================== 全量统计 ====================
+def query_status_counts() -> Dict[str, Dict[str, int]]:
+    """
+    一次查询统计宿主机和 VM 各状态的数量
+
+    Returns:
+        {'host': {status: count}, 'vm': {status: count}}
+    """
+    from app.models import db, Host, VM
+
+    stmt = union_all(
+        select(literal('host').label('resource_type'), Host.status, func.count()).group_by(Host.status),
+        select(literal('vm').label('resource_type'), VM.status, func.count()).group_by(VM.status)
+    )
+    counts = {resource_type: {status: 0 for status in STATUSES} for resource_type in COUNTER_KEYS}
+    for resource_type, status, count in db.session.execute(stmt):
+        counts[resource_type][status] = int(count)
+    return counts
+
+
+def build_stats(counts: Dict[str, Dict[str, int]]) -> Dict[str, int]:
+    """把各状态数量转换为仪表盘使用的统计字段"""
+    hosts = counts.get('host', {})
+    vms = counts.get('vm', {})
+    return {
+        'total_hosts': sum(hosts.values()),
+        'running_hosts': hosts.get('running', 0),
+        'stopped_hosts': hosts.get('stopped', 0),
+        'total_vms': sum(vms.values()),
+        'running_vms': vms.get('running', 0),
+        'stopped_vms': vms.get('stopped', 0)
+    }
+
+
+# ==================== 增量计数 ====================
+def reconcile_counters() -> Dict[str, Dict[str, int]]:
+    """按数据库重新计算计数并覆盖 Valkey 中的哈希（需在应用上下文中调用）"""
+    counts = query_status_counts()
+    client = CacheService().get_client()
+    if client is None:
+        return counts
+
+    pipe = client.pipeline()
+    for resource_type, key in COUNTER_KEYS.items():
+        pipe.delete(key)
+        pipe.hset(key, mapping=counts[resource_type])
+    pipe.set(RECONCILED_AT_KEY, int(time.time()))
+    pipe.execute()
+    logger.info(f"Dashboard counters reconciled: {counts}")
+    return counts
+
+
+def _read_counters() -> Optional[Dict[str, int]]:
+    """读取增量计数，需要对账时先对账；Valkey 不可用或计数不存在时返回 None"""
+    client = CacheService().get_client()
+    if client is None:
+        return None
+    try:
+        # 锁在对账间隔后自动过期，所有进程合计每个间隔只对账一次
+        if client.set(RECONCILE_LOCK_KEY, 1, nx=True, ex=RedisConfig.STATS_RECONCILE_INTERVAL):
+            return build_stats(reconcile_counters())
+
+        pipe = client.pipeline(transaction=False)
+        for key in COUNTER_KEYS.values():
+            pipe.hgetall(key)
+        hosts, vms = pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to read dashboard counters: {e}")
+        return None
+
+    if not hosts or not vms:
+        return None
+    return build_stats({
+        'host': {status: int(count) for status, count in hosts.items()},
+        'vm': {status: int(count) for status, count in vms.items()}
+    })
+
+
+def _transition_deltas(transitions: Iterable[Tuple[Optional[str], Optional[str]]]) -> Dict[str, int]:
+    deltas: Dict[str, int] = {}
+    for old_status, new_status in transitions:
+        if old_status == new_status:
+            continue
+        if old_status is not None:
+            deltas[old_status] = deltas.get(old_status, 0) - 1
+        if new_status is not None:
+            deltas[new_status] = deltas.get(new_status, 0) + 1
+    return {status: delta for status, delta in deltas.items() if delta}
+
+
+def record_status_transitions(resource_type: str, transitions: Iterable[Tuple[Optional[str], Optional[str]]]):
+    """
+    事务提交后累加状态变化
+
+    Args:
+        resource_type: host / vm
+        transitions: [(old_status, new_status), ...]，新增时 old_status 为 None，删除时 new_status 为 None
+    """
+    if not RedisConfig.STATS_COUNTERS_ENABLED:
+        return
+    deltas = _transition_deltas(transitions)
+    if not deltas:
+        return
+    client = CacheService().get_client()
+    if client is None:
+        return
+
+    args = []
+    for status, delta in deltas.items():
+        args.extend((status, delta))
+    try:
+        client.eval(_HINCRBY_IF_EXISTS_SCRIPT, 1, COUNTER_KEYS[resource_type], *args)
+    except Exception as e:
+        # 计数出错只影响仪表盘，下一次对账时修正
+        logger.warning(f"Failed to update {resource_type} counters: {e}")
+
+
+def get_dashboard_stats() -> Dict[str, int]:
+    """
+    获取仪表盘统计数据
+    增量模式读取 Valkey 计数；否则使用L3层缓存（stats:dashboard），未命中时一次聚合查询（可读从库）
+    """
+    from app.models import db
+    from app.utils.cache_manager import get_stats_data, set_stats_data, CacheTTL
+    from app.utils.db_router import replica_reads, used_replica
+
+    if RedisConfig.STATS_COUNTERS_ENABLED:
+        stats = _read_counters()
+        if stats is not None:
+            return stats
+
+    cached_stats = get_stats_data('dashboard')
+    if cached_stats is not None:
+        return cached_stats
+
+    with replica_reads():
+        stats = build_stats(query_status_counts())
+    # 从库的统计可能落后于主库，不写入缓存，避免在缓存有效期内一直显示旧数据
+    if not used_replica(db.session):
+        set_stats_data('dashboard', stats, ttl=CacheTTL.STATS)
+    return stats
+
+
+# ==================== ORM 事件 ====================
+def _resource_type(target) -> Optional[str]:
+    from app.models import Host, VM
+    if isinstance(target, VM):
+        return 'vm'
+    if isinstance(target, Host):
+        return 'host'
+    return None
+
+
+def _collect(target, old_status, new_status):
+    if not RedisConfig.STATS_COUNTERS_ENABLED:
+        return
+    session = inspect(target).session
+    if session is None:
+        return
+    session.info.setdefault(_PENDING_KEY, []).append((_resource_type(target), old_status, new_status))
+
+
+def _after_insert(mapper, connection, target):
+    # 未显式设置状态时使用数据库默认值 unknown
+    _collect(target, None, inspect(target).dict.get('status') or 'unknown')
+
+
+def _after_update(mapper, connection, target):
+    history = inspect(target).attrs.status.history
+    if not history.added or not history.deleted:
+        # 未修改状态，或修改前的值未加载（无法确定旧状态，交给对账修正）
+        return
+    _collect(target, history.deleted[0], history.added[0])
+
+
+def _after_delete(mapper, connection, target):
+    status = inspect(target).dict.get('status')
+    if status is not None:
+        _collect(target, status, None)
+
+
+def _after_commit(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    grouped: Dict[str, list] = {}
+    for resource_type, old_status, new_status in pending:
+        grouped.setdefault(resource_type, []).append((old_status, new_status))
+    for resource_type, transitions in grouped.items():
+        record_status_transitions(resource_type, transitions)
+
+
+def _discard_pending(session, previous_transaction=None):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _register_mapper_events():
+    from app.models import Host, VM
+    for model in (Host, VM):
+        event.listen(model, 'after_insert', _after_insert)
+        event.listen(model, 'after_update', _after_update)
+        event.listen(model, 'after_delete', _after_delete)
+
+
+_register_mapper_events()
+event.listen(Session, 'after_commit', _after_commit)
+event.listen(Session, 'after_rollback', _discard_pending)
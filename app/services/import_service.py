@@ -0,0 +1,462 @@
+# app/services/import_service.py
+
+"""
+ImportService - Host / VM CSV 批量导入
+
+1. prepare_import：一次遍历校验所有行（必填、唯一值、IP 格式、宿主机是否存在、枚举值），
+   收集全部错误后一起返回，校验通过后生成待写入的记录
+2. run_import：按 IMPORT_BATCH_SIZE 分批多行 INSERT 资源和自定义字段值，
+   导入 VM 时一次性按实际 VM 数重新计算相关宿主机的 vm_count，整个导入在一个事务中，
+   提交后批量写入变更日志
+3. 行数超过 IMPORT_ASYNC_THRESHOLD 时由 submit_import_job 在后台线程执行，
+   进度写入 Valkey 哈希 import:job:{job_id}（Valkey 不可用时保存在进程内）
+"""
+
+import csv
+import ipaddress
+import threading
+import uuid
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import pytz
+from sqlalchemy import func, insert, select, update
+
+from app.config import ImportConfig
+from app.utils.cache_manager import CacheService
+
+logger = logging.getLogger(__name__)
+
+# 每个资源类型的唯一标识字段
+UNIQUE_FIELDS = {'vms': 'vm_ip', 'hosts': 'host_info'}
+
+# 需要校验取值范围的下拉字段（取值来自 form_fields 的 options）
+CHOICE_FIELDS = ('status', 'virtualization_type')
+
+# 校验错误最多返回的条数
+MAX_ERROR_DETAILS = 50
+
+
+class ImportValidationError(ValueError):
+    """导入数据校验失败，details 为逐行错误"""
+
+    def __init__(self, message, details=None):
+        super().__init__(message)
+        self.details = details or []
+
+
+def _is_valid_ipv4(ip_str):
+    try:
+        ipaddress.IPv4Address(ip_str)
+        return True
+    except (ValueError, TypeError):
+        return False
+
+
+def _empty_to_none(value):
+    return None if value is None or value == '' or value == 'None' else value
+
+
+# ==================== 解析与校验 ====================
+def prepare_import(model_name: str, config: Dict[str, Any], content: str) -> Dict[str, Any]:
+    """
+    解析并校验 CSV 内容
+
+    Returns:
+        {'records': [{'row', 'data', 'custom_fields': [(字段定义, 值)], 'identifier'}], 'resource_type'}
+
+    Raises:
+        ImportValidationError: 文件为空、缺少必填列，或存在校验失败的行
+    """
+    from app.models import Host, VM
+    from app.utils.custom_field_schema import get_schema
+
+    model = config['model']
+    form_fields = config.get('form_fields', [])
+    label_to_name_map = {field['label']: field['name'] for field in form_fields}
+    required_labels = {field['label'] for field in form_fields if field.get('required')}
+    options_by_name = {field['name']: field.get('options', []) for field in form_fields if field['name'] in CHOICE_FIELDS}
+
+    resource_type = {'hosts': 'host', 'vms': 'vm'}.get(model_name)
+    custom_fields_by_name = {}
+    if resource_type:
+        custom_fields_by_name = {f['field_name']: f for f in get_schema().get_fields(resource_type)}
+
+    rows = list(csv.DictReader(content.splitlines()))
+    if not rows:
+        raise ImportValidationError('CSV file is empty or has no content')
+
+    missing_labels = required_labels - set(rows[0].keys())
+    if missing_labels:
+        raise ImportValidationError(f'CSV file is missing required columns: {", ".join(missing_labels)}')
+
+    unique_field_name = UNIQUE_FIELDS.get(model_name)
+    unique_field_label = next((label for label, name in label_to_name_map.items() if name == unique_field_name), None)
+
+    # 一次性加载已存在的唯一值和宿主机映射，逐行校验只做集合查找
+    existing_identifiers = set()
+    existing_hosts = {}
+    if model_name == 'vms':
+        existing_identifiers = {ip for ip, in VM.query.with_entities(VM.vm_ip).all()}
+        existing_hosts = {info: hid for info, hid in Host.query.with_entities(Host.host_info, Host.id).all()}
+    elif model_name == 'hosts':
+        existing_identifiers = {info for info, in model.query.with_entities(model.host_info).all()}
+
+    now = datetime.now(pytz.timezone('Asia/Shanghai'))
+    errors: List[str] = []
+    records = []
+    seen_identifiers = set()
+
+    for i, row in enumerate(rows, start=2):
+        row_errors = []
+
+        identifier_value = row.get(unique_field_label) if unique_field_label else None
+        if identifier_value:
+            if identifier_value in existing_identifiers:
+                kind = 'VM IP' if model_name == 'vms' else 'Host Info'
+                row_errors.append(f"{kind} '{identifier_value}' already exists.")
+            elif identifier_value in seen_identifiers:
+                row_errors.append(f"'{identifier_value}' appears more than once in the file.")
+            seen_identifiers.add(identifier_value)
+
+        missing_values = [label for label in required_labels if not row.get(label)]
+        if missing_values:
+            row_errors.append(f'Missing values for required fields: {", ".join(missing_values)}')
+
+        host_id = None
+        if model_name == 'vms':
+            ip_value = row.get('IP ADDRESS')
+            if ip_value and not _is_valid_ipv4(ip_value):
+                row_errors.append(f'Invalid IP address format: "{ip_value}"')
+
+            host_info_value = row.get('HOST INFO')
+            if host_info_value:
+                if host_info_value not in existing_hosts:
+                    row_errors.append(f'Host "{host_info_value}" does not exist.')
+                else:
+                    host_id = existing_hosts[host_info_value]
+
+        for label, value in row.items():
+            field_name = label_to_name_map.get(label)
+            if not value or field_name not in options_by_name:
+                continue
+            allowed = options_by_name[field_name]
+            # 虚拟化类型不区分大小写
+            check_value = value.lower() if field_name == 'virtualization_type' else value
+            if check_value not in allowed:
+                row_errors.append(f'Invalid value "{value}" for field "{label}". Allowed values are: {", ".join(allowed)}.')
+
+        if row_errors:
+            errors.extend(f'Row {i} error: {message}' for message in row_errors)
+            continue
+
+        item_data = {}
+        for label, value in row.items():
+            if label in label_to_name_map:
+                field_name = label_to_name_map[label]
+                if field_name == 'host_id':
+                    item_data[field_name] = host_id
+                else:
+                    item_data[field_name] = _empty_to_none(value)
+        if hasattr(model, 'created_at'):
+            item_data['created_at'] = now
+        if hasattr(model, 'updated_at'):
+            item_data['updated_at'] = now
+
+        custom_values = [
+            (custom_fields_by_name[label], _empty_to_none(value))
+            for label, value in row.items() if label in custom_fields_by_name
+        ]
+
+        records.append({
+            'row': i,
+            'data': item_data,
+            'custom_fields': custom_values,
+            'identifier': item_data.get(unique_field_name) if unique_field_name else None
+        })
+
+    if errors:
+        raise ImportValidationError(
+            f'{len(errors)} validation error(s) found, nothing was imported.',
+            details=errors[:MAX_ERROR_DETAILS]
+        )
+
+    return {'records': records, 'resource_type': resource_type}
+
+
+# ==================== 写入 ====================
+def _custom_value_row(field, resource_type, resource_id, value):
+    """生成一行 custom_field_values（所有行包含相同的键，便于 executemany）"""
+    from app.utils.custom_field_schema import get_schema
+
+    row = {
+        'field_id': field['id'],
+        'resource_type': resource_type,
+        'resource_id': resource_id,
+        'int_value': None,
+        'varchar_value': None,
+        'datetime_value': None,
+        'enum_value': None
+    }
+    if field['field_type'] == 'int':
+        try:
+            row['int_value'] = int(value) if value not in ('', None) else None
+        except (ValueError, TypeError):
+            row['int_value'] = None
+    elif field['field_type'] == 'varchar':
+        row['varchar_value'] = value
+    elif field['field_type'] == 'datetime':
+        if value:
+            try:
+                row['datetime_value'] = datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+            except (ValueError, TypeError):
+                row['datetime_value'] = None
+    elif field['field_type'] == 'enum':
+        row['enum_value'] = get_schema().get_option_key(field['id'], value) if value else None
+    return row
+
+
+def _log_detail(record, host_info_by_id):
+    detail = dict(record['data'])
+    if 'host_id' in detail and detail['host_id'] in host_info_by_id:
+        detail['host_info'] = host_info_by_id[detail['host_id']]
+    if record['custom_fields']:
+        detail['custom_fields'] = {field['field_name']: value for field, value in record['custom_fields']}
+    return detail
+
+
+def run_import(model_name: str, config: Dict[str, Any], prepared: Dict[str, Any],
+               username: Optional[str] = None,
+               progress_callback: Optional[Callable[[int], None]] = None) -> int:
+    """
+    分批写入校验通过的记录（需在应用上下文中调用），全部成功才提交
+
+    Args:
+        progress_callback: 每写完一批调用一次，参数为已写入的行数
+
+    Returns:
+        导入的行数
+
+    Raises:
+        ValueError: 唯一约束冲突（校验后被并发写入）
+    """
+    from app.models import db, Host, CustomFieldValue
+    from app.services.custom_field_projection import mark_resources_dirty
+    from app.services.search_index import mark_search_dirty
+    from app.services.dashboard_stats_service import record_status_transitions
+    from app.services.log_service import log_changes_bulk
+    from app.utils.cache_manager import invalidate_all_stats, delayed_delete_host
+
+    model = config['model']
+    records = prepared['records']
+    resource_type = prepared['resource_type']
+    unique_column = getattr(model, UNIQUE_FIELDS[model_name]) if model_name in UNIQUE_FIELDS else None
+    batch_size = ImportConfig.IMPORT_BATCH_SIZE
+
+    ids_by_identifier = {}
+    try:
+        for start in range(0, len(records), batch_size):
+            chunk = records[start:start + batch_size]
+            db.session.execute(insert(model), [record['data'] for record in chunk])
+
+            if unique_column is not None:
+                # MySQL 多行 INSERT 不返回主键，按唯一标识查回本批ID
+                identifiers = [record['identifier'] for record in chunk]
+                ids_by_identifier.update(
+                    db.session.execute(
+                        select(unique_column, model.id).where(unique_column.in_(identifiers))
+                    ).all()
+                )
+
+                value_rows = [
+                    _custom_value_row(field, resource_type, ids_by_identifier[record['identifier']], value)
+                    for record in chunk
+                    for field, value in record['custom_fields']
+                ]
+                if value_rows:
+                    db.session.execute(insert(CustomFieldValue), value_rows)
+                    mark_resources_dirty(
+                        db.session, resource_type,
+                        {ids_by_identifier[record['identifier']] for record in chunk if record['custom_fields']}
+                    )
+
+            if progress_callback:
+                progress_callback(start + len(chunk))
+
+        if ids_by_identifier:
+            mark_search_dirty(db.session, resource_type, ids_by_identifier.values())
+
+        # 导入VM：按实际VM数一次性重新计算相关宿主机的 vm_count
+        host_ids = set()
+        if model_name == 'vms':
+            host_ids = {record['data'].get('host_id') for record in records if record['data'].get('host_id')}
+            if host_ids:
+                vm_count = select(func.count(model.id)).where(model.host_id == Host.id).scalar_subquery()
+                db.session.execute(
+                    update(Host)
+                    .where(Host.id.in_(host_ids))
+                    .values(vm_count=vm_count)
+                    .execution_options(synchronize_session=False)
+                )
+
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        if 'Duplicate entry' in str(e):
+            raise ValueError(f'Data already exists in database. {e}')
+        raise
+
+    # 提交后：缓存、仪表盘计数、变更日志
+    invalidate_all_stats()
+    for host_id in host_ids:
+        delayed_delete_host(host_id)
+    if resource_type:
+        record_status_transitions(
+            resource_type,
+            [(None, record['data'].get('status') or 'unknown') for record in records]
+        )
+
+    host_info_by_id = {}
+    if model_name == 'vms' and host_ids:
+        host_info_by_id = dict(db.session.query(Host.id, Host.host_info).filter(Host.id.in_(host_ids)).all())
+    log_changes_bulk(
+        [
+            {
+                'action': 'imported',
+                'object_type': model_name,
+                'object_identifier': record['identifier'],
+                'detail_obj': _log_detail(record, host_info_by_id)
+            }
+            for record in records
+        ],
+        username=username
+    )
+
+    logger.info(f"Imported {len(records)} {model_name} in batches of {batch_size}")
+    return len(records)
+
+
+# ==================== 后台任务 ====================
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+class ImportJobStore:
+    """
+    导入任务存储（单例）
+    优先使用 Valkey，使多个 worker / Pod 都能读取同一任务的进度
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(ImportJobStore, cls).__new__(cls)
+                    cls._instance._init()
+        return cls._instance
+
+    def _init(self):
+        self._local_lock = threading.Lock()
+        self._local_jobs: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def _job_key(job_id):
+        return f"import:job:{job_id}"
+
+    def create(self, model_name, filename, total, created_by) -> str:
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'model_name': model_name,
+            'filename': filename or '',
+            'status': 'queued',
+            'total': total,
+            'processed': 0,
+            'created_by': created_by or '',
+            'created_at': _now(),
+            'started_at': '',
+            'finished_at': '',
+            'error': ''
+        }
+        client = CacheService().get_client()
+        if client is None:
+            with self._local_lock:
+                self._local_jobs[job_id] = job
+            return job_id
+
+        pipe = client.pipeline()
+        pipe.hset(self._job_key(job_id), mapping=job)
+        pipe.expire(self._job_key(job_id), ImportConfig.IMPORT_JOB_TTL)
+        pipe.execute()
+        return job_id
+
+    def update(self, job_id, **fields):
+        client = CacheService().get_client()
+        if client is None:
+            with self._local_lock:
+                if job_id in self._local_jobs:
+                    self._local_jobs[job_id].update(fields)
+            return
+        client.hset(self._job_key(job_id), mapping={k: ('' if v is None else v) for k, v in fields.items()})
+
+    def get(self, job_id) -> Optional[Dict[str, Any]]:
+        client = CacheService().get_client()
+        if client is None:
+            with self._local_lock:
+                job = self._local_jobs.get(job_id)
+                job = dict(job) if job is not None else None
+        else:
+            job = client.hgetall(self._job_key(job_id)) or None
+        if job is None:
+            return None
+        for field in ('total', 'processed'):
+            job[field] = int(job.get(field) or 0)
+        return job
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=ImportConfig.IMPORT_JOB_WORKERS, thread_name_prefix='import-job')
+        return _executor
+
+
+def _run_job(app, job_id, model_name, config, prepared, username, filename):
+    """在线程池中执行导入任务"""
+    from app.services.log_service import log_changes_bulk
+
+    store = ImportJobStore()
+    with app.app_context():
+        try:
+            store.update(job_id, status='running', started_at=_now())
+            imported = run_import(
+                model_name, config, prepared, username=username,
+                progress_callback=lambda processed: store.update(job_id, processed=processed)
+            )
+            store.update(job_id, status='completed', processed=imported, finished_at=_now())
+        except Exception as e:
+            logger.error(f"Import job {job_id} failed: {e}", exc_info=True)
+            store.update(job_id, status='failed', finished_at=_now(), error=str(e))
+            log_changes_bulk(
+                [{'action': 'imported', 'object_type': model_name, 'object_identifier': filename,
+                  'detail_obj': {'error': str(e)}}],
+                username=username,
+                status='failed'
+            )
+
+
+def submit_import_job(app, model_name, config, prepared, username=None, filename=None) -> str:
+    """提交后台导入任务，返回 job_id"""
+    job_id = ImportJobStore().create(model_name, filename, len(prepared['records']), username)
+    _get_executor().submit(_run_job, app, job_id, model_name, config, prepared, username, filename)
+    logger.info(f"Import job {job_id} submitted: {model_name}, rows={len(prepared['records'])}")
+    return job_id
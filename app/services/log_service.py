@@ -1,4 +1,5 @@
-from app.models import db, ChangeLog
+from app.models import db
+from app.services.change_log_writer import get_change_log_writer
 from flask import current_app
 from flask_login import current_user
 from datetime import datetime
@@ -46,15 +47,14 @@ def to_dict(obj):
             model_name = obj.__class__.__name__
             if model_name in ['Host', 'VM']:
                 try:
-                    from app.models import CustomField, CustomFieldValue, CustomFieldEnumOption
-                    from app import db
+                    from app.models import CustomFieldValue
+                    from app.utils.custom_field_schema import get_schema
                     
                     resource_type = 'host' if model_name == 'Host' else 'vm'
+                    schema = get_schema()
                     
-                    # 获取所有有效的自定义字段配置
-                    custom_fields = CustomField.query.filter_by(
-                        resource_type=resource_type
-                    ).order_by(CustomField.sort).all()
+                    # 获取所有有效的自定义字段配置（进程内缓存）
+                    custom_fields = schema.get_fields(resource_type)
                     
                     # 获取该资源的所有自定义字段值
                     field_values = CustomFieldValue.query.filter_by(
@@ -65,31 +65,28 @@ def to_dict(obj):
                     field_value_map = {fv.field_id: fv for fv in field_values}
                     
                     for field in custom_fields:
-                        field_value = field_value_map.get(field.id)
+                        field_value = field_value_map.get(field['id'])
                         # 使用field_name作为键，而不是field_key
-                        dict_key = field.field_name
+                        dict_key = field['field_name']
                         
                         if field_value:
-                            if field.field_type == 'int':
+                            if field['field_type'] == 'int':
                                 obj_dict[dict_key] = field_value.int_value
-                            elif field.field_type == 'varchar':
+                            elif field['field_type'] == 'varchar':
                                 obj_dict[dict_key] = field_value.varchar_value
-                            elif field.field_type == 'datetime':
+                            elif field['field_type'] == 'datetime':
                                 obj_dict[dict_key] = to_dict(field_value.datetime_value)
-                            elif field.field_type == 'enum':
+                            elif field['field_type'] == 'enum':
                                 # 枚举类型返回显示名
-                                enum_opt = CustomFieldEnumOption.query.filter_by(
-                                    field_id=field.id,
-                                    option_key=field_value.enum_value
-                                ).first()
-                                if enum_opt:
-                                    obj_dict[dict_key] = enum_opt.option_label
+                                label = schema.get_option_label(field['id'], field_value.enum_value)
+                                if label is not None:
+                                    obj_dict[dict_key] = label
                                 else:
                                     obj_dict[dict_key] = field_value.enum_value
                         else:
                             # 如果没有值，根据字段类型设置默认值
-                            if field.default_value is not None:
-                                obj_dict[dict_key] = field.default_value
+                            if field['default_value'] is not None:
+                                obj_dict[dict_key] = field['default_value']
                             else:
                                 obj_dict[dict_key] = None
                 except Exception as e:
@@ -105,75 +102,100 @@ def to_dict(obj):
     except Exception:
         return {"error": "Error serializing object", "object_type": str(type(obj))}
 
+def _current_username():
+    """安全获取当前用户名（在非请求上下文中 current_user 不可用）"""
+    try:
+        return current_user.username if current_user.is_authenticated else 'system'
+    except (AttributeError, RuntimeError):
+        return 'system'
+
+
+def _normalize_action(action):
+    """将 'imported' 等操作名映射到 ChangeLog 的 ENUM 值"""
+    return {
+        'imported': 'create',
+        'created': 'create',
+        'updated': 'update',
+        'deleted': 'delete'
+    }.get(action, action)
+
+
+def _build_row(action, object_type, object_identifier, status, detail_obj, username, now):
+    """生成一行 ChangeLog 列字典（在调用方线程中完成序列化）"""
+    # 将复数模型名 (如 'vms') 转为单数 (如 'vm') 以匹配 ENUM
+    object_type_singular = object_type[:-1] if object_type.endswith('s') else object_type
+
+    # 确保detail_obj是可序列化的
+    serialized_detail = None
+    if detail_obj is not None:
+        try:
+            serialized_detail = to_dict(detail_obj)
+            # 验证序列化结果
+            json.dumps(serialized_detail)  # 尝试转换为JSON字符串，验证是否可序列化
+        except Exception as e:
+            current_app.logger.error(f"Error serializing detail_obj: {str(e)}")
+            serialized_detail = {"error": f"Error serializing: {str(e)}"}
+
+    return {
+        'username': username,
+        'action': _normalize_action(action),
+        'status': status,
+        'object_type': object_type_singular,
+        'object_identifier': str(object_identifier),
+        'detail': serialized_detail,
+        'time': now
+    }
+
+
 def log_change(action, object_type, object_identifier, status='success', detail_obj=None):
     """
     根据项目中已有的 ChangeLog 模型记录变更。
-    此函数只将日志条目添加到当前数据库会话中，并不执行提交。
-    调用者需要负责在完成业务逻辑后统一提交会话。
+    日志不进入调用方的会话：由 ChangeLogWriter 异步批量写入（独立连接），
+    即使主事务失败日志也能保存。
     """
     try:
-        # 安全获取当前用户（在非请求上下文中 current_user 可能为 None）
-        try:
-            username = current_user.username if current_user.is_authenticated else 'system'
-        except (AttributeError, RuntimeError):
-            username = 'system'
-        
-        # 将复数模型名 (如 'vms') 转为单数 (如 'vm') 以匹配 ENUM
-        if object_type.endswith('s'):
-            object_type_singular = object_type[:-1]
-        else:
-            object_type_singular = object_type
-        
-        # 将 'imported' 操作映射到 'create'
-        if action == 'imported':
-            action = 'create'
-        elif action == 'created':
-            action = 'create'
-        elif action == 'updated':
-            action = 'update'
-        elif action == 'deleted':
-            action = 'delete'
-        
-        # 确保detail_obj是可序列化的
-        serialized_detail = None
-        if detail_obj is not None:
-            try:
-                serialized_detail = to_dict(detail_obj)
-                # 验证序列化结果
-                json.dumps(serialized_detail)  # 尝试转换为JSON字符串，验证是否可序列化
-            except Exception as e:
-                current_app.logger.error(f"Error serializing detail_obj: {str(e)}")
-                serialized_detail = {"error": f"Error serializing: {str(e)}"}
-        
-        # 创建日志条目
-        log_entry = ChangeLog(
-            username=username,
-            action=action,
-            status=status,
-            object_type=object_type_singular,
-            object_identifier=str(object_identifier),
-            detail=serialized_detail,
-            time=datetime.now()
+        row = _build_row(
+            action, object_type, object_identifier, status, detail_obj,
+            _current_username(), datetime.now()
         )
-        
-        # 使用独立的会话来保存日志，确保即使主事务失败日志也能保存
-        from sqlalchemy.orm import scoped_session, sessionmaker
-        log_session = scoped_session(sessionmaker(bind=db.engine))
-        log_session.add(log_entry)
-        log_session.commit()
-        
-        # 在移除会话前获取需要的属性值
-        log_entry_id = log_entry.id
-        
-        # 现在可以安全地移除会话
-        log_session.remove()
-        
-        # 记录一条确认信息到应用日志
-        current_app.logger.info(
-            f"Change log created: ID={log_entry_id}, type={object_type_singular}, " +
-            f"identifier={object_identifier}, action={action}, status={status}"
+        get_change_log_writer().submit(db.engine, [row])
+
+        current_app.logger.debug(
+            f"Change log queued: type={row['object_type']}, "
+            f"identifier={object_identifier}, action={row['action']}, status={status}"
         )
-        
     except Exception as e:
         # 在这里记录日志服务的内部错误，但不回滚会话，让调用者处理
-        current_app.logger.error(f"Failed when preparing the changelog: {e}", exc_info=True)
\ No newline at end of file
+        current_app.logger.error(f"Failed when preparing the changelog: {e}", exc_info=True)
+
+
+def log_changes_bulk(entries, username=None, status='success'):
+    """
+    批量记录变更日志（一次提交给 ChangeLogWriter，多行 INSERT 写入）
+
+    Args:
+        entries: [{'action', 'object_type', 'object_identifier', 'detail_obj'(可选), 'status'(可选)}, ...]
+        username: 操作人；为 None 时取 current_user（后台任务中没有请求上下文，需显式传入）
+        status: 条目未指定 status 时使用的默认值
+    """
+    if not entries:
+        return 0
+    try:
+        if username is None:
+            username = _current_username()
+
+        now = datetime.now()
+        rows = [
+            _build_row(
+                entry['action'], entry['object_type'], entry['object_identifier'],
+                entry.get('status', status), entry.get('detail_obj'), username, now
+            )
+            for entry in entries
+        ]
+        get_change_log_writer().submit(db.engine, rows)
+
+        current_app.logger.info(f"Change logs queued in bulk: count={len(rows)}, user={username}")
+        return len(rows)
+    except Exception as e:
+        current_app.logger.error(f"Failed when writing changelogs in bulk: {e}", exc_info=True)
+        return 0
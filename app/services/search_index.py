@@ -0,0 +1,330 @@
+# app/services/search_index.py
+
+"""
+SearchIndex - 宿主机 / VM 列表全局搜索索引
+
+列表搜索框原来对每个可搜索列做 CAST(列) LIKE '%关键字%'，再加上宿主机 host_info 的 JOIN 和
+每个自定义字段一个 custom_field_values 子查询，每次搜索都是全表扫描。
+开启 SEARCH_INDEX_ENABLED 后为每个资源维护一行搜索文档：
+- search_documents：(resource_type, resource_id) 为主键，content 为可搜索列、所属宿主机 host_info（VM）
+  和全部自定义字段值拼接成的文本，content 上建 n-gram 分词的 FULLTEXT 索引
+- 搜索时 MATCH(content) AGAINST('"关键字"' IN BOOLEAN MODE) 短语匹配，n-gram 短语匹配等价于子串匹配
+- 关键字短于 SEARCH_INDEX_MIN_TERM_LENGTH（应与 MySQL ngram_token_size 一致）或包含空白时回退到原来的查询
+
+与原查询的差异：
+- updated_at、vm_count 变化频繁且有不经过 ORM 的更新路径，不写入搜索文档
+- int / datetime 类型的自定义字段按子串匹配（原查询为精确匹配）
+
+同步方式（与自定义字段宽表相同）：
+- Session after_flush 记录被新增 / 修改 / 删除的宿主机、VM 和字段值所属资源，before_commit 时在同一事务的
+  SAVEPOINT 中重新生成这些资源的搜索文档；失败只把索引标记为过期，不影响业务写入
+- 宿主机 host_info 变化时同时重新生成其下所有 VM 的搜索文档
+- 不经过 ORM 的批量写入调用 mark_search_dirty() / mark_host_vms_dirty() 加入同一机制
+- 全量重建：python manage.py rebuildsearchindex
+
+索引状态（ready / stale）保存在 Valkey，只有状态为 ready 时列表搜索才使用索引
+"""
+
+import itertools
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import (
+    MetaData, Table, Column, BigInteger, String, Text,
+    delete, event, func, insert, inspect, select, text
+)
+from sqlalchemy.orm import Session
+
+from app.config import ListConfig
+from app.utils.cache_manager import CacheService
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = 'search_documents'
+
+# 写入搜索文档的资源列（列表 search_fields 中去掉 updated_at、vm_count）
+_DOCUMENT_COLUMNS = {
+    'host': ('id', 'host_info', 'host_ipaddress', 'ssh_port', 'status', 'department', 'virtualization_type', 'created_at'),
+    'vm': ('vm_ip', 'vm_user', 'os_type', 'status', 'cpus', 'memory_gb', 'disk_gb', 'domain_name', 'created_at'),
+}
+
+# 自定义字段值列
+_VALUE_COLUMNS = ('int_value', 'varchar_value', 'datetime_value', 'enum_value')
+
+STATE_READY = 'ready'
+STATE_STALE = 'stale'
+
+# session.info 中记录待同步资源的键；'host_vms' 表示该宿主机下的所有 VM
+_DIRTY_KEY = 'search_index_dirty'
+
+_table = Table(
+    SEARCH_TABLE, MetaData(),
+    Column('resource_type', String(16), primary_key=True),
+    Column('resource_id', BigInteger, primary_key=True, autoincrement=False),
+    Column('content', Text),
+)
+
+
+def _state_key(resource_type) -> str:
+    return f"dict:search_index:{resource_type}:state"
+
+
+def _resource_model(resource_type):
+    from app.models import Host, VM
+    return Host if resource_type == 'host' else VM
+
+
+# ==================== 索引状态 ====================
+_local_state: Dict[str, str] = {}
+
+
+def get_index_state(resource_type) -> Optional[str]:
+    """索引状态：ready / stale / None（从未重建）"""
+    client = CacheService().get_client()
+    if client is None:
+        return _local_state.get(resource_type)
+    try:
+        return client.get(_state_key(resource_type))
+    except Exception as e:
+        logger.warning(f"Failed to read search index state for {resource_type}: {e}")
+        return None
+
+
+def set_index_state(resource_type, state):
+    _local_state[resource_type] = state
+    client = CacheService().get_client()
+    if client is None:
+        return
+    try:
+        client.set(_state_key(resource_type), state)
+    except Exception as e:
+        logger.warning(f"Failed to set search index state for {resource_type}: {e}")
+
+
+# ==================== 搜索 ====================
+def search_condition(model, resource_type, search):
+    """
+    列表全局搜索条件
+
+    Returns:
+        model.id IN (匹配的搜索文档)；未开启、未重建、已过期或关键字无法使用索引时返回 None（调用方回退到原查询）
+    """
+    if not ListConfig.SEARCH_INDEX_ENABLED or resource_type not in _DOCUMENT_COLUMNS:
+        return None
+    # n-gram 不跨空白切词，短于分词长度的关键字无法命中
+    if len(search) < ListConfig.SEARCH_INDEX_MIN_TERM_LENGTH or any(ch.isspace() for ch in search):
+        return None
+    try:
+        if get_index_state(resource_type) != STATE_READY:
+            return None
+    except Exception as e:
+        logger.warning(f"Search index for {resource_type} unavailable: {e}")
+        return None
+
+    # 双引号内为短语，布尔模式的运算符按普通字符处理
+    phrase = '"' + search.replace('"', '') + '"'
+    matched = select(_table.c.resource_id).where(
+        _table.c.resource_type == resource_type,
+        _table.c.content.match(phrase)
+    )
+    return model.id.in_(matched)
+
+
+# ==================== 文档生成 ====================
+def _format_value(value) -> Optional[str]:
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return str(value)
+
+
+def _build_documents(executor, resource_type, resource_ids) -> List[Dict]:
+    """读取资源列、所属宿主机 host_info 和自定义字段值，生成搜索文档行（已删除的资源没有对应行）"""
+    from app.models import Host, CustomFieldValue
+
+    model = _resource_model(resource_type)
+    columns = [model.id] + [getattr(model, name) for name in _DOCUMENT_COLUMNS[resource_type] if name != 'id']
+    stmt = select(*columns).where(model.id.in_(resource_ids))
+    if resource_type == 'vm':
+        stmt = stmt.add_columns(Host.host_info).outerjoin(Host, model.host_id == Host.id)
+
+    parts_by_id = {}
+    for row in executor.execute(stmt):
+        parts_by_id[row[0]] = [_format_value(value) for value in row]
+    if not parts_by_id:
+        return []
+
+    value_rows = executor.execute(
+        select(CustomFieldValue.resource_id, *[getattr(CustomFieldValue, name) for name in _VALUE_COLUMNS])
+        .where(
+            CustomFieldValue.resource_type == resource_type,
+            CustomFieldValue.resource_id.in_(list(parts_by_id))
+        )
+        .order_by(CustomFieldValue.resource_id, CustomFieldValue.field_id)
+    )
+    for row in value_rows:
+        parts = parts_by_id.get(row[0])
+        if parts is not None:
+            parts.extend(_format_value(value) for value in row[1:])
+
+    return [
+        {
+            'resource_type': resource_type,
+            'resource_id': resource_id,
+            # host 的 id 属于可搜索列，VM 的 id 不是
+            'content': ' '.join(p for p in (parts if resource_type == 'host' else parts[1:]) if p)
+        }
+        for resource_id, parts in parts_by_id.items()
+    ]
+
+
+def _resync_documents(executor, resource_type, resource_ids):
+    """
+    删除并重新生成指定资源的搜索文档
+
+    Args:
+        executor: Session 或 Connection（在其当前事务中执行）
+    """
+    chunk_size = max(1, ListConfig.SEARCH_INDEX_CHUNK_SIZE)
+    resource_ids = sorted({rid for rid in resource_ids if rid is not None})
+    for i in range(0, len(resource_ids), chunk_size):
+        chunk = resource_ids[i:i + chunk_size]
+        executor.execute(delete(_table).where(
+            _table.c.resource_type == resource_type,
+            _table.c.resource_id.in_(chunk)
+        ))
+        documents = _build_documents(executor, resource_type, chunk)
+        if documents:
+            executor.execute(insert(_table), documents)
+
+
+def _create_table_sql() -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS `{SEARCH_TABLE}` ("
+        f"`resource_type` VARCHAR(16) NOT NULL COMMENT '资源类型host/vm', "
+        f"`resource_id` BIGINT NOT NULL COMMENT '资源ID', "
+        f"`content` MEDIUMTEXT NULL COMMENT '搜索文本', "
+        f"PRIMARY KEY (`resource_type`, `resource_id`), "
+        f"FULLTEXT KEY `ft_{SEARCH_TABLE}_content` (`content`) WITH PARSER ngram"
+        f") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='列表全局搜索文档'"
+    )
+
+
+def rebuild_search_index(resource_type) -> int:
+    """
+    全量重建搜索文档（表不存在时创建），成功后标记为 ready
+
+    Returns:
+        搜索文档行数
+    """
+    from app.models import db
+
+    with db.engine.begin() as conn:
+        if not inspect(conn).has_table(SEARCH_TABLE):
+            # 停用词在建索引时确定：默认停用词表会让包含 'a'、'in' 等停用词的 n-gram 无法被搜索到
+            conn.execute(text("SET SESSION innodb_ft_enable_stopword = OFF"))
+            conn.execute(text(_create_table_sql()))
+
+    model = _resource_model(resource_type)
+    chunk_size = max(1, ListConfig.SEARCH_INDEX_CHUNK_SIZE)
+    # 同一事务中删除并重新生成，重建期间读请求看到的是旧数据
+    with db.engine.begin() as conn:
+        conn.execute(delete(_table).where(_table.c.resource_type == resource_type))
+        last_id = 0
+        while True:
+            chunk = conn.execute(
+                select(model.id).where(model.id > last_id).order_by(model.id).limit(chunk_size)
+            ).scalars().all()
+            if not chunk:
+                break
+            documents = _build_documents(conn, resource_type, chunk)
+            if documents:
+                conn.execute(insert(_table), documents)
+            last_id = chunk[-1]
+        rows = conn.execute(
+            select(func.count()).select_from(_table).where(_table.c.resource_type == resource_type)
+        ).scalar() or 0
+
+    set_index_state(resource_type, STATE_READY)
+    logger.info(f"Search index rebuilt for {resource_type}: rows={rows}")
+    return rows
+
+
+# ==================== 增量同步 ====================
+def mark_search_dirty(session, resource_type, resource_ids: Iterable):
+    """不经过 ORM 写入资源或自定义字段值时调用，提交前重新生成这些资源的搜索文档"""
+    dirty = session.info.setdefault(_DIRTY_KEY, set())
+    dirty.update((resource_type, rid) for rid in resource_ids)
+
+
+def mark_host_vms_dirty(session, host_ids: Iterable):
+    """不经过 ORM 修改宿主机 host_info 时调用，提交前重新生成其下所有 VM 的搜索文档"""
+    mark_search_dirty(session, 'host_vms', host_ids)
+
+
+def _after_flush(session, flush_context):
+    """记录本次 flush 中被修改的宿主机、VM 和字段值所属资源"""
+    from app.models import Host, VM, CustomFieldValue
+
+    if not ListConfig.SEARCH_INDEX_ENABLED:
+        return
+    dirty = session.info.setdefault(_DIRTY_KEY, set())
+    modified = session.dirty
+    for obj in itertools.chain(session.new, modified, session.deleted):
+        if isinstance(obj, CustomFieldValue):
+            dirty.add((obj.resource_type, obj.resource_id))
+        elif isinstance(obj, VM):
+            dirty.add(('vm', obj.id))
+        elif isinstance(obj, Host):
+            dirty.add(('host', obj.id))
+            if obj in modified and inspect(obj).attrs.host_info.history.has_changes():
+                dirty.add(('host_vms', obj.id))
+
+
+def _before_commit(session):
+    """提交前在同一事务中同步搜索文档，失败时回滚到 SAVEPOINT 并标记索引过期"""
+    from app.models import VM
+
+    if not ListConfig.SEARCH_INDEX_ENABLED:
+        session.info.pop(_DIRTY_KEY, None)
+        return
+    session.flush()
+    dirty = session.info.pop(_DIRTY_KEY, None)
+    if not dirty:
+        return
+
+    by_type: Dict[str, set] = {}
+    for resource_type, resource_id in dirty:
+        by_type.setdefault(resource_type, set()).add(resource_id)
+
+    host_ids = by_type.pop('host_vms', None)
+    if host_ids:
+        try:
+            by_type.setdefault('vm', set()).update(
+                session.execute(select(VM.id).where(VM.host_id.in_(host_ids))).scalars()
+            )
+        except Exception as e:
+            logger.error(f"Failed to load VMs of {len(host_ids)} host(s) for search index: {e}")
+            set_index_state('vm', STATE_STALE)
+
+    for resource_type, resource_ids in by_type.items():
+        # 从未重建（表可能不存在）时不同步，重建时会生成全部文档
+        if resource_type not in _DOCUMENT_COLUMNS or get_index_state(resource_type) is None:
+            continue
+        try:
+            with session.begin_nested():
+                _resync_documents(session, resource_type, resource_ids)
+        except Exception as e:
+            logger.error(f"Failed to sync search index for {len(resource_ids)} {resource_type}(s): {e}")
+            set_index_state(resource_type, STATE_STALE)
+
+
+def _discard_dirty(session, previous_transaction=None):
+    session.info.pop(_DIRTY_KEY, None)
+
+
+event.listen(Session, 'after_flush', _after_flush)
+event.listen(Session, 'before_commit', _before_commit)
+event.listen(Session, 'after_rollback', _discard_dirty)
@@ -0,0 +1,307 @@
+# app/services/sync_job_service.py
+
+"""
+SyncJobService - VM 状态同步任务
+
+同步不再阻塞 HTTP 请求：
+1. POST 接口创建任务并立即返回 job_id，任务在进程内线程池中执行
+2. 每处理完一台宿主机，进度（完成宿主机数、变化 VM 数、失败数）和该宿主机的结果写入 Valkey
+3. 通过轮询接口或 SSE 流读取进度，任务运行中即可看到已完成宿主机的结果
+4. 同一 scope（全部 / 指定宿主机集合）同一时间只允许一个任务运行（Valkey SET NX 锁）
+
+Valkey 键：
+- sync:job:{job_id}          哈希，任务状态与计数
+- sync:job:{job_id}:hosts    列表，每台宿主机的结果（JSON）
+- sync:job:lock:{scope}      字符串，当前占用该 scope 的 job_id
+- sync:job:latest            字符串，最近一次创建的 job_id
+
+Valkey 不可用时退化为进程内存储（只在当前 worker 内可见）
+"""
+
+import json
+import sys
+import threading
+import uuid
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from app.config import SyncConfig
+from app.utils.cache_manager import CacheService
+
+logger = logging.getLogger(__name__)
+
+# 任务计数字段（整数）
+_COUNTER_FIELDS = ('hosts_total', 'hosts_done', 'hosts_failed', 'vms_total', 'vms_changed', 'vms_failed')
+
+# 终态
+FINISHED_STATUSES = ('completed', 'failed')
+
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def build_scope(host_ids=None):
+    """根据宿主机集合生成任务 scope"""
+    if not host_ids:
+        return 'all'
+    return 'hosts:' + ','.join(str(i) for i in sorted(set(host_ids)))
+
+
+# ==================== 任务存储 ====================
+class SyncJobStore:
+    """
+    同步任务存储（单例）
+    优先使用 Valkey，使多个 worker / Pod 都能读取同一任务的进度
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(SyncJobStore, cls).__new__(cls)
+                    cls._instance._init()
+        return cls._instance
+
+    def _init(self):
+        self._local_lock = threading.Lock()
+        self._local_jobs: Dict[str, Dict[str, Any]] = {}
+        self._local_hosts: Dict[str, List[Dict]] = {}
+        self._local_scopes: Dict[str, str] = {}
+        self._local_latest: Optional[str] = None
+
+    @staticmethod
+    def _job_key(job_id):
+        return f"sync:job:{job_id}"
+
+    @staticmethod
+    def _hosts_key(job_id):
+        return f"sync:job:{job_id}:hosts"
+
+    @staticmethod
+    def _scope_key(scope):
+        return f"sync:job:lock:{scope}"
+
+    def create(self, scope, created_by, engine) -> Dict[str, Any]:
+        """
+        创建任务并占用 scope
+
+        Returns:
+            {'job_id': str, 'created': bool}，scope 已被占用时 created=False，job_id 为正在运行的任务
+        """
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'scope': scope,
+            'status': 'queued',
+            'engine': engine,
+            'created_by': created_by or '',
+            'created_at': _now(),
+            'started_at': '',
+            'finished_at': '',
+            'error': '',
+            **{field: 0 for field in _COUNTER_FIELDS}
+        }
+
+        client = CacheService().get_client()
+        if client is None:
+            with self._local_lock:
+                running = self._local_scopes.get(scope)
+                if running:
+                    return {'job_id': running, 'created': False}
+                self._local_scopes[scope] = job_id
+                self._local_jobs[job_id] = job
+                self._local_hosts[job_id] = []
+                self._local_latest = job_id
+            return {'job_id': job_id, 'created': True}
+
+        if not client.set(self._scope_key(scope), job_id, nx=True, ex=SyncConfig.SYNC_JOB_LOCK_TTL):
+            return {'job_id': client.get(self._scope_key(scope)), 'created': False}
+
+        pipe = client.pipeline()
+        pipe.hset(self._job_key(job_id), mapping=job)
+        pipe.expire(self._job_key(job_id), SyncConfig.SYNC_JOB_TTL)
+        pipe.set('sync:job:latest', job_id, ex=SyncConfig.SYNC_JOB_TTL)
+        pipe.execute()
+        return {'job_id': job_id, 'created': True}
+
+    def update(self, job_id, **fields):
+        """更新任务字段"""
+        client = CacheService().get_client()
+        if client is None:
+            with self._local_lock:
+                if job_id in self._local_jobs:
+                    self._local_jobs[job_id].update(fields)
+            return
+        client.hset(self._job_key(job_id), mapping={k: ('' if v is None else v) for k, v in fields.items()})
+
+    def record_host(self, job_id, scope, host_result):
+        """
+        记录一台宿主机的结果并累加进度计数，同时续期 scope 锁
+
+        Args:
+            host_result: {'host', 'reachable', 'changed', 'failed', 'vms'}
+        """
+        increments = {
+            'hosts_done': 1,
+            'hosts_failed': 0 if host_result['reachable'] else 1,
+            'vms_changed': host_result['changed'],
+            'vms_failed': host_result['failed']
+        }
+
+        client = CacheService().get_client()
+        if client is None:
+            with self._local_lock:
+                job = self._local_jobs.get(job_id)
+                if job is not None:
+                    for field, value in increments.items():
+                        job[field] = int(job.get(field, 0)) + value
+                    self._local_hosts[job_id].append(host_result)
+            return
+
+        pipe = client.pipeline(transaction=False)
+        for field, value in increments.items():
+            if value:
+                pipe.hincrby(self._job_key(job_id), field, value)
+        pipe.rpush(self._hosts_key(job_id), json.dumps(host_result, default=str))
+        pipe.expire(self._hosts_key(job_id), SyncConfig.SYNC_JOB_TTL)
+        pipe.expire(self._scope_key(scope), SyncConfig.SYNC_JOB_LOCK_TTL)
+        pipe.execute()
+
+    def release_scope(self, scope, job_id):
+        """释放 scope 锁（仅当锁仍属于该任务）"""
+        client = CacheService().get_client()
+        if client is None:
+            with self._local_lock:
+                if self._local_scopes.get(scope) == job_id:
+                    del self._local_scopes[scope]
+            return
+        client.eval(_RELEASE_SCRIPT, 1, self._scope_key(scope), job_id)
+
+    def get(self, job_id, hosts_offset=0) -> Optional[Dict[str, Any]]:
+        """
+        读取任务状态及 hosts_offset 之后的宿主机结果
+
+        Returns:
+            任务 dict（含 hosts 列表），任务不存在时返回 None
+        """
+        client = CacheService().get_client()
+        if client is None:
+            with self._local_lock:
+                job = self._local_jobs.get(job_id)
+                if job is None:
+                    return None
+                job = dict(job)
+                job['hosts'] = list(self._local_hosts.get(job_id, [])[hosts_offset:])
+        else:
+            pipe = client.pipeline(transaction=False)
+            pipe.hgetall(self._job_key(job_id))
+            pipe.lrange(self._hosts_key(job_id), hosts_offset, -1)
+            job, hosts = pipe.execute()
+            if not job:
+                return None
+            job['hosts'] = [json.loads(h) for h in hosts]
+
+        for field in _COUNTER_FIELDS:
+            job[field] = int(job.get(field) or 0)
+        job['hosts_offset'] = hosts_offset
+        return job
+
+    def latest_job_id(self) -> Optional[str]:
+        """最近一次创建的任务 id"""
+        client = CacheService().get_client()
+        if client is None:
+            return self._local_latest
+        return client.get('sync:job:latest')
+
+
+# ==================== 任务执行 ====================
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=SyncConfig.SYNC_JOB_WORKERS, thread_name_prefix='sync-job')
+        return _executor
+
+
+def _run_job(app, job_id, scope, host_ids, engine):
+    """在线程池中执行同步任务"""
+    from app.services.vm_status_sync_service import VMStatusSyncService
+    from app.utils.ssh_helper import get_ssh_user
+
+    store = SyncJobStore()
+    with app.app_context():
+        try:
+            store.update(job_id, status='running', started_at=_now())
+
+            def on_progress(event, data):
+                if event == 'start':
+                    store.update(job_id, hosts_total=data['hosts'], vms_total=data['vms'])
+                elif event == 'host':
+                    store.record_host(job_id, scope, data)
+
+            result = VMStatusSyncService(get_ssh_user()).sync_all_vms(
+                engine=engine,
+                host_ids=host_ids,
+                progress_callback=on_progress
+            )
+            store.update(
+                job_id,
+                status='completed',
+                finished_at=_now(),
+                duration=result.get('duration') or 0,
+                success=result.get('success', 0),
+                failed=result.get('failed', 0),
+                changed=result.get('changed', 0),
+                unchanged=result.get('unchanged', 0)
+            )
+            logger.info(f"Sync job {job_id} completed: changed={result.get('changed', 0)}")
+        except Exception as e:
+            logger.error(f"Sync job {job_id} failed: {e}", exc_info=True)
+            store.update(job_id, status='failed', finished_at=_now(), error=str(e))
+        finally:
+            store.release_scope(scope, job_id)
+
+
+def asyncio_engine_supported() -> bool:
+    """asyncio 采集引擎是否可用：gevent worker（已 monkey patch）中不支持"""
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is None or not monkey.is_module_patched('socket')
+
+
+def submit_sync_job(app, host_ids=None, engine=None, created_by=None) -> Dict[str, Any]:
+    """
+    提交同步任务
+
+    Args:
+        app: Flask 应用对象（线程池中创建应用上下文）
+        host_ids: 只同步这些宿主机（默认全部）
+        engine: 采集引擎 thread / asyncio
+        created_by: 发起人用户名
+
+    Returns:
+        {'job_id': str, 'created': bool, 'scope': str}
+    """
+    scope = build_scope(host_ids)
+    engine = engine or SyncConfig.SYNC_ENGINE
+    created = SyncJobStore().create(scope, created_by, engine)
+    if created['created']:
+        _get_executor().submit(_run_job, app, created['job_id'], scope, host_ids, engine)
+        logger.info(f"Sync job {created['job_id']} submitted: scope={scope}, engine={engine}")
+    created['scope'] = scope
+    return created
@@ -0,0 +1,374 @@
+# app/services/sync_scheduler.py
+
+"""
+SyncScheduler - VM 状态后台同步调度器
+
+运行方式（二选一）：
+1. 独立进程：python manage.py runscheduler
+2. 随 gunicorn worker 启动（SYNC_SCHEDULER_ENABLED=true），多个 worker / Pod 之间通过 Valkey 锁选主，
+   同一时间只有 leader 执行同步
+
+增量调度：
+- 每台宿主机有独立的轮询间隔，保存在 Valkey 哈希 sync:scheduler:hosts 中（leader 切换后可继续使用）
+- 本轮状态发生变化或连接失败的宿主机：间隔重置为 SYNC_SCHEDULER_MIN_INTERVAL
+- 状态稳定的宿主机：间隔按 SYNC_SCHEDULER_BACKOFF 倍数增长，直到 SYNC_SCHEDULER_MAX_INTERVAL
+
+HTTP 接口只负责触发（写入 sync:scheduler:trigger）和查询（读取 sync:scheduler:last_run），
+不在请求 worker 内执行 SSH 操作
+"""
+
+import json
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+import logging
+from datetime import datetime
+
+from app.config import SyncConfig
+from app.utils.cache_manager import CacheService
+
+logger = logging.getLogger(__name__)
+
+LEADER_KEY = 'sync:scheduler:leader'
+HOSTS_KEY = 'sync:scheduler:hosts'
+TRIGGER_KEY = 'sync:scheduler:trigger'
+LAST_RUN_KEY = 'sync:scheduler:last_run'
+
+# 仅当锁仍属于自己时续期 / 释放
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class SyncScheduler:
+    """
+    VM 状态后台同步调度器
+
+    使用方式：
+        scheduler = SyncScheduler(app)
+        scheduler.start()           # 后台线程运行
+        scheduler.run_forever()     # 当前线程阻塞运行
+
+    standalone=True 表示独立进程（python manage.py runscheduler），只有这种模式在 Valkey 不可用时直接作为 leader；
+    随 gunicorn worker 启动的调度器拿不到 leader 锁时保持 follower，避免所有 worker 同时同步
+    """
+
+    def __init__(self, app, standalone=False):
+        self.app = app
+        self.standalone = standalone
+        self.identity = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._is_leader = False
+        self._lock_unavailable = False
+        self._threads = []
+        # Valkey 不可用时使用进程内状态
+        self._local_hosts = {}
+        self._local_trigger = False
+        self._local_last_run = None
+
+    @property
+    def is_leader(self):
+        return self._is_leader
+
+    # ---------- 选主 ----------
+
+    def _elect(self):
+        """竞选或续期 leader 锁"""
+        client = CacheService().get_client()
+        if client is None:
+            if self.standalone:
+                # 独立进程模式：无 Valkey 时按单实例运行
+                self._is_leader = True
+                return
+            # 没有 leader 锁时不自选，下一次心跳重试
+            if not self._lock_unavailable:
+                logger.warning(f"Sync scheduler cannot acquire leader lock (Valkey unavailable), staying follower: {self.identity}")
+            self._lock_unavailable = True
+            self._is_leader = False
+            return
+        self._lock_unavailable = False
+
+        ttl_ms = SyncConfig.SYNC_SCHEDULER_LOCK_TTL * 1000
+        try:
+            if self._is_leader:
+                renewed = client.eval(_RENEW_SCRIPT, 1, LEADER_KEY, self.identity, ttl_ms)
+                if not renewed:
+                    logger.warning(f"Sync scheduler lost leadership: {self.identity}")
+                    self._is_leader = False
+            elif client.set(LEADER_KEY, self.identity, nx=True, px=ttl_ms):
+                logger.info(f"Sync scheduler became leader: {self.identity}")
+                self._is_leader = True
+        except Exception as e:
+            logger.warning(f"Sync scheduler leader election failed: {e}")
+            self._is_leader = False
+
+    def _heartbeat_loop(self):
+        interval = max(1, SyncConfig.SYNC_SCHEDULER_LOCK_TTL / 3)
+        while not self._stop.is_set():
+            self._elect()
+            self._stop.wait(interval)
+
+    def _release(self):
+        client = CacheService().get_client()
+        if client is not None and self._is_leader:
+            try:
+                client.eval(_RELEASE_SCRIPT, 1, LEADER_KEY, self.identity)
+            except Exception as e:
+                logger.warning(f"Failed to release sync scheduler lock: {e}")
+        self._is_leader = False
+
+    # ---------- 宿主机调度状态 ----------
+
+    def _load_host_states(self):
+        client = CacheService().get_client()
+        if client is None:
+            return dict(self._local_hosts)
+        raw = client.hgetall(HOSTS_KEY)
+        return {int(k): json.loads(v) for k, v in raw.items()}
+
+    def _save_host_states(self, states, removed_ids=()):
+        client = CacheService().get_client()
+        if client is None:
+            self._local_hosts.update(states)
+            for host_id in removed_ids:
+                self._local_hosts.pop(host_id, None)
+            return
+        pipe = client.pipeline(transaction=False)
+        if states:
+            pipe.hset(HOSTS_KEY, mapping={str(k): json.dumps(v) for k, v in states.items()})
+        if removed_ids:
+            pipe.hdel(HOSTS_KEY, *[str(i) for i in removed_ids])
+        pipe.execute()
+
+    def _pop_trigger(self):
+        """读取并清除手动触发标志"""
+        client = CacheService().get_client()
+        if client is None:
+            triggered, self._local_trigger = self._local_trigger, False
+            return triggered
+        pipe = client.pipeline()
+        pipe.get(TRIGGER_KEY)
+        pipe.delete(TRIGGER_KEY)
+        value, _ = pipe.execute()
+        return value is not None
+
+    @staticmethod
+    def _next_state(state, host_result, now):
+        """根据本轮结果计算下一次轮询间隔"""
+        interval = state.get('interval', SyncConfig.SYNC_SCHEDULER_MIN_INTERVAL)
+        if host_result is None:
+            # 宿主机上没有 VM，按最长间隔轮询
+            interval = SyncConfig.SYNC_SCHEDULER_MAX_INTERVAL
+        elif not host_result['reachable'] or host_result['changed'] or host_result['failed']:
+            interval = SyncConfig.SYNC_SCHEDULER_MIN_INTERVAL
+        else:
+            interval = min(interval * SyncConfig.SYNC_SCHEDULER_BACKOFF, SyncConfig.SYNC_SCHEDULER_MAX_INTERVAL)
+
+        # 加入少量抖动，避免大量宿主机在同一时刻到期
+        jitter = random.uniform(0, interval * 0.1)
+        return {
+            'interval': interval,
+            'next_due': now + interval + jitter,
+            'last_run': now,
+            'last_changed': host_result['changed'] if host_result else 0,
+            'last_reachable': host_result['reachable'] if host_result else True
+        }
+
+    # ---------- 调度 ----------
+
+    def run_once(self, force=False):
+        """
+        执行一轮调度：选出到期的宿主机并同步
+
+        :param force: 忽略轮询间隔，同步所有宿主机
+        :return: 本轮摘要 dict，没有到期宿主机时返回 None
+        """
+        from app.models import Host
+        from app.services.vm_status_sync_service import VMStatusSyncService
+        from app.utils.ssh_helper import get_ssh_user
+
+        with self.app.app_context():
+            force = self._pop_trigger() or force
+            now = time.time()
+            hosts = Host.query.with_entities(Host.id, Host.host_info).all()
+            states = self._load_host_states()
+
+            due_ids = [
+                host_id for host_id, _ in hosts
+                if force or host_id not in states or states[host_id].get('next_due', 0) <= now
+            ]
+            current_ids = {host_id for host_id, _ in hosts}
+            removed_ids = [host_id for host_id in states if host_id not in current_ids]
+            if not due_ids:
+                if removed_ids:
+                    self._save_host_states({}, removed_ids)
+                return None
+
+            # 单轮宿主机数量上限，优先处理最早到期的
+            due_ids.sort(key=lambda i: states.get(i, {}).get('next_due', 0))
+            due_ids = due_ids[:SyncConfig.SYNC_SCHEDULER_MAX_HOSTS_PER_RUN]
+
+            started_at = datetime.now()
+            result = VMStatusSyncService(get_ssh_user()).sync_all_vms(host_ids=due_ids)
+
+            by_host_id = {r['host_id']: r for r in result.get('hosts', {}).values()}
+            finished = time.time()
+            new_states = {
+                host_id: self._next_state(states.get(host_id, {}), by_host_id.get(host_id), finished)
+                for host_id in due_ids
+            }
+            self._save_host_states(new_states, removed_ids)
+
+            summary = {
+                'leader': self.identity,
+                'forced': force,
+                'started_at': started_at.strftime('%Y-%m-%d %H:%M:%S'),
+                'finished_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'duration': result.get('duration'),
+                'hosts': len(due_ids),
+                'total': result.get('total', 0),
+                'success': result.get('success', 0),
+                'failed': result.get('failed', 0),
+                'changed': result.get('changed', 0),
+                'unchanged': result.get('unchanged', 0)
+            }
+            client = CacheService().get_client()
+            if client is not None:
+                client.set(LAST_RUN_KEY, json.dumps(summary))
+            else:
+                self._local_last_run = summary
+            logger.info(f"Sync scheduler run finished: hosts={summary['hosts']}, changed={summary['changed']}")
+            return summary
+
+    def _schedule_loop(self):
+        while not self._stop.is_set():
+            if self._is_leader:
+                try:
+                    self.run_once()
+                except Exception as e:
+                    logger.error(f"Sync scheduler run failed: {e}", exc_info=True)
+            self._stop.wait(SyncConfig.SYNC_SCHEDULER_TICK)
+
+    def start(self):
+        """在后台线程中启动调度器"""
+        if self._threads:
+            return
+        for target, name in ((self._heartbeat_loop, 'sync-scheduler-heartbeat'),
+                             (self._schedule_loop, 'sync-scheduler')):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Sync scheduler started: {self.identity}")
+
+    def run_forever(self):
+        """在当前线程阻塞运行调度器（独立进程模式）"""
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name='sync-scheduler-heartbeat', daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+        logger.info(f"Sync scheduler running in foreground: {self.identity}")
+        try:
+            self._schedule_loop()
+        finally:
+            self.stop()
+
+    def stop(self):
+        """停止调度器并释放 leader 锁"""
+        self._stop.set()
+        self._release()
+
+
+# ==================== 触发与查询（供 HTTP 接口使用） ====================
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def start_scheduler(app):
+    """在当前进程中启动调度器（每个进程只启动一次）"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = SyncScheduler(app)
+            _scheduler.start()
+    return _scheduler
+
+
+def stop_scheduler():
+    """停止当前进程中的调度器"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            _scheduler.stop()
+            _scheduler = None
+
+
+def request_sync_run():
+    """
+    请求调度器尽快执行一次全量同步
+
+    :return: 是否成功写入触发标志
+    """
+    client = CacheService().get_client()
+    if client is None:
+        if _scheduler is None:
+            return False
+        _scheduler._local_trigger = True
+        return True
+    client.set(TRIGGER_KEY, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    return True
+
+
+def get_scheduler_status():
+    """
+    获取调度器状态：当前 leader、是否有待执行的触发、上一轮摘要、宿主机轮询间隔分布
+    """
+    client = CacheService().get_client()
+    if client is None:
+        local = _scheduler
+        return {
+            'enabled': SyncConfig.SYNC_SCHEDULER_ENABLED,
+            'leader': local.identity if local and local.is_leader else None,
+            'pending_trigger': bool(local and local._local_trigger),
+            'last_run': local._local_last_run if local else None,
+            'hosts': {}
+        }
+
+    pipe = client.pipeline(transaction=False)
+    pipe.get(LEADER_KEY)
+    pipe.exists(TRIGGER_KEY)
+    pipe.get(LAST_RUN_KEY)
+    pipe.hgetall(HOSTS_KEY)
+    leader, pending, last_run, hosts = pipe.execute()
+
+    now = time.time()
+    intervals = {}
+    due = 0
+    for raw in hosts.values():
+        state = json.loads(raw)
+        intervals[str(int(state['interval']))] = intervals.get(str(int(state['interval'])), 0) + 1
+        if state.get('next_due', 0) <= now:
+            due += 1
+
+    return {
+        'enabled': SyncConfig.SYNC_SCHEDULER_ENABLED,
+        'leader': leader,
+        'pending_trigger': bool(pending),
+        'last_run': json.loads(last_run) if last_run else None,
+        'hosts': {
+            'tracked': len(hosts),
+            'due': due,
+            'intervals': intervals
+        }
+    }
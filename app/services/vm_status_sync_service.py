@@ -3,15 +3,22 @@
 import re
 import os
 import time
+from collections import namedtuple
 from datetime import datetime
+from sqlalchemy import update
 from flask import current_app
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from app.models import db, VM, Host
-from app.services.log_service import log_change
-from app.utils.ssh_helper import execute_ssh_command, get_ssh_user
-from app.utils.cache_manager import delayed_delete_vm, invalidate_all_stats
+from app.config import SyncConfig
+from app.services.log_service import log_change, log_changes_bulk
+from app.utils.ssh_helper import execute_ssh_command, get_ssh_user, get_ssh_key_file
+from app.services.async_sync_engine import AsyncSyncEngine, HOST_STATE_COMMANDS
+from app.utils.cache_manager import delayed_delete_vm, delayed_delete_vms, invalidate_all_stats
+from app.services.dashboard_stats_service import record_status_transitions
+from app.services.search_index import mark_search_dirty
+from app.utils.metrics import SYNC_DURATION
 
 
 # 创建限流器
@@ -21,6 +28,19 @@ limiter = Limiter(
     default_limits=["200 per day", "50 per hour"]
 )
 
+# 同步线程使用的只读快照：ORM 对象属于请求线程的 db.session，子线程读取过期属性会通过该会话触发查询
+_HostSnapshot = namedtuple('_HostSnapshot', 'id host_info host_ipaddress ssh_port virtualization_type')
+_VMSnapshot = namedtuple('_VMSnapshot', 'id vm_ip status host')
+
+
+def _snapshot_vm(vm):
+    host = vm.host
+    host_snapshot = _HostSnapshot(
+        host.id, host.host_info, host.host_ipaddress, host.ssh_port, host.virtualization_type
+    ) if host else None
+    return _VMSnapshot(vm.id, vm.vm_ip, vm.status, host_snapshot)
+
+
 class VMStatusSyncService:
     """VM 状态同步服务（只同步状态）"""
     
@@ -50,18 +70,29 @@ class VMStatusSyncService:
         
         return execute_ssh_command(host_ip, command, self.ssh_user, timeout, ssh_port)
     
-    def sync_all_vms(self, max_workers=10):
+    def sync_all_vms(self, max_workers=10, engine=None, host_ids=None, progress_callback=None):
         """
         同步所有 VM 的状态（并发版本）
         
-        :param max_workers: 最大并发线程数（默认 10，即同时处理 10 个宿主机）
-        返回：dict: {'total': int, 'success': int, 'failed': int, 'changed': int, 'unchanged': int, 'vms': list}
+        :param max_workers: 最大并发线程数（默认 10，即同时处理 10 个宿主机，仅 thread 引擎使用）
+        :param engine: 采集引擎 thread / asyncio（默认读取 SYNC_ENGINE 配置）
+        :param host_ids: 只同步这些宿主机上的 VM（默认 None 表示全部）
+        :param progress_callback: 进度回调 callback(event, data)，
+                                  event='start' 时 data={'hosts', 'vms'}；
+                                  event='host' 时 data={'host', 'host_id', 'reachable', 'changed', 'failed', 'vms'}
+        返回：dict: {'total': int, 'success': int, 'failed': int, 'changed': int, 'unchanged': int, 'vms': list,
+                     'hosts': {host_info: {'host_id', 'reachable', 'changed', 'failed'}}}
         """
-        vms = VM.query.all()
+        engine = (engine or SyncConfig.SYNC_ENGINE).lower()
+        started_at = time.monotonic()
+        query = VM.query
+        if host_ids is not None:
+            query = query.filter(VM.host_id.in_(host_ids))
+        vms = query.all()
         
-        # 按宿主机分组
+        # 按宿主机分组（转为快照，子线程不访问 db.session）
         host_vms = {}
-        for vm in vms:
+        for vm in map(_snapshot_vm, vms):
             if vm.host:
                 host_key = vm.host.host_info
                 if host_key not in host_vms:
@@ -77,8 +108,30 @@ class VMStatusSyncService:
             'failed': 0,
             'changed': 0,
             'unchanged': 0,
-            'vms': []
+            'vms': [],
+            'hosts': {}
         }
+        # 待写回的状态变化：[(vm_id, vm_ip, new_status, log_details), ...]
+        pending_updates = []
+        
+        def report_progress(event, data):
+            """调用进度回调，回调异常不影响同步本身"""
+            if progress_callback is None:
+                return
+            try:
+                progress_callback(event, data)
+            except Exception as e:
+                current_app.logger.warning(f"Sync progress callback failed: {e}")
+        
+        def report_host(host_info, summary, host_vm_results):
+            report_progress('host', {
+                'host': host_info,
+                **summary,
+                # 只上报发生变化或失败的 VM，控制进度数据大小
+                'vms': [v for v in host_vm_results if v.get('changed') or not v.get('success')]
+            })
+        
+        report_progress('start', {'hosts': len(host_vms), 'vms': len(vms)})
         
         # 获取 Flask 应用对象（用于子线程创建上下文）
         from flask import current_app
@@ -90,8 +143,12 @@ class VMStatusSyncService:
                 from flask import current_app
                 return process_host_impl(host_info, host_vm_list)
         
-        def process_host_impl(host_info, host_vm_list):
-            """处理单个宿主机的 VM（实际实现）"""
+        def process_host_impl(host_info, host_vm_list, prefetched_map=None):
+            """
+            处理单个宿主机的 VM（实际实现）
+            
+            :param prefetched_map: asyncio 引擎预先采集好的 vm_info_map（为 None 时在此处通过 SSH 采集）
+            """
             host = host_vm_list[0].host if host_vm_list[0].host else None
             host_type = host.virtualization_type if host else None
             # 使用 host_ipaddress 和 ssh_port 字段
@@ -104,30 +161,31 @@ class VMStatusSyncService:
                 'failed': 0,
                 'changed': 0,
                 'unchanged': 0,
-                'vms': []
+                'vms': [],
+                'updates': []
             }
             
             # 预先获取宿主机的所有 VM 信息
             vm_info_map = None
             vm_list_output = None
             
-            if host_type == 'pve':
+            if prefetched_map is not None:
+                vm_info_map = prefetched_map
+            elif host_type == 'pve':
                 vm_info_map = self._get_all_vm_ids_and_status_pve(host_ip, ssh_port)
             elif host_type == 'kvm':
-                vm_list_output, error, _ = self.execute_ssh_command(host_ip, "sudo virsh list --all --name", port=ssh_port)
-                vm_list_output = vm_list_output if not error else None
+                if SyncConfig.SYNC_KVM_BATCH:
+                    # 批量模式：一条命令获取所有 domain 的名称和状态
+                    vm_info_map = self._get_all_vm_ids_and_status_kvm(host_ip, ssh_port)
+                else:
+                    vm_list_output, error, _ = self.execute_ssh_command(host_ip, "sudo virsh list --all --name", port=ssh_port)
+                    vm_list_output = vm_list_output if not error else None
             
             if host_type and not vm_info_map and not vm_list_output:
                 # SSH 连接失败，所有 VM 状态设为 unknown
                 for vm in host_vm_list:
                     old_status = vm.status
                     if old_status != 'unknown':
-                        vm.status = 'unknown'
-                        vm.updated_at = datetime.now()
-                        
-                        # 状态变化是写操作，必须双删缓存
-                        delayed_delete_vm(vm.id)
-                        
                         log_details = {
                             'old_status': old_status,
                             'new_status': 'unknown',
@@ -136,13 +194,8 @@ class VMStatusSyncService:
                             'error': f'Failed to connect to host {host_ip}'
                         }
                         
-                        log_change(
-                            'update',
-                            'vm',
-                            vm.vm_ip,
-                            status='success',
-                            detail_obj=log_details
-                        )
+                        # 状态变化先收集，所有宿主机处理完后统一批量写回
+                        host_results['updates'].append((vm.id, vm.vm_ip, 'unknown', log_details))
                         
                         host_results['vms'].append({
                             'success': True,
@@ -163,10 +216,18 @@ class VMStatusSyncService:
                     host_results['success'] += 1
                 
                 with results_lock:
+                    pending_updates.extend(host_results['updates'])
                     all_results['vms'].extend(host_results['vms'])
                     all_results['success'] += host_results['success']
                     all_results['changed'] += host_results['changed']
                     all_results['unchanged'] += host_results['unchanged']
+                    all_results['hosts'][host_info] = {
+                        'host_id': host.id if host else None,
+                        'reachable': False,
+                        'changed': host_results['changed'],
+                        'failed': len(host_vm_list)
+                    }
+                report_host(host_info, all_results['hosts'][host_info], host_results['vms'])
                 return
             
             # 处理每个 VM
@@ -200,12 +261,6 @@ class VMStatusSyncService:
                             # 找不到 VM，状态设为 unknown
                             old_status = vm.status
                             if old_status != 'unknown':
-                                vm.status = 'unknown'
-                                vm.updated_at = datetime.now()
-                                
-                                # 状态变化是写操作，必须双删缓存
-                                delayed_delete_vm(vm.id)
-                                
                                 log_details = {
                                     'old_status': old_status,
                                     'new_status': 'unknown',
@@ -214,13 +269,8 @@ class VMStatusSyncService:
                                     'error': f'No VMID found for IP: {vm.vm_ip}'
                                 }
                                 
-                                log_change(
-                                    'update',
-                                    'vm',
-                                    vm.vm_ip,
-                                    status='success',
-                                    detail_obj=log_details
-                                )
+                                # 状态变化先收集，所有宿主机处理完后统一批量写回
+                                host_results['updates'].append((vm.id, vm.vm_ip, 'unknown', log_details))
                                 
                                 host_results['vms'].append({
                                     'success': True,
@@ -244,18 +294,12 @@ class VMStatusSyncService:
                         status = matched_vm_data.get('status', 'stopped')
                     
                     elif host_type == 'kvm':
-                        identifier = self._get_vm_identifier_kvm(vm_list_output, vm.vm_ip)
+                        identifier = self._get_vm_identifier_kvm(vm_info_map if vm_info_map else vm_list_output, vm.vm_ip)
                         
                         if not identifier:
                             # 找不到 VM，状态设为 unknown
                             old_status = vm.status
                             if old_status != 'unknown':
-                                vm.status = 'unknown'
-                                vm.updated_at = datetime.now()
-                                
-                                # 状态变化是写操作，必须双删缓存
-                                delayed_delete_vm(vm.id)
-                                
                                 log_details = {
                                     'old_status': old_status,
                                     'new_status': 'unknown',
@@ -264,13 +308,8 @@ class VMStatusSyncService:
                                     'error': 'No VM name found'
                                 }
                                 
-                                log_change(
-                                    'update',
-                                    'vm',
-                                    vm.vm_ip,
-                                    status='success',
-                                    detail_obj=log_details
-                                )
+                                # 状态变化先收集，所有宿主机处理完后统一批量写回
+                                host_results['updates'].append((vm.id, vm.vm_ip, 'unknown', log_details))
                                 
                                 host_results['vms'].append({
                                     'success': True,
@@ -291,68 +330,50 @@ class VMStatusSyncService:
                             host_results['success'] += 1
                             continue
                         
-                        status_output, status_err, _ = self.execute_ssh_command(host_ip, f"sudo virsh domstate {identifier}", port=ssh_port)
+                        if vm_info_map:
+                            status = vm_info_map[identifier].get('status', 'stopped')
+                        else:
+                            status_output, status_err, _ = self.execute_ssh_command(host_ip, f"sudo virsh domstate {identifier}", port=ssh_port)
                         
-                        if status_err or not status_output:
-                            # 获取状态失败，设为 unknown
-                            old_status = vm.status
-                            if old_status != 'unknown':
-                                vm.status = 'unknown'
-                                vm.updated_at = datetime.now()
+                            if status_err or not status_output:
+                                # 获取状态失败，设为 unknown
+                                old_status = vm.status
+                                if old_status != 'unknown':
+                                    log_details = {
+                                        'old_status': old_status,
+                                        'new_status': 'unknown',
+                                        'host': host_info,
+                                        'sync_type': 'status_sync',
+                                        'error': 'Failed to get VM status'
+                                    }
+                                    
+                                    # 状态变化先收集，所有宿主机处理完后统一批量写回
+                                    host_results['updates'].append((vm.id, vm.vm_ip, 'unknown', log_details))
                                 
-                                # 状态变化是写操作，必须双删缓存
-                                delayed_delete_vm(vm.id)
-                                
-                                log_details = {
-                                    'old_status': old_status,
-                                    'new_status': 'unknown',
-                                    'host': host_info,
-                                    'sync_type': 'status_sync',
-                                    'error': 'Failed to get VM status'
-                                }
-                                
-                                log_change(
-                                    'update',
-                                    'vm',
-                                    vm.vm_ip,
-                                    status='success',
-                                    detail_obj=log_details
-                                )
-                                
-                                host_results['vms'].append({
-                                    'success': True,
-                                    'vm_ip': vm.vm_ip,
-                                    'old_status': old_status,
-                                    'new_status': 'unknown',
-                                    'changed': True
-                                })
-                                host_results['changed'] += 1
-                            else:
-                                host_results['vms'].append({
-                                    'success': True,
-                                    'vm_ip': vm.vm_ip,
-                                    'status': 'unknown',
-                                    'changed': False
-                                })
-                                host_results['unchanged'] += 1
-                            host_results['success'] += 1
-                            continue
+                                    host_results['vms'].append({
+                                        'success': True,
+                                        'vm_ip': vm.vm_ip,
+                                        'old_status': old_status,
+                                        'new_status': 'unknown',
+                                        'changed': True
+                                    })
+                                    host_results['changed'] += 1
+                                else:
+                                    host_results['vms'].append({
+                                        'success': True,
+                                        'vm_ip': vm.vm_ip,
+                                        'status': 'unknown',
+                                        'changed': False
+                                    })
+                                    host_results['unchanged'] += 1
+                                host_results['success'] += 1
+                                continue
                         
-                        status = 'stopped'
-                        if 'running' in status_output.lower():
-                            status = 'running'
-                        elif 'shut off' in status_output.lower():
-                            status = 'shut off'
+                            status = self._normalize_kvm_state(status_output)
                     else:
                         # 不支持的宿主机类型，设为 unknown
                         old_status = vm.status
                         if old_status != 'unknown':
-                            vm.status = 'unknown'
-                            vm.updated_at = datetime.now()
-                            
-                            # 状态变化是写操作，必须双删缓存
-                            delayed_delete_vm(vm.id)
-                            
                             log_details = {
                                 'old_status': old_status,
                                 'new_status': 'unknown',
@@ -361,13 +382,8 @@ class VMStatusSyncService:
                                 'error': f'Unsupported host type: {host_type}'
                             }
                             
-                            log_change(
-                                'update',
-                                'vm',
-                                vm.vm_ip,
-                                status='success',
-                                detail_obj=log_details
-                            )
+                            # 状态变化先收集，所有宿主机处理完后统一批量写回
+                            host_results['updates'].append((vm.id, vm.vm_ip, 'unknown', log_details))
                             
                             host_results['vms'].append({
                                 'success': True,
@@ -400,12 +416,6 @@ class VMStatusSyncService:
                     status_changed = old_status != new_status
                     
                     if status_changed:
-                        vm.status = new_status
-                        vm.updated_at = datetime.now()
-                        
-                        # 状态变化是写操作，必须双删缓存
-                        delayed_delete_vm(vm.id)
-                        
                         log_details = {
                             'old_status': old_status,
                             'new_status': new_status,
@@ -413,13 +423,8 @@ class VMStatusSyncService:
                             'sync_type': 'status_sync'
                         }
                         
-                        log_change(
-                            'update',
-                            'vm',
-                            vm.vm_ip,
-                            status='success',
-                            detail_obj=log_details
-                        )
+                        # 状态变化先收集，所有宿主机处理完后统一批量写回
+                        host_results['updates'].append((vm.id, vm.vm_ip, new_status, log_details))
                         
                         host_results['vms'].append({
                             'success': True,
@@ -450,34 +455,154 @@ class VMStatusSyncService:
                     host_results['failed'] += 1
             
             with results_lock:
+                pending_updates.extend(host_results['updates'])
                 all_results['vms'].extend(host_results['vms'])
                 all_results['success'] += host_results['success']
                 all_results['failed'] += host_results['failed']
                 all_results['changed'] += host_results['changed']
                 all_results['unchanged'] += host_results['unchanged']
+                all_results['hosts'][host_info] = {
+                    'host_id': host.id if host else None,
+                    'reachable': True,
+                    'changed': host_results['changed'],
+                    'failed': host_results['failed']
+                }
+            report_host(host_info, all_results['hosts'][host_info], host_results['vms'])
         
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_host = {
-                executor.submit(process_host_wrapper, host_info, host_vm_list): host_info 
-                for host_info, host_vm_list in host_vms.items()
-            }
-            
-            for future in as_completed(future_to_host):
-                host_info = future_to_host[future]
+        if engine == 'asyncio':
+            # asyncio 引擎：一次性并发采集所有宿主机，再在当前线程中逐台比对状态
+            host_maps = self._collect_host_maps_async(host_vms)
+            for host_info, host_vm_list in host_vms.items():
                 try:
-                    future.result()
+                    process_host_impl(host_info, host_vm_list, host_maps.get(host_info))
                 except Exception as e:
                     current_app.logger.error(f"Host {host_info} processing failed: {e}")
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                future_to_host = {
+                    executor.submit(process_host_wrapper, host_info, host_vm_list): host_info 
+                    for host_info, host_vm_list in host_vms.items()
+                }
+                
+                for future in as_completed(future_to_host):
+                    host_info = future_to_host[future]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        current_app.logger.error(f"Host {host_info} processing failed: {e}")
         
+        all_results['engine'] = engine
+        all_results['duration'] = round(time.monotonic() - started_at, 2)
+        current_app.logger.info(
+            f"VM status sync finished: engine={engine}, hosts={len(host_vms)}, vms={all_results['total']}, "
+            f"changed={all_results['changed']}, duration={all_results['duration']}s"
+        )
+        
+        self._apply_status_updates(pending_updates)
+        # 包括写回数据库的耗时
+        SYNC_DURATION.observe(time.monotonic() - started_at, engine=engine)
+        
+        return all_results
+    
+    def _apply_status_updates(self, updates):
+        """
+        批量写回同步得到的状态变化
+        
+        1. 按目标状态分组，每组执行一条 UPDATE ... WHERE id IN (...)（按 chunk 切分）
+        2. 一次 pipeline 删除所有变化 VM 的缓存，并只安排一次延迟删除
+        3. 写入变更日志，失效统计缓存
+        
+        :param updates: [(vm_id, vm_ip, new_status, log_details), ...]
+        :return: 写回的 VM 数量
+        """
+        if not updates:
+            return 0
+        
+        ids_by_status = {}
+        for vm_id, _, new_status, _ in updates:
+            ids_by_status.setdefault(new_status, []).append(vm_id)
+        
+        now = datetime.now()
+        chunk_size = SyncConfig.SYNC_UPDATE_CHUNK_SIZE
         try:
+            for new_status, vm_ids in ids_by_status.items():
+                for i in range(0, len(vm_ids), chunk_size):
+                    db.session.execute(
+                        update(VM)
+                        .where(VM.id.in_(vm_ids[i:i + chunk_size]))
+                        .values(status=new_status, updated_at=now)
+                        .execution_options(synchronize_session=False)
+                    )
+            mark_search_dirty(db.session, 'vm', [vm_id for vm_id, _, _, _ in updates])
             db.session.commit()
-            # 同步完成后失效所有统计缓存
-            invalidate_all_stats()
         except Exception as e:
             current_app.logger.error(f"Failed to commit database changes: {e}")
             db.session.rollback()
+            return 0
         
-        return all_results
+        # 状态变化是写操作，必须双删缓存（批量）
+        delayed_delete_vms([vm_id for vm_id, _, _, _ in updates])
+        
+        # Core UPDATE 不触发 ORM 事件，显式累加仪表盘计数
+        record_status_transitions(
+            'vm',
+            [(log_details.get('old_status'), new_status) for _, _, new_status, log_details in updates]
+        )
+        
+        # 变更日志一次提交（多行 INSERT），不按 VM 逐条写入
+        log_changes_bulk([
+            {
+                'action': 'update',
+                'object_type': 'vm',
+                'object_identifier': vm_ip,
+                'detail_obj': log_details
+            }
+            for _, vm_ip, _, log_details in updates
+        ])
+        
+        # 同步完成后失效所有统计缓存
+        invalidate_all_stats()
+        current_app.logger.info(f"Applied {len(updates)} VM status changes in {len(ids_by_status)} status groups")
+        return len(updates)
+    
+    def _collect_host_maps_async(self, host_vms):
+        """
+        使用 asyncio 引擎并发采集所有宿主机的 VM 状态
+        
+        :param host_vms: {host_info: [VM, ...]}
+        :return: dict: {host_info: vm_info_map}，不支持的宿主机类型不在结果中
+        """
+        targets = []
+        for host_info, host_vm_list in host_vms.items():
+            host = host_vm_list[0].host
+            if host and host.virtualization_type in HOST_STATE_COMMANDS:
+                targets.append({
+                    'key': host_info,
+                    'ip': host.host_ipaddress,
+                    'port': host.ssh_port or 22,
+                    'type': host.virtualization_type
+                })
+        
+        engine = AsyncSyncEngine(
+            self.ssh_user,
+            get_ssh_key_file(),
+            concurrency=SyncConfig.SYNC_ASYNC_CONCURRENCY,
+            host_timeout=SyncConfig.SYNC_HOST_TIMEOUT,
+            total_timeout=SyncConfig.SYNC_TOTAL_TIMEOUT or None
+        )
+        raw_results = engine.collect(targets)
+        
+        host_maps = {}
+        for target in targets:
+            output, error, _ = raw_results.get(target['key'], (None, 'No result', -1))
+            if error or not output:
+                current_app.logger.warning(f"Failed to collect VM states from host {target['key']}: {error}")
+                host_maps[target['key']] = {}
+            elif target['type'] == 'pve':
+                host_maps[target['key']] = self._parse_pve_list(output)
+            else:
+                host_maps[target['key']] = self._parse_kvm_list(output)
+        return host_maps
     
     def _get_all_vm_ids_and_status_pve(self, host_ip, ssh_port=22):
         """
@@ -487,12 +612,16 @@ class VMStatusSyncService:
         :param ssh_port: SSH 端口（默认 22）
         :return: dict: {vmid: {'status': str, 'name': str}}
         """
-        vm_map = {}
-        
         output, error, _ = self.execute_ssh_command(host_ip, "sudo qm list", port=ssh_port)
         if error or not output:
-            return vm_map
+            return {}
         
+        return self._parse_pve_list(output)
+    
+    @staticmethod
+    def _parse_pve_list(output):
+        """解析 `qm list` 的输出为 {vmid: {'status': str, 'name': str}}"""
+        vm_map = {}
         lines = output.split('\n')
         for line in lines[1:]:
             parts = line.split()
@@ -507,12 +636,69 @@ class VMStatusSyncService:
         
         return vm_map
     
+    def _get_all_vm_ids_and_status_kvm(self, host_ip, ssh_port=22):
+        """
+        批量获取 KVM 宿主机上所有 VM 的状态（一次 SSH 调用）
+        
+        解析 `virsh list --all` 的输出：
+             Id   Name              State
+            -----------------------------------
+             1    vm-10.0.0.1       running
+             -    vm-10.0.0.2       shut off
+        
+        :param host_ip: 宿主机 IP 地址
+        :param ssh_port: SSH 端口（默认 22）
+        :return: dict: {name: {'status': str, 'name': str}}，与 _get_all_vm_ids_and_status_pve 格式一致
+        """
+        output, error, _ = self.execute_ssh_command(host_ip, "sudo virsh list --all", port=ssh_port)
+        if error or not output:
+            return {}
+        
+        return self._parse_kvm_list(output)
+    
+    @classmethod
+    def _parse_kvm_list(cls, output):
+        """解析 `virsh list --all` 的输出为 {name: {'status': str, 'name': str}}"""
+        vm_map = {}
+        for line in output.split('\n'):
+            line = line.strip()
+            if not line or line.startswith('Id') or line.startswith('---'):
+                continue
+            parts = line.split(None, 2)
+            if len(parts) < 3:
+                continue
+            name = parts[1]
+            vm_map[name] = {
+                'status': cls._normalize_kvm_state(parts[2]),
+                'name': name
+            }
+        
+        return vm_map
+    
+    @staticmethod
+    def _normalize_kvm_state(state_output):
+        """将 virsh 输出的 domain 状态转换为 running / shut off / stopped"""
+        state = (state_output or '').lower()
+        if 'running' in state:
+            return 'running'
+        if 'shut off' in state:
+            return 'shut off'
+        return 'stopped'
+    
     def _get_vm_identifier_kvm(self, vm_list_output, vm_ip):
-        """获取 KVM VM 的标识符（name）"""
+        """
+        获取 KVM VM 的标识符（name）
+        
+        :param vm_list_output: `virsh list --all --name` 的输出，或批量模式下的 {name: {...}} 映射
+        :param vm_ip: VM IP
+        """
         if not vm_list_output:
             return None
         
-        lines = vm_list_output.strip().split('\n')
+        if isinstance(vm_list_output, dict):
+            lines = vm_list_output.keys()
+        else:
+            lines = vm_list_output.strip().split('\n')
         for line in lines:
             vm_name = line.strip()
             if vm_name and vm_ip in vm_name:
@@ -837,11 +1023,7 @@ class VMStatusSyncService:
                             'changed': False
                         }
                 
-                status = 'stopped'
-                if 'running' in status_output.lower():
-                    status = 'running'
-                elif 'shut off' in status_output.lower():
-                    status = 'shut off'
+                status = self._normalize_kvm_state(status_output)
             else:
                 # 不支持的宿主机类型，设为 unknown
                 old_status = vm.status
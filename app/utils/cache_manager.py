@@ -15,6 +15,10 @@ CacheService - 对象级缓存服务（对标NetBox设计）
 缓存一致性：延迟双删策略
 - 数据更新流程：先删缓存 → 更新数据库 → 异步延迟500ms再删一次缓存
 
+进程内本地缓存（可选，LOCAL_CACHE_ENABLED）：
+- dict: / host: / vm: 键在每个 worker 内存中保留一份 LRU 副本，命中时不访问 Valkey
+- 写入或删除这些键时通过 Valkey pub/sub 通知其他 worker 删除本地副本（见 local_cache.py）
+
 缓存命中率统计：
 - 全局内存计数器：cache_hit, cache_miss
 - 提供 /api/cache/stat 接口查询统计信息
@@ -26,6 +30,11 @@ import threading
 from typing import Optional, Any, Dict, List
 
 from app.utils.valkey_client import serialize_sqlalchemy_object
+from app.utils.local_cache import get_local_cache, is_local_key
+from app.utils.metrics import record_cache_lookup
+from app.utils.cache_registry import (
+    REGISTERED_NAMESPACES, namespace_of, registry_key, register_keys, delete_namespace, count_pattern
+)
 
 logger = logging.getLogger(__name__)
 
@@ -66,17 +75,21 @@ class CacheStats:
         self._misses = 0
         self._lock = threading.Lock()
     
-    def record_hit(self):
-        """记录缓存命中"""
+    def record_hit(self, key: Optional[str] = None, layer: str = 'valkey'):
+        """记录缓存命中（key 用于按命名空间汇总到 /metrics）"""
+        record_cache_lookup(key, True, layer)
         with self._lock:
             self._hits += 1
-        logger.debug(f"CACHE HIT | Total: hits={self._hits}, misses={self._misses}")
+            hits, misses = self._hits, self._misses
+        logger.debug(f"CACHE HIT | Total: hits={hits}, misses={misses}")
     
-    def record_miss(self):
+    def record_miss(self, key: Optional[str] = None):
         """记录缓存未命中"""
+        record_cache_lookup(key, False)
         with self._lock:
             self._misses += 1
-        logger.debug(f"CACHE MISS | Total: hits={self._hits}, misses={self._misses}")
+            hits, misses = self._hits, self._misses
+        logger.debug(f"CACHE MISS | Total: hits={hits}, misses={misses}")
     
     def get_stats(self) -> Dict[str, Any]:
         """获取统计信息"""
@@ -108,16 +121,48 @@ class CacheService:
     - set(key, value, ttl): 设置单个缓存
     - delete(key): 删除单个缓存
     - batch_get(keys): 批量获取缓存（使用mget）
+    - set_many(items, ttl): 批量写入缓存（单次 pipeline 往返，支持按键TTL和版本保护）
+    - delete_many(keys): 批量删除缓存（单次 pipeline 往返）
+    - compare_and_set(key, expected, value, ttl): 当前值等于期望值时写入（Lua 原子执行）
+    - set_if_newer(key, value, version, ttl): 版本不低于已缓存版本时写入（Lua 原子执行）
     
     缓存键命名规范：
     - 字典元数据：dict:{name}      (如 dict:host_status, dict:vm_type)
     - 主机对象：host:{id}          (如 host:1, host:2)
     - 虚拟机对象：vm:{id}          (如 vm:100, vm:101)
     - 统计数据：stats:{name}       (如 stats:dashboard)
+    
+    单例由同一进程的所有请求线程（gthread）或协程（gevent）共享：连接只在 _client_lock 下建立一次，
+    之后只读取 _redis_client，redis-py 的连接池本身是线程安全的
     """
     _instance = None
     _lock = threading.Lock()
     
+    # 比较并设置：当前值（序列化后的字符串）等于 ARGV[1] 时写入；ARGV[1] 为空串表示要求键不存在
+    _CAS_SCRIPT = """
+local current = redis.call('get', KEYS[1])
+if ARGV[1] == '' then
+    if current then
+        return 0
+    end
+elseif current ~= ARGV[1] then
+    return 0
+end
+redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+    
+    # 版本保护写入：KEYS[2] 中记录的版本高于 ARGV[2] 时放弃写入，避免慢请求用旧数据覆盖新数据
+    _VERSIONED_SET_SCRIPT = """
+local current = redis.call('get', KEYS[2])
+if current and tonumber(current) > tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[3])
+redis.call('set', KEYS[2], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+    
     def __new__(cls):
         if cls._instance is None:
             with cls._lock:
@@ -177,6 +222,15 @@ class CacheService:
         self._connect()
         return self._available
     
+    def get_client(self):
+        """
+        获取底层 Valkey 客户端，不可用时返回 None
+        
+        供需要 pipeline、Lua 脚本、锁等原生命令的服务使用（同步任务、调度器 leader 锁、计数器等），
+        与缓存读写共用同一个连接池
+        """
+        return self._redis_client if self.is_available() else None
+    
     def get(self, key: str) -> Optional[Any]:
         """
         获取单个缓存值
@@ -190,17 +244,31 @@ class CacheService:
         if not self.is_available():
             return None
         
+        # 本地缓存（LOCAL_CACHE_ENABLED）命中时不访问 Valkey
+        local = get_local_cache()
+        use_local = is_local_key(key) and local.usable(self._redis_client)
+        if use_local:
+            hit, cached = local.get(key)
+            if hit:
+                self._stats.record_hit(key, layer='local')
+                logger.debug(f"CACHE LOCAL HIT key={key}")
+                return cached
+            generation = local.generation()
+        
         try:
             value = self._redis_client.get(key)
             if value is not None:
-                self._stats.record_hit()
+                self._stats.record_hit(key)
                 logger.debug(f"CACHE HIT key={key}")
                 try:
-                    return json.loads(value)
+                    value = json.loads(value)
                 except json.JSONDecodeError:
                     return value
+                if use_local:
+                    local.set(key, value, generation)
+                return value
             else:
-                self._stats.record_miss()
+                self._stats.record_miss(key)
                 logger.debug(f"CACHE MISS key={key}")
                 return None
         except Exception as e:
@@ -224,7 +292,15 @@ class CacheService:
         
         try:
             serialized_value = json.dumps(value, default=str)
-            self._redis_client.setex(key, ttl, serialized_value)
+            if namespace_of(key) is None:
+                self._redis_client.setex(key, ttl, serialized_value)
+            else:
+                # 登记命名空间下的键与登记命令一起发送，按前缀失效时无需 KEYS
+                pipe = self._redis_client.pipeline(transaction=False)
+                pipe.setex(key, ttl, serialized_value)
+                register_keys(pipe, [key], ttl)
+                pipe.execute()
+            get_local_cache().invalidate(self._redis_client, [key])
             logger.debug(f"CACHE SET key={key} ttl={ttl}s")
             return True
         except Exception as e:
@@ -246,6 +322,7 @@ class CacheService:
         
         try:
             result = self._redis_client.delete(key)
+            get_local_cache().invalidate(self._redis_client, [key])
             logger.debug(f"CACHE DELETE key={key} deleted={result > 0}")
             return result > 0
         except Exception as e:
@@ -265,20 +342,41 @@ class CacheService:
         if not self.is_available() or not keys:
             return {}
         
+        # 先取本地缓存，只对未命中的键执行 MGET
+        result = {}
+        local = get_local_cache()
+        use_local = local.usable(self._redis_client)
+        remaining = keys
+        if use_local:
+            remaining = []
+            for key in keys:
+                hit, cached = local.get(key) if is_local_key(key) else (False, None)
+                if hit:
+                    self._stats.record_hit(key, layer='local')
+                    result[key] = cached
+                else:
+                    remaining.append(key)
+            if not remaining:
+                logger.debug(f"CACHE BATCH GET LOCAL HIT keys={len(keys)}")
+                return result
+            generation = local.generation()
+        
         try:
-            values = self._redis_client.mget(keys)
-            result = {}
+            values = self._redis_client.mget(remaining)
             
-            for key, value in zip(keys, values):
+            for key, value in zip(remaining, values):
                 if value is not None:
-                    self._stats.record_hit()
+                    self._stats.record_hit(key)
                     logger.debug(f"CACHE BATCH GET HIT key={key}")
                     try:
                         result[key] = json.loads(value)
                     except json.JSONDecodeError:
                         result[key] = value
+                        continue
+                    if use_local and is_local_key(key):
+                        local.set(key, result[key], generation)
                 else:
-                    self._stats.record_miss()
+                    self._stats.record_miss(key)
                     logger.debug(f"CACHE BATCH GET MISS key={key}")
             
             return result
@@ -286,6 +384,104 @@ class CacheService:
             logger.warning(f"Cache batch_get failed: {e}")
             return {}
     
+    @staticmethod
+    def version_key(key: str) -> str:
+        """版本保护写入时记录版本号的键"""
+        return f"ver:{key}"
+    
+    def set_many(self, items: Dict[str, Any], ttl: int = CacheTTL.OBJECT,
+                 ttls: Optional[Dict[str, int]] = None,
+                 versions: Optional[Dict[str, int]] = None) -> int:
+        """
+        批量写入缓存（单次 pipeline 往返）
+        
+        Args:
+            items: {缓存键: 缓存值}，值会被JSON序列化
+            ttl: 默认过期时间（秒）
+            ttls: 按键指定的过期时间，未指定的键使用 ttl
+            versions: 按键指定的版本号（整数），指定版本的键使用 set_if_newer 的语义写入
+        
+        Returns:
+            实际写入的键数量（版本保护拒绝的键不计入）
+        """
+        if not self.is_available() or not items:
+            return 0
+        
+        ttls = ttls or {}
+        versions = versions or {}
+        try:
+            pipe = self._redis_client.pipeline(transaction=False)
+            for key, value in items.items():
+                serialized_value = json.dumps(value, default=str)
+                key_ttl = ttls.get(key, ttl)
+                if key in versions:
+                    # 脚本随 pipeline 一起发送（EVAL），不需要额外的 SCRIPT EXISTS / LOAD 往返
+                    pipe.eval(
+                        self._VERSIONED_SET_SCRIPT, 2, key, self.version_key(key),
+                        serialized_value, int(versions[key]), key_ttl
+                    )
+                else:
+                    pipe.setex(key, key_ttl, serialized_value)
+            # 写入命令的结果在前，登记命令的结果在后
+            for key in items:
+                register_keys(pipe, [key], ttls.get(key, ttl))
+            results = pipe.execute()[:len(items)]
+            get_local_cache().invalidate(self._redis_client, list(items))
+            written = sum(1 for result in results if result)
+            logger.debug(f"CACHE SET MANY keys={len(items)} written={written}")
+            return written
+        except Exception as e:
+            logger.warning(f"Cache set_many failed keys={len(items)}: {e}")
+            return 0
+    
+    def compare_and_set(self, key: str, expected: Any, value: Any, ttl: int = CacheTTL.OBJECT) -> bool:
+        """
+        比较并设置（Lua 原子执行）
+        
+        Args:
+            key: 缓存键
+            expected: 期望的当前值（按序列化后的字符串比较）；为 None 时要求键不存在
+            value: 新值
+            ttl: 过期时间（秒）
+        
+        Returns:
+            是否写入
+        """
+        if not self.is_available():
+            return False
+        
+        try:
+            expected_value = '' if expected is None else json.dumps(expected, default=str)
+            result = self._redis_client.eval(
+                self._CAS_SCRIPT, 1, key, expected_value, json.dumps(value, default=str), ttl
+            )
+            if result and namespace_of(key) is not None:
+                pipe = self._redis_client.pipeline(transaction=False)
+                register_keys(pipe, [key], ttl)
+                pipe.execute()
+            if result:
+                get_local_cache().invalidate(self._redis_client, [key])
+            logger.debug(f"CACHE CAS key={key} written={bool(result)}")
+            return bool(result)
+        except Exception as e:
+            logger.warning(f"Cache compare_and_set failed key={key}: {e}")
+            return False
+    
+    def set_if_newer(self, key: str, value: Any, version: int, ttl: int = CacheTTL.OBJECT) -> bool:
+        """
+        版本保护写入（Lua 原子执行）：已缓存版本高于 version 时不写入
+        
+        Args:
+            key: 缓存键
+            value: 缓存值
+            version: 数据版本号（如 updated_at 时间戳）
+            ttl: 过期时间（秒），版本号与缓存值同时过期
+        
+        Returns:
+            是否写入
+        """
+        return self.set_many({key: value}, ttl=ttl, versions={key: version}) == 1
+    
     def delayed_double_delete(self, key: str, delay: float = 0.5) -> None:
         """
         延迟双删 - 保证缓存一致性
@@ -314,25 +510,113 @@ class CacheService:
         timer.start()
         logger.debug(f"Scheduled delayed delete key={key} delay={delay}s")
     
+    def delete_many(self, keys: List[str]) -> int:
+        """
+        批量删除缓存键（单次 pipeline 往返）
+        
+        Args:
+            keys: 缓存键列表
+        
+        Returns:
+            实际删除的键数量
+        """
+        if not self.is_available() or not keys:
+            return 0
+        
+        try:
+            pipe = self._redis_client.pipeline(transaction=False)
+            for i in range(0, len(keys), 500):
+                pipe.delete(*keys[i:i + 500])
+            deleted = sum(pipe.execute())
+            get_local_cache().invalidate(self._redis_client, keys)
+            logger.debug(f"CACHE DELETE MANY keys={len(keys)} deleted={deleted}")
+            return deleted
+        except Exception as e:
+            logger.warning(f"Cache delete_many failed keys={len(keys)}: {e}")
+            return 0
+    
+    def delayed_double_delete_many(self, keys: List[str], delay: float = 0.5) -> None:
+        """
+        批量延迟双删 - 一次 pipeline 删除 + 一个 Timer 完成第二次删除
+        
+        Args:
+            keys: 需要删除的缓存键列表
+            delay: 延迟时间（秒），默认0.5秒
+        """
+        if not keys:
+            return
+        
+        keys = list(keys)
+        
+        # 第一次删除：立即删除
+        self.delete_many(keys)
+        
+        # 第二次删除：所有键共享一个延迟任务
+        def delayed_delete():
+            try:
+                self.delete_many(keys)
+                logger.debug(f"DELAYED DELETE MANY keys={len(keys)}")
+            except Exception as e:
+                logger.warning(f"Delayed delete_many failed keys={len(keys)}: {e}")
+        
+        timer = threading.Timer(delay, delayed_delete)
+        timer.daemon = True
+        timer.start()
+        logger.debug(f"Scheduled delayed delete keys={len(keys)} delay={delay}s")
+    
     def get_stats(self) -> Dict[str, Any]:
-        """获取缓存统计信息"""
-        return self._stats.get_stats()
+        """获取缓存统计信息（命中数包含本地缓存命中，本地缓存的详细统计在 local_cache 中）"""
+        stats = self._stats.get_stats()
+        stats['local_cache'] = get_local_cache().get_stats()
+        return stats
     
     def reset_stats(self):
         """重置缓存统计信息"""
         self._stats.reset()
     
     def get_key_count(self, pattern: str = "*") -> int:
-        """获取匹配模式的缓存键数量（用于统计）"""
+        """
+        获取匹配模式的缓存键数量（用于统计）
+        '*' 使用 DBSIZE，登记命名空间使用登记集合的 SCARD，均为 O(1)；其他模式增量 SCAN 计数
+        """
         if not self.is_available():
             return 0
         
         try:
-            keys = self._redis_client.keys(pattern)
-            return len(keys)
+            return count_pattern(self._redis_client, pattern)
         except Exception as e:
             logger.warning(f"Failed to get key count: {e}")
             return 0
+    
+    def get_keyspace_info(self) -> Dict[str, int]:
+        """当前库的键数量和设置了过期时间的键数量（INFO keyspace）"""
+        if not self.is_available():
+            return {}
+        
+        try:
+            from app.config import RedisConfig
+            info = self._redis_client.info('keyspace').get(f"db{RedisConfig.REDIS_DB}") or {}
+            return {'keys': int(info.get('keys', 0)), 'expires': int(info.get('expires', 0))}
+        except Exception as e:
+            logger.warning(f"Failed to get keyspace info: {e}")
+            return {}
+    
+    def get_namespace_counts(self) -> Dict[str, int]:
+        """各登记命名空间中的键数量（单次 pipeline 往返）"""
+        if not self.is_available():
+            return {}
+        
+        try:
+            pipe = self._redis_client.pipeline(transaction=False)
+            for namespace in REGISTERED_NAMESPACES:
+                pipe.scard(registry_key(namespace))
+            return {
+                namespace.rstrip(':'): int(count)
+                for namespace, count in zip(REGISTERED_NAMESPACES, pipe.execute())
+            }
+        except Exception as e:
+            logger.warning(f"Failed to get namespace key counts: {e}")
+            return {}
 
 
 # ==================== 快捷方法（按类型封装） ====================
@@ -371,6 +655,12 @@ def set_host(host_id: int, data: Dict, ttl: int = CacheTTL.OBJECT) -> bool:
     return CacheService().set(key, serialized_data, ttl)
 
 
+def set_hosts(data_by_id: Dict[int, Dict], ttl: int = CacheTTL.OBJECT,
+              versions: Optional[Dict[int, int]] = None) -> int:
+    """批量设置主机对象缓存（单次 pipeline 往返），versions 为 {主机ID: 版本号}"""
+    return _set_objects('host', data_by_id, ttl, versions)
+
+
 def delete_host(host_id: int) -> bool:
     """删除主机对象缓存"""
     key = f"host:{host_id}"
@@ -383,6 +673,13 @@ def delayed_delete_host(host_id: int):
     CacheService().delayed_double_delete(key)
 
 
+def delayed_delete_hosts(host_ids: List[int]):
+    """批量延迟双删主机缓存"""
+    from app.config import RedisConfig
+    keys = [f"host:{host_id}" for host_id in host_ids]
+    CacheService().delayed_double_delete_many(keys, RedisConfig.DELAYED_DELETE_SECONDS)
+
+
 def get_vm(vm_id: int) -> Optional[Dict]:
     """获取虚拟机对象缓存（L2层）"""
     key = f"vm:{vm_id}"
@@ -397,6 +694,20 @@ def set_vm(vm_id: int, data: Dict, ttl: int = CacheTTL.OBJECT) -> bool:
     return CacheService().set(key, serialized_data, ttl)
 
 
+def set_vms(data_by_id: Dict[int, Dict], ttl: int = CacheTTL.OBJECT,
+            versions: Optional[Dict[int, int]] = None) -> int:
+    """批量设置虚拟机对象缓存（单次 pipeline 往返），versions 为 {虚拟机ID: 版本号}"""
+    return _set_objects('vm', data_by_id, ttl, versions)
+
+
+def _set_objects(prefix: str, data_by_id: Dict[int, Dict], ttl: int, versions: Optional[Dict[int, int]]) -> int:
+    items = {f"{prefix}:{obj_id}": serialize_sqlalchemy_object(data) for obj_id, data in data_by_id.items()}
+    key_versions = None
+    if versions:
+        key_versions = {f"{prefix}:{obj_id}": version for obj_id, version in versions.items() if version is not None}
+    return CacheService().set_many(items, ttl=ttl, versions=key_versions)
+
+
 def delete_vm(vm_id: int) -> bool:
     """删除虚拟机对象缓存"""
     key = f"vm:{vm_id}"
@@ -409,6 +720,20 @@ def delayed_delete_vm(vm_id: int):
     CacheService().delayed_double_delete(key)
 
 
+def delayed_delete_vms(vm_ids: List[int]):
+    """批量延迟双删虚拟机缓存"""
+    from app.config import RedisConfig
+    keys = [f"vm:{vm_id}" for vm_id in vm_ids]
+    CacheService().delayed_double_delete_many(keys, RedisConfig.DELAYED_DELETE_SECONDS)
+
+
+def delayed_delete_resources(vm_ids: List[int] = (), host_ids: List[int] = ()):
+    """一次 pipeline 延迟双删一批虚拟机和主机缓存"""
+    from app.config import RedisConfig
+    keys = [f"vm:{vm_id}" for vm_id in vm_ids] + [f"host:{host_id}" for host_id in host_ids]
+    CacheService().delayed_double_delete_many(keys, RedisConfig.DELAYED_DELETE_SECONDS)
+
+
 def batch_get_hosts(host_ids: List[int]) -> Dict[int, Dict]:
     """批量获取主机对象缓存"""
     keys = [f"host:{host_id}" for host_id in host_ids]
@@ -442,20 +767,13 @@ def delete_stats(name: str) -> bool:
 
 
 def invalidate_all_stats():
-    """失效所有统计缓存（使用scan避免阻塞）"""
+    """失效所有统计缓存（按 stats 登记集合删除，只涉及统计键本身）"""
     cache = CacheService()
     if not cache.is_available():
         return
     
     try:
-        cursor = 0
-        deleted = 0
-        while True:
-            cursor, keys = cache._redis_client.scan(cursor, match="stats:*", count=100)
-            if keys:
-                deleted += cache._redis_client.delete(*keys)
-            if cursor == 0:
-                break
+        deleted = delete_namespace(cache._redis_client, 'stats:')
         logger.info(f"Invalidated {deleted} stats cache keys")
     except Exception as e:
         logger.warning(f"Failed to invalidate stats cache: {e}")
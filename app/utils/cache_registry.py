@@ -0,0 +1,127 @@
+# app/utils/cache_registry.py
+
+"""
+缓存键登记表（按命名空间）
+
+KEYS pattern 会遍历整个键空间并阻塞 Valkey，按前缀失效和统计改为：
+1. 写入登记命名空间下的键时，同一个 pipeline 中 SADD 到登记集合 registry:{命名空间}
+2. 按命名空间失效时由 Lua 脚本原子地删除集合中的键和集合本身，只涉及相关的键
+3. 按命名空间计数用 SCARD（集合中可能包含已过期的键，为近似值），全库计数用 DBSIZE
+4. 未登记的模式退化为增量 SCAN，不会长时间阻塞
+
+登记集合的过期时间不短于其中最长的成员 TTL（EXPIRE NX + EXPIRE GT），
+成员全部过期后集合随之过期，不会无限增长
+"""
+
+import logging
+from typing import Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# 登记的命名空间（键前缀），最长匹配优先
+REGISTERED_NAMESPACES = ('stats:', 'vm:list:', 'host:list:', 'host:vm:list:')
+
+# 单条 DEL / SCAN 处理的键数量
+BATCH_SIZE = 500
+
+# 删除登记集合中的所有键和集合本身，返回删除的键数量
+_DELETE_NAMESPACE_SCRIPT = """
+local keys = redis.call('smembers', KEYS[1])
+for i = 1, #keys, 500 do
+    redis.call('del', unpack(keys, i, math.min(i + 499, #keys)))
+end
+redis.call('del', KEYS[1])
+return #keys
+"""
+
+
+def namespace_of(key: str) -> Optional[str]:
+    """键所属的登记命名空间，不属于任何登记命名空间时返回 None"""
+    matched = None
+    for namespace in REGISTERED_NAMESPACES:
+        if key.startswith(namespace) and (matched is None or len(namespace) > len(matched)):
+            matched = namespace
+    return matched
+
+
+def registry_key(namespace: str) -> str:
+    return f"registry:{namespace.rstrip(':')}"
+
+
+def namespace_of_pattern(pattern: str) -> Optional[str]:
+    """形如 '命名空间*' 的模式对应的登记命名空间"""
+    if pattern.endswith('*') and pattern[:-1] in REGISTERED_NAMESPACES:
+        return pattern[:-1]
+    return None
+
+
+def register_keys(pipe, keys: Iterable[str], ttl: int):
+    """
+    在 pipeline 中把键登记到所属命名空间（不属于登记命名空间的键忽略）
+
+    Args:
+        pipe: Valkey pipeline（与写入缓存值的命令一起发送）
+        keys: 刚写入的键
+        ttl: 这些键的过期时间（秒）
+    """
+    grouped = {}
+    for key in keys:
+        namespace = namespace_of(key)
+        if namespace is not None:
+            grouped.setdefault(namespace, []).append(key)
+    for namespace, members in grouped.items():
+        registry = registry_key(namespace)
+        pipe.sadd(registry, *members)
+        # 集合没有过期时间时设置；已有过期时间但更短时延长
+        pipe.expire(registry, ttl, nx=True)
+        pipe.expire(registry, ttl, gt=True)
+
+
+def delete_namespace(client, namespace: str) -> int:
+    """删除命名空间中登记的所有键，返回删除的键数量"""
+    return int(client.eval(_DELETE_NAMESPACE_SCRIPT, 1, registry_key(namespace)) or 0)
+
+
+def count_namespace(client, namespace: str) -> int:
+    """命名空间中登记的键数量（近似值，可能包含已过期的键）"""
+    return int(client.scard(registry_key(namespace)))
+
+
+def scan_keys(client, pattern: str) -> Iterator[str]:
+    """增量 SCAN 匹配的键（每次最多返回 BATCH_SIZE 个，不阻塞 Valkey）"""
+    return client.scan_iter(match=pattern, count=BATCH_SIZE)
+
+
+def delete_pattern(client, pattern: str) -> int:
+    """
+    删除匹配模式的键：登记命名空间走登记集合，其他模式增量 SCAN 后分批删除
+
+    Returns:
+        删除的键数量
+    """
+    namespace = namespace_of_pattern(pattern)
+    if namespace is not None:
+        return delete_namespace(client, namespace)
+
+    deleted = 0
+    batch = []
+    for key in scan_keys(client, pattern):
+        batch.append(key)
+        if len(batch) >= BATCH_SIZE:
+            deleted += client.delete(*batch)
+            batch = []
+    if batch:
+        deleted += client.delete(*batch)
+    return deleted
+
+
+def count_pattern(client, pattern: str) -> int:
+    """
+    统计匹配模式的键数量：'*' 用 DBSIZE，登记命名空间用 SCARD，其他模式增量 SCAN 计数
+    """
+    if pattern == '*':
+        return int(client.dbsize())
+    namespace = namespace_of_pattern(pattern)
+    if namespace is not None:
+        return count_namespace(client, namespace)
+    return sum(1 for _ in scan_keys(client, pattern))
@@ -0,0 +1,236 @@
+# app/utils/cursor_pagination.py
+
+"""
+游标（keyset）分页
+
+query.paginate 每页执行 COUNT(*) 加 OFFSET，页数越深越慢。游标分页按 (排序键, id) 定位：
+- 下一页：WHERE (key, id) 在上一页最后一行之后 ORDER BY key, id LIMIT n+1
+- 上一页：反向排序取本页第一行之前的 n+1 行，再翻转
+- 多取的一行只用于判断是否还有下一页 / 上一页
+
+排序键可以是普通列、IP 生成列（vm_ip_num 等）或自定义字段宽表列。普通列按 MySQL 规则处理 NULL：
+升序时 NULL 在最前，降序时在最后；自定义字段（nulls_max=True）的 NULL 按最大值处理：
+升序时在最后，降序时在最前，与 EAV 方式排序一致。两种规则都与反向排序互为镜像，上一页无需特殊处理
+
+游标为 base64 编码的 JSON，记录排序字段和方向，排序条件变化后旧游标失效（回到第一页）
+
+总数不再每页计算：
+- 无过滤条件时用 information_schema.TABLES.TABLE_ROWS 估算，小表（低于 LIST_EXACT_COUNT_THRESHOLD）才精确计数
+- 有过滤条件时精确计数
+- 结果缓存在 stats:list_total:*（TTL=CacheTTL.STATS，invalidate_all_stats 时一并失效）
+"""
+
+import base64
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, case, or_, text
+
+from app.config import ListConfig
+
+logger = logging.getLogger(__name__)
+
+# 不属于过滤条件的请求参数
+NON_FILTER_ARGS = ('page', 'per_page', 'sort', 'order', 'visible_columns', 'cursor', 'pagination')
+
+_KEY_LABEL = '_cursor_key'
+
+
+# ==================== 游标编码 ====================
+def _dump_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if hasattr(value, 'to_integral_value'):
+        # Decimal
+        return int(value) if value == int(value) else float(value)
+    return value
+
+
+def _load_value(value):
+    if isinstance(value, dict) and 'dt' in value:
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+def encode_cursor(key_value, item_id, direction: str, sort: str, order: str) -> str:
+    """生成游标：direction 为 next（该行之后）或 prev（该行之前）"""
+    payload = {'k': _dump_value(key_value), 'i': item_id, 'd': direction, 's': sort, 'o': order}
+    raw = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: str, order: str) -> Optional[Dict[str, Any]]:
+    """解析游标，格式错误或排序条件不一致时返回 None"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if payload.get('s') != sort or payload.get('o') != order or payload.get('d') not in ('next', 'prev'):
+            return None
+        return {
+            'key': _load_value(payload.get('k')),
+            'id': int(payload['i']),
+            'direction': payload['d']
+        }
+    except (ValueError, TypeError, KeyError) as e:
+        logger.debug(f"Invalid cursor {cursor!r}: {e}")
+        return None
+
+
+# ==================== 分页 ====================
+def _seek_condition(key_expr, id_column, key_value, item_id, descending: bool, nulls_max: bool = False):
+    """(key, id) 在 (key_value, item_id) 之后的条件，key_expr 为 None 时只按 id 定位"""
+    if key_expr is None:
+        return id_column < item_id if descending else id_column > item_id
+
+    if nulls_max:
+        # NULL 按最大值：升序时 NULL 组在最后，降序时在最前
+        if descending:
+            if key_value is None:
+                return or_(and_(key_expr.is_(None), id_column < item_id), key_expr.isnot(None))
+            return or_(key_expr < key_value, and_(key_expr == key_value, id_column < item_id))
+        if key_value is None:
+            return and_(key_expr.is_(None), id_column > item_id)
+        return or_(key_expr > key_value, and_(key_expr == key_value, id_column > item_id), key_expr.is_(None))
+
+    if descending:
+        if key_value is None:
+            return and_(key_expr.is_(None), id_column < item_id)
+        return or_(key_expr < key_value, and_(key_expr == key_value, id_column < item_id), key_expr.is_(None))
+
+    if key_value is None:
+        return or_(and_(key_expr.is_(None), id_column > item_id), key_expr.isnot(None))
+    return or_(key_expr > key_value, and_(key_expr == key_value, id_column > item_id))
+
+
+def paginate_by_cursor(query, id_column, key_expr, sort: str, order: str,
+                       per_page: int, cursor: Optional[str], nulls_max: bool = False) -> Dict[str, Any]:
+    """
+    按游标取一页
+
+    Args:
+        query: 已应用搜索/过滤条件的查询（原有排序会被替换）
+        id_column: 主键列，作为排序键相同时的第二排序键
+        key_expr: 排序键表达式，按 id 排序时传 None
+        sort / order: 当前排序字段和方向（写入游标）
+        per_page: 每页条数
+        cursor: 请求中的游标
+        nulls_max: 排序键的 NULL 按最大值排序（默认按 MySQL 规则视为最小值）
+
+    Returns:
+        {'items', 'has_prev', 'has_next', 'prev_cursor', 'next_cursor'}
+    """
+    position = decode_cursor(cursor, sort, order)
+    descending = order.lower() != 'asc'
+    backwards = position is not None and position['direction'] == 'prev'
+    # 向前翻页时反向排序
+    scan_descending = descending != backwards
+
+    query = query.order_by(None)
+    if key_expr is not None:
+        query = query.add_columns(key_expr.label(_KEY_LABEL))
+    if position is not None:
+        query = query.filter(_seek_condition(
+            key_expr, id_column, position['key'], position['id'], scan_descending, nulls_max
+        ))
+
+    order_by = [id_column.desc() if scan_descending else id_column.asc()]
+    if key_expr is not None:
+        order_by.insert(0, key_expr.desc() if scan_descending else key_expr.asc())
+        if nulls_max:
+            nulls_rank = case((key_expr.is_(None), 1), else_=0)
+            order_by.insert(0, nulls_rank.desc() if scan_descending else nulls_rank)
+    rows = query.order_by(*order_by).limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    rows_with_keys: List[Tuple[Any, Any]] = []
+    for row in rows:
+        if key_expr is None:
+            rows_with_keys.append((row, None))
+        else:
+            rows_with_keys.append((row[0], row[1]))
+
+    items = [item for item, _ in rows_with_keys]
+    if backwards:
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = position is not None, has_more
+
+    prev_cursor = next_cursor = None
+    if items:
+        first_item, first_key = rows_with_keys[0]
+        last_item, last_key = rows_with_keys[-1]
+        if has_prev:
+            prev_cursor = encode_cursor(first_key, first_item.id, 'prev', sort, order)
+        if has_next:
+            next_cursor = encode_cursor(last_key, last_item.id, 'next', sort, order)
+
+    return {
+        'items': items,
+        'has_prev': has_prev and prev_cursor is not None,
+        'has_next': has_next and next_cursor is not None,
+        'prev_cursor': prev_cursor,
+        'next_cursor': next_cursor
+    }
+
+
+# ==================== 总数 ====================
+def filter_signature(args) -> List[Tuple[str, str]]:
+    """请求中的过滤条件（搜索、字段过滤），用于判断是否有过滤以及生成总数缓存键"""
+    return sorted((k, v) for k, v in args.items() if k not in NON_FILTER_ARGS and v)
+
+
+def _estimate_table_rows(table_name: str) -> Optional[int]:
+    from app.models import db
+    try:
+        return db.session.execute(
+            text(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table_name"
+            ),
+            {'table_name': table_name}
+        ).scalar()
+    except Exception as e:
+        logger.warning(f"Failed to estimate row count of {table_name}: {e}")
+        return None
+
+
+def get_list_total(query, model, model_name: str, args) -> Tuple[int, bool]:
+    """
+    列表总数（带缓存）
+
+    Returns:
+        (total, approximate)
+    """
+    from app.models import db
+    from app.utils.cache_manager import get_stats_data, set_stats_data, CacheTTL
+    from app.utils.db_router import used_replica
+
+    signature = filter_signature(args)
+    digest = hashlib.md5(json.dumps(signature, ensure_ascii=False).encode('utf-8')).hexdigest()
+    cache_name = f"list_total:{model_name}:{digest}"
+
+    cached = get_stats_data(cache_name)
+    if isinstance(cached, dict) and 'total' in cached:
+        return int(cached['total']), bool(cached.get('approximate'))
+
+    total, approximate = None, False
+    if not signature:
+        estimate = _estimate_table_rows(model.__tablename__)
+        if estimate is not None and estimate >= ListConfig.LIST_EXACT_COUNT_THRESHOLD:
+            total, approximate = int(estimate), True
+    if total is None:
+        total = query.order_by(None).count()
+
+    # 从库的总数可能落后于主库，不写入缓存，避免在缓存有效期内一直显示旧总数
+    if not used_replica(db.session):
+        set_stats_data(cache_name, {'total': total, 'approximate': approximate}, ttl=CacheTTL.STATS)
+    return total, approximate
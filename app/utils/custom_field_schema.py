@@ -0,0 +1,267 @@
+# app/utils/custom_field_schema.py
+
+"""
+CustomFieldSchemaCache - 进程内自定义字段定义缓存
+
+custom_fields / custom_field_enum_options 变化很少，但每个列表、筛选、编辑请求都会多次读取。
+本模块在每个进程内缓存一份字段定义快照：
+- 按字段ID、(资源类型, 字段名)、资源类型（按 sort 排序）建立索引
+- 枚举选项按 option_key / option_label 建立索引
+- 快照为普通 dict，不持有 ORM 对象，可跨请求、跨线程安全读取
+
+失效机制：
+- Valkey 中保存版本令牌 custom_field:schema:version，custom_fields.py 的增删改接口提交后写入新的随机令牌
+- 每个请求最多检查一次版本令牌（结果记在 flask.g 上），与本进程加载时的令牌不同就整体重新加载快照
+- 令牌不是递增计数：Valkey 重启、清空或淘汰该键后不会回到旧值，键丢失时写入新令牌，所有进程都会重新加载
+- Valkey 不可用时按 CUSTOM_FIELD_SCHEMA_FALLBACK_TTL 定期重新加载
+"""
+
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from app.config import RedisConfig
+from app.utils.cache_manager import CacheService
+
+logger = logging.getLogger(__name__)
+
+# 不使用 dict: 前缀：该前缀的键会进入进程内本地缓存（见 local_cache.LOCAL_PREFIXES）
+SCHEMA_VERSION_KEY = 'custom_field:schema:version'
+
+
+def _new_version() -> str:
+    return uuid.uuid4().hex
+
+
+def _read_remote_version() -> Optional[str]:
+    """读取 Valkey 中的版本令牌，Valkey 不可用时返回 None"""
+    client = CacheService().get_client()
+    if client is None:
+        return None
+    try:
+        version = client.get(SCHEMA_VERSION_KEY)
+        if version is None:
+            # 键丢失（Valkey 重启、清空或淘汰）：写入新令牌，与所有进程已加载的令牌都不同，触发重新加载
+            token = _new_version()
+            if client.set(SCHEMA_VERSION_KEY, token, nx=True):
+                return token
+            version = client.get(SCHEMA_VERSION_KEY) or token
+        return version
+    except Exception as e:
+        logger.warning(f"Failed to read custom field schema version: {e}")
+        return None
+
+
+class CustomFieldSchemaCache:
+    """
+    自定义字段定义缓存（单例）
+
+    所有 get_* 方法返回的 dict 为缓存快照本身，调用方不要修改
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(CustomFieldSchemaCache, cls).__new__(cls)
+                    cls._instance._init()
+        return cls._instance
+
+    def _init(self):
+        self._reload_lock = threading.Lock()
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._version: Optional[str] = None
+        self._loaded_at = 0.0
+        self._dirty = False
+        self._reloads = 0
+
+    # ---------- 加载 ----------
+
+    @staticmethod
+    def _build_snapshot() -> Dict[str, Any]:
+        """从数据库读取全部字段定义和枚举选项（两次查询）"""
+        from app.models import CustomField, CustomFieldEnumOption
+
+        fields = CustomField.query.order_by(CustomField.sort, CustomField.id).all()
+        options = CustomFieldEnumOption.query.order_by(
+            CustomFieldEnumOption.field_id, CustomFieldEnumOption.sort, CustomFieldEnumOption.id
+        ).all()
+
+        options_by_field: Dict[int, List[Dict]] = {}
+        for opt in options:
+            options_by_field.setdefault(opt.field_id, []).append({
+                'id': opt.id,
+                'option_key': opt.option_key,
+                'option_label': opt.option_label,
+                'sort': opt.sort
+            })
+
+        by_id: Dict[int, Dict] = {}
+        by_name: Dict[tuple, Dict] = {}
+        by_resource: Dict[str, List[Dict]] = {}
+        label_by_key: Dict[tuple, str] = {}
+        key_by_label: Dict[tuple, str] = {}
+
+        for field in fields:
+            field_dict = {
+                'id': field.id,
+                'resource_type': field.resource_type,
+                'field_name': field.field_name,
+                'field_type': field.field_type,
+                'field_length': field.field_length,
+                'is_required': field.is_required,
+                'default_value': field.default_value,
+                'sort': field.sort,
+                'create_time': field.create_time.isoformat() if field.create_time else None,
+                'update_time': field.update_time.isoformat() if field.update_time else None
+            }
+            if field.field_type == 'enum':
+                field_dict['enum_options'] = options_by_field.get(field.id, [])
+                for opt in field_dict['enum_options']:
+                    label_by_key[(field.id, opt['option_key'])] = opt['option_label']
+                    key_by_label.setdefault((field.id, opt['option_label']), opt['option_key'])
+
+            by_id[field.id] = field_dict
+            by_name.setdefault((field.resource_type, field.field_name), field_dict)
+            by_resource.setdefault(field.resource_type, []).append(field_dict)
+
+        return {
+            'by_id': by_id,
+            'by_name': by_name,
+            'by_resource': by_resource,
+            'label_by_key': label_by_key,
+            'key_by_label': key_by_label
+        }
+
+    def _reload(self, version):
+        snapshot = self._build_snapshot()
+        self._snapshot = snapshot
+        self._version = version
+        self._loaded_at = time.monotonic()
+        self._dirty = False
+        self._reloads += 1
+        logger.debug(f"Custom field schema loaded: version={version}, fields={len(snapshot['by_id'])}")
+
+    def _is_stale(self, version) -> bool:
+        if self._snapshot is None or self._dirty:
+            return True
+        if version is None:
+            # Valkey 不可用：退化为按时间过期
+            return time.monotonic() - self._loaded_at >= RedisConfig.CUSTOM_FIELD_SCHEMA_FALLBACK_TTL
+        return version != self._version
+
+    def _ensure_fresh(self) -> Dict[str, Any]:
+        """每个请求最多检查一次版本令牌，版本变化时重新加载"""
+        try:
+            from flask import g, has_app_context
+            in_context = has_app_context()
+        except ImportError:
+            in_context = False
+
+        snapshot = self._snapshot
+        if in_context and snapshot is not None and getattr(g, '_custom_field_schema_checked', False):
+            return snapshot
+
+        # 先读版本令牌再加载：加载期间发生的变更会在下一次检查时被发现
+        version = _read_remote_version()
+        if self._is_stale(version):
+            with self._reload_lock:
+                if self._is_stale(version):
+                    self._reload(version)
+                snapshot = self._snapshot
+        else:
+            snapshot = self._snapshot
+
+        if in_context:
+            g._custom_field_schema_checked = True
+        return snapshot
+
+    def invalidate(self):
+        """标记本进程快照过期，下次访问时重新加载"""
+        self._dirty = True
+        try:
+            from flask import g, has_app_context
+            if has_app_context():
+                g.pop('_custom_field_schema_checked', None)
+        except ImportError:
+            pass
+
+    # ---------- 查询 ----------
+
+    def get_fields(self, resource_type: str) -> List[Dict]:
+        """指定资源类型的全部字段（按 sort 排序），enum 字段带 enum_options"""
+        return self._ensure_fresh()['by_resource'].get(resource_type, [])
+
+    def get_field(self, field_id, resource_type: Optional[str] = None) -> Optional[Dict]:
+        """按字段ID获取字段，指定 resource_type 时资源类型不一致返回 None"""
+        try:
+            field_id = int(field_id)
+        except (TypeError, ValueError):
+            return None
+        field = self._ensure_fresh()['by_id'].get(field_id)
+        if field is None or (resource_type and field['resource_type'] != resource_type):
+            return None
+        return field
+
+    def get_field_by_name(self, resource_type: str, field_name: str) -> Optional[Dict]:
+        """按 (资源类型, 字段名) 获取字段"""
+        return self._ensure_fresh()['by_name'].get((resource_type, field_name))
+
+    def get_enum_options(self, field_id) -> List[Dict]:
+        """字段的枚举选项（按 sort 排序）"""
+        field = self.get_field(field_id)
+        return field.get('enum_options', []) if field else []
+
+    def get_option_label(self, field_id, option_key) -> Optional[str]:
+        """枚举存储值对应的显示名，找不到返回 None"""
+        try:
+            field_id = int(field_id)
+        except (TypeError, ValueError):
+            return None
+        return self._ensure_fresh()['label_by_key'].get((field_id, option_key))
+
+    def get_option_key(self, field_id, option_label) -> Optional[str]:
+        """枚举显示名对应的存储值，找不到返回 None"""
+        try:
+            field_id = int(field_id)
+        except (TypeError, ValueError):
+            return None
+        return self._ensure_fresh()['key_by_label'].get((field_id, option_label))
+
+    def get_generation(self) -> int:
+        """当前快照的加载序号，每次重新加载递增（用于派生缓存判断是否需要重建）"""
+        self._ensure_fresh()
+        return self._reloads
+
+    def get_stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            'version': self._version,
+            'fields': len(snapshot['by_id']) if snapshot else 0,
+            'reloads': self._reloads,
+            'age_seconds': round(time.monotonic() - self._loaded_at, 1) if snapshot else None
+        }
+
+
+def get_schema() -> CustomFieldSchemaCache:
+    """获取自定义字段定义缓存"""
+    return CustomFieldSchemaCache()
+
+
+def bump_schema_version():
+    """
+    字段定义变更后调用（事务提交之后）：
+    在 Valkey 中写入新的版本令牌使所有进程重新加载，同时立即丢弃本进程快照
+    """
+    CustomFieldSchemaCache().invalidate()
+    client = CacheService().get_client()
+    if client is None:
+        return
+    try:
+        client.set(SCHEMA_VERSION_KEY, _new_version())
+    except Exception as e:
+        logger.warning(f"Failed to bump custom field schema version: {e}")
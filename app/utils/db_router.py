@@ -0,0 +1,240 @@
+# app/utils/db_router.py
+
+"""
+DBRouter - 只读查询路由到 MySQL 从库
+
+配置 MYSQL_REPLICA_HOSTS 后每个从库注册为一个 Flask-SQLAlchemy bind（replica_0、replica_1 ...），
+db.session 使用 RoutingSession，按以下规则为每条语句选择连接：
+1. 只有 replica_reads() 标记的只读路径（列表查询、过滤选项、CSV 导出、仪表盘统计）中的 SELECT 才会路由到从库
+2. flush、INSERT / UPDATE / DELETE、SELECT ... FOR UPDATE、text() 语句始终走主库
+3. 读己之写：当前会话写过主库之后，本次请求剩余的查询都走主库；
+   用户的请求写过主库后 MYSQL_REPLICA_STICKY_SECONDS 秒内（例如编辑后重定向回列表）该用户的查询都走主库
+4. 从库轮询使用；每隔 MYSQL_REPLICA_LAG_CHECK_INTERVAL 秒检查一次复制延迟（SHOW REPLICA STATUS），
+   延迟超过 MYSQL_REPLICA_MAX_LAG、复制线程停止或连接失败的从库暂不使用，没有可用从库时回退到主库
+
+检查延迟需要从库账号有 REPLICATION CLIENT 权限
+"""
+
+import contextlib
+import contextvars
+import itertools
+import threading
+import time
+import logging
+from typing import Any, Dict, List
+
+from flask import has_request_context, session as http_session
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import text
+
+from app.config import MysqlConfig
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND_PREFIX = 'replica_'
+
+# Flask session 中记录"该用户在此时间之前读主库"的键
+_PRIMARY_UNTIL_KEY = '_db_primary_until'
+
+# session.info 中的标记：本会话写过主库 / 本会话读过从库
+_WROTE_KEY = 'db_router_wrote'
+_REPLICA_USED_KEY = 'db_router_replica_used'
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+@contextlib.contextmanager
+def replica_reads():
+    """
+    标记只读路径：期间 db.session 的 SELECT 可以路由到从库
+
+    可作为装饰器（@replica_reads()）或 with 语句使用；流式响应的生成器在视图返回后才执行，需要在生成器内用 with
+    """
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def _is_plain_select(clause) -> bool:
+    """普通 SELECT（不含 FOR UPDATE）"""
+    return (
+        clause is not None
+        and getattr(clause, 'is_select', False)
+        and getattr(clause, '_for_update_arg', None) is None
+    )
+
+
+def _in_primary_window() -> bool:
+    if not has_request_context():
+        return False
+    try:
+        return http_session.get(_PRIMARY_UNTIL_KEY, 0) > time.time()
+    except Exception:
+        return False
+
+
+def _open_primary_window():
+    """当前用户接下来 MYSQL_REPLICA_STICKY_SECONDS 秒内读主库"""
+    if not has_request_context() or MysqlConfig.MYSQL_REPLICA_STICKY_SECONDS <= 0:
+        return
+    try:
+        http_session[_PRIMARY_UNTIL_KEY] = time.time() + MysqlConfig.MYSQL_REPLICA_STICKY_SECONDS
+    except Exception as e:
+        logger.debug(f"Failed to mark primary read window: {e}")
+
+
+class ReplicaRouter:
+    """从库选择与复制延迟检查（单例，每个进程一份状态）"""
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(ReplicaRouter, cls).__new__(cls)
+                    cls._instance._init()
+        return cls._instance
+
+    def _init(self):
+        self._check_lock = threading.Lock()
+        self._counter = itertools.count()
+        self._checked_at = 0.0
+        # bind 名 -> {'healthy', 'lag_seconds', 'error', 'checked_at'}
+        self._status: Dict[str, Dict[str, Any]] = {}
+        # 统计
+        self._replica_reads = 0
+        self._primary_fallbacks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(MysqlConfig.MYSQL_REPLICA_HOSTS)
+
+    @staticmethod
+    def _replica_engines(engines) -> Dict[str, Any]:
+        return {key: engine for key, engine in engines.items() if isinstance(key, str) and key.startswith(REPLICA_BIND_PREFIX)}
+
+    @staticmethod
+    def _replication_status(engine, statement):
+        with engine.connect() as conn:
+            return conn.execute(text(statement)).mappings().first()
+
+    def _measure_lag(self, engine) -> Dict[str, Any]:
+        try:
+            row = self._replication_status(engine, "SHOW REPLICA STATUS")
+            lag_field = 'Seconds_Behind_Source'
+        except Exception:
+            # MySQL 8.0.22 之前
+            row = self._replication_status(engine, "SHOW SLAVE STATUS")
+            lag_field = 'Seconds_Behind_Master'
+        if row is None:
+            # 不是复制从库（例如只读代理），视为没有延迟
+            return {'healthy': True, 'lag_seconds': 0, 'error': None}
+        lag = row.get(lag_field)
+        if lag is None:
+            return {'healthy': False, 'lag_seconds': None, 'error': 'replication is not running'}
+        lag = int(lag)
+        return {'healthy': lag <= MysqlConfig.MYSQL_REPLICA_MAX_LAG, 'lag_seconds': lag, 'error': None}
+
+    def check(self, engines, force: bool = False):
+        """检查各从库的复制延迟（距上次检查不足 MYSQL_REPLICA_LAG_CHECK_INTERVAL 秒时跳过）"""
+        if not force and time.monotonic() - self._checked_at < MysqlConfig.MYSQL_REPLICA_LAG_CHECK_INTERVAL:
+            return
+        # 其他线程正在检查时沿用上一次的结果
+        if not self._check_lock.acquire(blocking=force):
+            return
+        try:
+            if not force and time.monotonic() - self._checked_at < MysqlConfig.MYSQL_REPLICA_LAG_CHECK_INTERVAL:
+                return
+            status = {}
+            for key, engine in self._replica_engines(engines).items():
+                try:
+                    status[key] = self._measure_lag(engine)
+                except Exception as e:
+                    status[key] = {'healthy': False, 'lag_seconds': None, 'error': str(e)}
+                status[key]['checked_at'] = time.time()
+                if not status[key]['healthy']:
+                    logger.warning(
+                        f"Replica {key} unavailable for reads: lag={status[key]['lag_seconds']}, error={status[key]['error']}"
+                    )
+            self._status = status
+            self._checked_at = time.monotonic()
+        finally:
+            self._check_lock.release()
+
+    def pick(self, engines):
+        """轮询选择一个可用从库，没有可用从库时返回 None"""
+        self.check(engines)
+        candidates = [
+            engine for key, engine in sorted(self._replica_engines(engines).items())
+            if self._status.get(key, {}).get('healthy')
+        ]
+        if not candidates:
+            self._primary_fallbacks += 1
+            return None
+        self._replica_reads += 1
+        return candidates[next(self._counter) % len(candidates)]
+
+    def get_stats(self, engines=None, refresh: bool = False) -> Dict[str, Any]:
+        if engines is not None and self.enabled:
+            self.check(engines, force=refresh)
+        replicas: List[Dict[str, Any]] = [
+            {'name': key, **status} for key, status in sorted(self._status.items())
+        ]
+        return {
+            'enabled': self.enabled,
+            'replicas': replicas,
+            'max_lag_seconds': MysqlConfig.MYSQL_REPLICA_MAX_LAG,
+            'replica_reads': self._replica_reads,
+            'primary_fallbacks': self._primary_fallbacks
+        }
+
+
+def get_replica_router() -> ReplicaRouter:
+    """获取从库路由器"""
+    return ReplicaRouter()
+
+
+def get_read_engine():
+    """只读的独立会话（例如 CSV 导出的服务端游标）使用的引擎：有可用从库时返回从库，否则返回主库"""
+    from app.models import db
+
+    if MysqlConfig.MYSQL_REPLICA_HOSTS and not _in_primary_window():
+        engine = get_replica_router().pick(db.engines)
+        if engine is not None:
+            return engine
+    return db.engine
+
+
+def used_replica(session) -> bool:
+    """当前会话是否有查询读了从库（从库数据可能有延迟）"""
+    return bool(session.info.get(_REPLICA_USED_KEY))
+
+
+class RoutingSession(FlaskSession):
+    """按语句类型和当前路径选择主库或从库的 Session"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is not None:
+            return bind
+
+        if self._flushing or (clause is not None and getattr(clause, 'is_dml', False)):
+            # 写主库：本次请求剩余的查询和该用户随后的请求都读主库
+            if not self.info.get(_WROTE_KEY):
+                self.info[_WROTE_KEY] = True
+                _open_primary_window()
+        elif (
+            _replica_reads.get()
+            and MysqlConfig.MYSQL_REPLICA_HOSTS
+            and _is_plain_select(clause)
+            and not self.info.get(_WROTE_KEY)
+            and not _in_primary_window()
+        ):
+            engine = get_replica_router().pick(self._db.engines)
+            if engine is not None:
+                self.info[_REPLICA_USED_KEY] = True
+                return engine
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -0,0 +1,128 @@
+# app/utils/index_advisor.py
+
+"""
+索引诊断工具
+
+对应用的热点查询（列表、仪表盘、状态同步、自定义字段加载）执行 EXPLAIN，
+报告全表扫描（type=ALL）、filesort 和临时表。用于确认 db_migrate 创建的索引是否生效，
+或在新增查询后评估是否需要补充索引。
+
+使用方式：python manage.py indexadvisor
+"""
+
+import logging
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy import func
+
+logger = logging.getLogger(__name__)
+
+
+def _sample(column, default):
+    """取一个真实存在的值作为查询参数，使执行计划接近线上情况"""
+    from app.models import db
+    value = db.session.query(column).limit(1).scalar()
+    return default if value is None else value
+
+
+def _hot_queries() -> List[Dict[str, Any]]:
+    """应用中的热点查询：[{'name': 描述, 'build': 返回 SQLAlchemy 查询的函数}]"""
+    from app.models import db, Host, VM, ChangeLog, OperationLog, CustomFieldValue
+
+    host_id = _sample(Host.id, 1)
+    host_info = _sample(Host.host_info, '')
+    vm_ip = _sample(OperationLog.vm_ip, '')
+    username = _sample(OperationLog.username, '')
+    field_id = _sample(CustomFieldValue.field_id, 1)
+    resource_id = _sample(CustomFieldValue.resource_id, 1)
+
+    return [
+        {'name': 'VM list page', 'build': lambda: VM.query.order_by(VM.id.asc()).limit(20)},
+        {'name': 'VM list sorted by IP', 'build': lambda: VM.query.order_by(VM.vm_ip_num.asc(), VM.id.asc()).limit(20)},
+        {'name': 'VMs in a subnet', 'build': lambda: VM.query.filter(VM.vm_ip_num.between(167772160, 167837695))},
+        {'name': 'VMs of a host', 'build': lambda: VM.query.filter(VM.host_id == host_id)},
+        {'name': 'VMs of a host by status', 'build': lambda: VM.query.filter(VM.host_id == host_id, VM.status == 'running')},
+        {'name': 'VMs of hosts (sync)', 'build': lambda: VM.query.filter(VM.host_id.in_([host_id]))},
+        {'name': 'VM status counts', 'build': lambda: db.session.query(VM.status, func.count()).group_by(VM.status)},
+        {'name': 'Host by host_info', 'build': lambda: Host.query.filter(Host.host_info == host_info)},
+        {'name': 'Dashboard recent operations', 'build': lambda: OperationLog.query.order_by(OperationLog.time.desc()).limit(20)},
+        {
+            'name': 'Operations of a user',
+            'build': lambda: OperationLog.query.filter(OperationLog.username == username).order_by(OperationLog.time.desc()).limit(20)
+        },
+        {
+            'name': 'Last operation per VM of a user',
+            'build': lambda: db.session.query(OperationLog.vm_ip, func.max(OperationLog.time))
+            .filter(OperationLog.username == username)
+            .group_by(OperationLog.vm_ip)
+        },
+        {
+            'name': 'Operations of a VM',
+            'build': lambda: OperationLog.query.filter(OperationLog.vm_ip == vm_ip).order_by(OperationLog.time.desc()).limit(20)
+        },
+        {'name': 'Change log page', 'build': lambda: ChangeLog.query.order_by(ChangeLog.time.desc()).limit(20)},
+        {
+            'name': 'Custom field value of a resource',
+            'build': lambda: CustomFieldValue.query.filter(
+                CustomFieldValue.field_id == field_id,
+                CustomFieldValue.resource_id == resource_id
+            )
+        },
+        {
+            'name': 'Custom field values of resources',
+            'build': lambda: CustomFieldValue.query.filter(
+                CustomFieldValue.resource_type == 'vm',
+                CustomFieldValue.resource_id.in_([resource_id])
+            )
+        },
+    ]
+
+
+def _problems(row) -> List[str]:
+    """从 EXPLAIN 的一行中找出问题"""
+    problems = []
+    extra = row.get('Extra') or ''
+    if row.get('type') == 'ALL':
+        problems.append('full table scan')
+    if 'Using filesort' in extra:
+        problems.append('filesort')
+    if 'Using temporary' in extra:
+        problems.append('temporary table')
+    return problems
+
+
+def explain_query(query) -> List[Dict[str, Any]]:
+    """对 SQLAlchemy 查询执行 EXPLAIN，返回执行计划的行"""
+    from app.models import db
+    stmt = query.statement if hasattr(query, 'statement') else query
+    sql = str(stmt.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+    result = db.session.connection().exec_driver_sql(f"EXPLAIN {sql}")
+    return [dict(row._mapping) for row in result]
+
+
+def run_index_advisor(queries: List[Dict[str, Callable]] = None) -> List[Dict[str, Any]]:
+    """
+    对热点查询执行 EXPLAIN（需在应用上下文中调用）
+
+    Returns:
+        [{'name', 'plan': [行], 'problems': [{'table', 'rows', 'key', 'problems'}], 'error'}]
+    """
+    report = []
+    for item in queries or _hot_queries():
+        entry = {'name': item['name'], 'plan': [], 'problems': [], 'error': None}
+        try:
+            entry['plan'] = explain_query(item['build']())
+            for row in entry['plan']:
+                problems = _problems(row)
+                if problems:
+                    entry['problems'].append({
+                        'table': row.get('table'),
+                        'rows': row.get('rows'),
+                        'key': row.get('key'),
+                        'problems': problems
+                    })
+        except Exception as e:
+            logger.warning(f"EXPLAIN failed for {item['name']}: {e}")
+            entry['error'] = str(e)
+        report.append(entry)
+    return report
@@ -0,0 +1,117 @@
+# app/utils/ip_filter.py
+
+"""
+IP 过滤条件
+
+vms.vm_ip / hosts.host_ipaddress 为字符串，另有 INET_ATON 生成列 vm_ip_num / host_ip_num（带索引）。
+列表和 API 的 IP 过滤值支持以下写法，编译为生成列上的 IN / BETWEEN，可以走索引：
+- 单个 IP：10.20.1.5
+- CIDR：10.20.0.0/16
+- 范围：10.20.1.1-10.20.1.50（结束地址也可以只写最后一段：10.20.1.1-50）
+- 以上任意组合，用逗号、分号、空白或换行分隔（从表格中粘贴的 IP 列表）
+
+无法解析为 IPv4 的值仍按字符串精确匹配，__NULL__ 表示空值
+"""
+
+import ipaddress
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import or_
+
+# 字符串 IP 列 -> 生成列
+IP_NUM_COLUMNS = {
+    'vms': {'vm_ip': 'vm_ip_num'},
+    'hosts': {'host_ipaddress': 'host_ip_num'},
+}
+
+NULL_VALUE = '__NULL__'
+
+_SEPARATORS = re.compile(r'[\s,;]+')
+
+
+def ip_to_int(value: str) -> Optional[int]:
+    """IPv4 地址转为整数（与 INET_ATON 一致），无法解析时返回 None"""
+    try:
+        return int(ipaddress.IPv4Address(value.strip()))
+    except (ValueError, TypeError):
+        return None
+
+
+def _parse_range(token: str) -> Optional[Tuple[int, int]]:
+    if '/' in token:
+        try:
+            network = ipaddress.IPv4Network(token, strict=False)
+        except ValueError:
+            return None
+        return int(network.network_address), int(network.broadcast_address)
+
+    start, _, end = token.partition('-')
+    start_num = ip_to_int(start)
+    if start_num is None:
+        return None
+    end = end.strip()
+    if end.isdigit() and int(end) <= 255:
+        # 简写：10.20.1.1-50
+        end_num = (start_num & 0xFFFFFF00) | int(end)
+    else:
+        end_num = ip_to_int(end)
+    if end_num is None:
+        return None
+    return min(start_num, end_num), max(start_num, end_num)
+
+
+def parse_ip_filter(value: str) -> Tuple[List[int], List[Tuple[int, int]], List[str], bool]:
+    """
+    解析 IP 过滤值
+
+    Returns:
+        (单个 IP 的整数值, [(起始, 结束)] 闭区间, 无法解析的原始值, 是否包含 __NULL__)
+    """
+    addresses, ranges, others = [], [], []
+    include_null = False
+    for token in _SEPARATORS.split(value or ''):
+        if not token:
+            continue
+        if token == NULL_VALUE:
+            include_null = True
+            continue
+        if '/' in token or '-' in token:
+            parsed = _parse_range(token)
+            if parsed is not None:
+                ranges.append(parsed)
+                continue
+        else:
+            number = ip_to_int(token)
+            if number is not None:
+                addresses.append(number)
+                continue
+        others.append(token)
+    return addresses, ranges, others, include_null
+
+
+def ip_filter_condition(text_column, num_column, value: str):
+    """
+    IP 过滤条件
+
+    Args:
+        text_column: 字符串 IP 列（无法解析的值、空值按该列匹配）
+        num_column: INET_ATON 生成列
+        value: 请求参数中的过滤值
+
+    Returns:
+        SQLAlchemy 条件，过滤值为空时返回 None
+    """
+    addresses, ranges, others, include_null = parse_ip_filter(value)
+    conditions = []
+    if addresses:
+        conditions.append(num_column.in_(sorted(set(addresses))) if len(addresses) > 1 else num_column == addresses[0])
+    for start, end in ranges:
+        conditions.append(num_column.between(start, end))
+    if others:
+        conditions.append(text_column.in_(others))
+    if include_null:
+        conditions.append(or_(text_column.is_(None), text_column == ''))
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else or_(*conditions)
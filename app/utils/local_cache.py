@@ -0,0 +1,246 @@
+# app/utils/local_cache.py
+
+"""
+LocalCache - 进程内本地缓存（位于 Valkey 之前）
+
+列表页每次都会读取的宿主机 / VM 对象和字典元数据（host:N、vm:N、dict:xxx），
+命中本地缓存时直接从内存返回，不经过网络也不再解析 JSON：
+1. LRU + TTL：条目数超过 LOCAL_CACHE_MAX_ENTRIES 时淘汰最久未使用的条目，写入 LOCAL_CACHE_TTL 秒后过期
+2. 跨进程一致性：CacheService 写入或删除这些键时向 Valkey 频道 LOCAL_CACHE_CHANNEL 发布失效消息，
+   每个 worker 的订阅线程收到后删除本地条目（忽略本进程发出的消息）
+3. 订阅断开期间不使用本地缓存（无法收到失效消息），重新订阅后清空本地条目
+4. 返回的是条目的浅拷贝（嵌套的字典 / 列表也拷贝一层），调用方修改返回值不会影响其他请求
+
+gunicorn preload 时 fork 之后订阅线程不存在，按进程重新启动
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from app.config import RedisConfig
+
+logger = logging.getLogger(__name__)
+
+# 使用本地缓存的键前缀（统计数据变化频繁且按前缀批量删除，不放入本地缓存）
+LOCAL_PREFIXES = ('host:', 'vm:', 'dict:')
+
+# 失效消息中表示清空所有条目的键
+FLUSH_ALL = '*'
+
+
+def is_local_key(key: str) -> bool:
+    return key.startswith(LOCAL_PREFIXES)
+
+
+def _detach(value):
+    """浅拷贝缓存值，嵌套的字典 / 列表再拷贝一层"""
+    if isinstance(value, dict):
+        return {k: (dict(v) if isinstance(v, dict) else list(v) if isinstance(v, list) else v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_detach(item) for item in value]
+    return value
+
+
+class LocalCache:
+    """进程内 LRU 缓存（单例，每个进程一个失效订阅线程）"""
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(LocalCache, cls).__new__(cls)
+                    cls._instance._init()
+        return cls._instance
+
+    def _init(self):
+        self._data_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._pid = None
+        self._origin = None
+        self._thread = None
+        self._subscribed = False
+        self._stop = threading.Event()
+        # 每次删除 / 清空条目时加一：读取 Valkey 期间发生过失效时不写入本地缓存，避免缓存已失效的旧值
+        self._generation = 0
+        # 统计
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return RedisConfig.LOCAL_CACHE_ENABLED
+
+    # ---------- 订阅线程 ----------
+
+    def _ensure_started(self, client):
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._state_lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            # fork 后继承的条目可能已经过期失效，直接丢弃
+            self.clear()
+            self._pid = os.getpid()
+            self._origin = f"{os.getpid()}:{uuid.uuid4().hex}"
+            self._subscribed = False
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(client,), name='local-cache-invalidator', daemon=True)
+            self._thread.start()
+
+    def _run(self, client):
+        backoff = 1
+        while not self._stop.is_set():
+            pubsub = None
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(RedisConfig.LOCAL_CACHE_CHANNEL)
+                # 订阅之前可能错过失效消息
+                self.clear()
+                self._subscribed = True
+                backoff = 1
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get('type') == 'message':
+                        self._handle_message(message.get('data'))
+            except Exception as e:
+                logger.warning(f"Local cache invalidation subscriber disconnected: {e}")
+            finally:
+                self._subscribed = False
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            self.clear()
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def _handle_message(self, data):
+        try:
+            payload = json.loads(data)
+        except (TypeError, ValueError):
+            return
+        if payload.get('origin') == self._origin:
+            return
+        keys = payload.get('keys') or []
+        if FLUSH_ALL in keys:
+            self.clear()
+            return
+        self._discard(keys)
+
+    def stop(self):
+        self._stop.set()
+
+    # ---------- 读写 ----------
+
+    def usable(self, client) -> bool:
+        """本地缓存是否可用（启用且失效订阅正常）"""
+        if not self.enabled or client is None:
+            return False
+        self._ensure_started(client)
+        return self._subscribed
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """返回 (是否命中, 值)"""
+        now = time.monotonic()
+        with self._data_lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return False, None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self._misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._hits += 1
+        return True, _detach(value)
+
+    def generation(self) -> int:
+        """读取 Valkey 之前取得，写入本地缓存时传回 set"""
+        return self._generation
+
+    def set(self, key: str, value: Any, generation: int, ttl: Optional[int] = None):
+        """
+        写入条目，过期时间取 LOCAL_CACHE_TTL 与 ttl 的较小值
+
+        Args:
+            generation: 读取 Valkey 之前的 generation()，之后发生过失效时放弃写入
+        """
+        ttl = RedisConfig.LOCAL_CACHE_TTL if ttl is None else min(ttl, RedisConfig.LOCAL_CACHE_TTL)
+        if ttl <= 0:
+            return
+        value = _detach(value)
+        with self._data_lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > RedisConfig.LOCAL_CACHE_MAX_ENTRIES:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def _discard(self, keys: Iterable[str]):
+        with self._data_lock:
+            self._generation += 1
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self._invalidations += 1
+
+    def clear(self):
+        with self._data_lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def invalidate(self, client, keys: Iterable[str]):
+        """
+        删除本地条目并通知其他进程
+
+        Args:
+            client: Valkey 客户端（用于发布失效消息）
+            keys: 已写入或删除的键（非本地缓存前缀的键忽略）
+        """
+        if not self.enabled:
+            return
+        keys = [key for key in keys if is_local_key(key)]
+        if not keys:
+            return
+        self._discard(keys)
+        if client is None:
+            return
+        try:
+            client.publish(RedisConfig.LOCAL_CACHE_CHANNEL, json.dumps({'origin': self._origin, 'keys': keys}))
+        except Exception as e:
+            logger.warning(f"Failed to publish Local cache invalidation for {len(keys)} keys: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._data_lock:
+            total = self._hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'subscribed': self._subscribed,
+                'entries': len(self._entries),
+                'max_entries': RedisConfig.LOCAL_CACHE_MAX_ENTRIES,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / total * 100, 2) if total else 0.0,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations
+            }
+
+
+def get_local_cache() -> LocalCache:
+    """获取进程内本地缓存"""
+    return LocalCache()
@@ -0,0 +1,367 @@
+# app/utils/metrics.py
+
+"""
+Metrics - 跨 gunicorn worker 聚合的 Prometheus 指标
+
+各统计接口（/api/cache/stat 等）的计数保存在进程内存中，只反映响应请求的那一个 worker。
+这里的指标写入 Valkey，所有 worker / Pod 共享同一份数据，GET /metrics 以 Prometheus 文本格式导出：
+1. 记录指标只修改进程内的增量（加锁的字典），不访问网络
+2. 距上次写入超过 METRICS_FLUSH_INTERVAL 秒时，记录指标的线程顺带用一次 pipeline 把增量 HINCRBYFLOAT
+   到 Valkey（每个指标一个哈希 metrics:{name}），写入失败时增量保留到下次；worker 退出和导出前也会写入
+3. 直方图只累加观测值所在的桶，导出时再转换为 Prometheus 的累计桶
+4. Valkey 不可用时导出本进程自启动以来的数据
+
+不启动后台线程：gunicorn preload 时 master 中记录的增量在 fork 后由子进程丢弃，避免重复计数
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.config import MetricsConfig
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'metrics:'
+
+# 已定义的指标（按定义顺序导出）
+_METRICS: List['_Metric'] = []
+
+
+def _label_key(labelnames: Sequence[str], labels: Dict[str, Any]) -> str:
+    return json.dumps([str(labels.get(name, '')) for name in labelnames], ensure_ascii=False, separators=(',', ':'))
+
+
+class MetricsStore:
+    """指标增量缓冲与 Valkey 读写（单例，每个进程一份缓冲）"""
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(MetricsStore, cls).__new__(cls)
+                    cls._instance._init()
+        return cls._instance
+
+    def _init(self):
+        self._data_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pid = os.getpid()
+        # 指标名 -> {字段: 值}；_pending 为尚未写入 Valkey 的增量，_totals 为本进程累计值
+        self._pending: Dict[str, Dict[str, float]] = {}
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self._flushed_at = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return MetricsConfig.METRICS_ENABLED
+
+    @staticmethod
+    def _client():
+        # cache_manager 导入了本模块，这里延迟导入
+        from app.utils.cache_manager import CacheService
+        return CacheService().get_client()
+
+    def _check_fork_locked(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._pending.clear()
+            self._totals.clear()
+            self._flushed_at = time.monotonic()
+
+    def add(self, name: str, fields: Iterable[Tuple[str, float]]):
+        with self._data_lock:
+            self._check_fork_locked()
+            pending = self._pending.setdefault(name, {})
+            totals = self._totals.setdefault(name, {})
+            for field, amount in fields:
+                pending[field] = pending.get(field, 0) + amount
+                totals[field] = totals.get(field, 0) + amount
+            due = time.monotonic() - self._flushed_at >= MetricsConfig.METRICS_FLUSH_INTERVAL
+        if due:
+            self.flush(blocking=False)
+
+    def flush(self, blocking: bool = True) -> bool:
+        """把增量写入 Valkey；blocking=False 时其他线程正在写入则直接返回"""
+        if not self._flush_lock.acquire(blocking=blocking):
+            return False
+        try:
+            with self._data_lock:
+                self._check_fork_locked()
+                pending, self._pending = self._pending, {}
+                self._flushed_at = time.monotonic()
+            if not pending:
+                return True
+            client = self._client()
+            if client is None:
+                self._restore(pending)
+                return False
+            try:
+                pipe = client.pipeline(transaction=False)
+                for name, fields in pending.items():
+                    for field, amount in fields.items():
+                        pipe.hincrbyfloat(KEY_PREFIX + name, field, amount)
+                pipe.execute()
+                return True
+            except Exception as e:
+                logger.warning(f"Failed to flush metrics: {e}")
+                self._restore(pending)
+                return False
+        finally:
+            self._flush_lock.release()
+
+    def _restore(self, pending: Dict[str, Dict[str, float]]):
+        with self._data_lock:
+            for name, fields in pending.items():
+                current = self._pending.setdefault(name, {})
+                for field, amount in fields.items():
+                    current[field] = current.get(field, 0) + amount
+
+    def collect(self, names: Sequence[str]) -> Tuple[Dict[str, Dict[str, float]], str]:
+        """
+        读取指标数据
+
+        Returns:
+            ({指标名: {字段: 值}}, 数据来源 'valkey' / 'local')
+        """
+        self.flush()
+        client = self._client()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for name in names:
+                    pipe.hgetall(KEY_PREFIX + name)
+                return {
+                    name: {field: float(value) for field, value in (values or {}).items()}
+                    for name, values in zip(names, pipe.execute())
+                }, 'valkey'
+            except Exception as e:
+                logger.warning(f"Failed to read metrics from Valkey, exporting local values: {e}")
+        with self._data_lock:
+            self._check_fork_locked()
+            return {name: dict(self._totals.get(name, {})) for name in names}, 'local'
+
+
+def get_metrics_store() -> MetricsStore:
+    """获取指标存储"""
+    return MetricsStore()
+
+
+# ==================== 指标类型 ====================
+
+class _Metric:
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _METRICS.append(self)
+
+    def _record(self, fields: Iterable[Tuple[str, float]]):
+        get_metrics_store().add(self.name, fields)
+
+    def _labels_text(self, values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, values))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        escaped = (
+            f'{name}="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+            for name, value in pairs
+        )
+        return '{' + ','.join(escaped) + '}'
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        if not MetricsConfig.METRICS_ENABLED:
+            return
+        self._record([(_label_key(self.labelnames, labels) + '|total', amount)])
+
+    def render(self, fields: Dict[str, float]) -> List[str]:
+        lines = []
+        for field, value in sorted(fields.items()):
+            label_key, _, _ = field.rpartition('|')
+            lines.append(f'{self.name}{self._labels_text(json.loads(label_key))} {_format(value)}')
+        return lines
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        if not MetricsConfig.METRICS_ENABLED:
+            return
+        label_key = _label_key(self.labelnames, labels)
+        # 只累加所在的桶（最后一个下标为 +Inf），导出时转换为累计值
+        index = bisect.bisect_left(self.buckets, value)
+        self._record([
+            (f'{label_key}|count', 1),
+            (f'{label_key}|sum', value),
+            (f'{label_key}|b{index}', 1),
+        ])
+
+    def render(self, fields: Dict[str, float]) -> List[str]:
+        series: Dict[str, Dict[str, float]] = {}
+        for field, value in fields.items():
+            label_key, _, suffix = field.rpartition('|')
+            series.setdefault(label_key, {})[suffix] = value
+
+        lines = []
+        for label_key in sorted(series):
+            values = series[label_key]
+            label_values = json.loads(label_key)
+            cumulative = 0.0
+            for index, bound in enumerate(self.buckets + (float('inf'),)):
+                cumulative += values.get(f'b{index}', 0)
+                le = '+Inf' if bound == float('inf') else _format(bound)
+                lines.append(f'{self.name}_bucket{self._labels_text(label_values, ("le", le))} {_format(cumulative)}')
+            lines.append(f'{self.name}_sum{self._labels_text(label_values)} {_format(values.get("sum", 0))}')
+            lines.append(f'{self.name}_count{self._labels_text(label_values)} {_format(values.get("count", 0))}')
+        return lines
+
+
+def _format(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+# ==================== 应用指标 ====================
+
+HTTP_REQUEST_DURATION = Histogram(
+    'vmcontrolhub_http_request_duration_seconds', 'HTTP request latency by endpoint',
+    ('endpoint', 'method', 'status'),
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+SQL_QUERY_DURATION = Histogram(
+    'vmcontrolhub_sql_query_duration_seconds', 'SQL statement execution time by operation and database host',
+    ('operation', 'database'),
+    (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+SQL_QUERY_ERRORS = Counter(
+    'vmcontrolhub_sql_query_errors_total', 'SQL statements that raised an error',
+    ('operation', 'database')
+)
+SSH_COMMAND_DURATION = Histogram(
+    'vmcontrolhub_ssh_command_duration_seconds', 'SSH command latency per host',
+    ('host', 'status'),
+    (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+CACHE_REQUESTS = Counter(
+    'vmcontrolhub_cache_requests_total', 'Cache lookups by key namespace, layer and result',
+    ('namespace', 'layer', 'result')
+)
+SYNC_DURATION = Histogram(
+    'vmcontrolhub_sync_duration_seconds', 'VM status sync run duration',
+    ('engine',),
+    (1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+)
+
+
+def record_cache_lookup(key: Optional[str], hit: bool, layer: str = 'valkey'):
+    """记录一次缓存查询，namespace 为键的第一段（vm / host / stats / dict ...）"""
+    namespace = key.split(':', 1)[0] if key else 'unknown'
+    CACHE_REQUESTS.inc(namespace=namespace, layer=layer, result='hit' if hit else 'miss')
+
+
+def record_ssh_command(host: str, exit_status: int, elapsed: float):
+    """记录一条 SSH 命令的耗时，退出码非 0（包括连接失败的 -1）记为 error"""
+    SSH_COMMAND_DURATION.observe(elapsed, host=host, status='ok' if exit_status == 0 else 'error')
+
+
+def get_cache_namespace_totals() -> Dict[str, Dict[str, int]]:
+    """所有 worker 的缓存命中 / 未命中次数：{namespace: {'hits', 'misses'}}"""
+    data, _ = get_metrics_store().collect([CACHE_REQUESTS.name])
+    totals: Dict[str, Dict[str, int]] = {}
+    for field, value in data[CACHE_REQUESTS.name].items():
+        label_key, _, _ = field.rpartition('|')
+        namespace, _, result = json.loads(label_key)
+        entry = totals.setdefault(namespace, {'hits': 0, 'misses': 0})
+        entry['hits' if result == 'hit' else 'misses'] += int(value)
+    return totals
+
+
+def render_metrics() -> str:
+    """导出 Prometheus 文本格式"""
+    data, source = get_metrics_store().collect([metric.name for metric in _METRICS])
+    lines = [f'# Metrics source: {source}']
+    for metric in _METRICS:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        lines.extend(metric.render(data.get(metric.name, {})))
+    return '\n'.join(lines) + '\n'
+
+
+# ==================== 采集钩子 ====================
+
+def _sql_operation(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[0].lower() if statement and statement.strip() else ''
+    return keyword if keyword in ('select', 'insert', 'update', 'delete', 'replace') else 'other'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_start', []).append(time.monotonic())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('metrics_query_start')
+    if not starts:
+        return
+    SQL_QUERY_DURATION.observe(
+        time.monotonic() - starts.pop(),
+        operation=_sql_operation(statement), database=conn.engine.url.host or ''
+    )
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('metrics_query_start'):
+        conn.info['metrics_query_start'].pop()
+    engine = exception_context.engine
+    SQL_QUERY_ERRORS.inc(
+        operation=_sql_operation(exception_context.statement),
+        database=(engine.url.host or '') if engine is not None else ''
+    )
+
+
+def init_metrics(app):
+    """注册请求耗时和 SQL 钩子（METRICS_ENABLED 为 false 时不注册）"""
+    if not MetricsConfig.METRICS_ENABLED:
+        return
+
+    from flask import g, request
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_request_start = time.monotonic()
+
+    @app.after_request
+    def _observe_request(response):
+        started = g.pop('metrics_request_start', None)
+        # 流式响应（CSV 导出、SSE）只统计到开始返回为止
+        if started is not None and request.endpoint != 'metrics.export_metrics':
+            HTTP_REQUEST_DURATION.observe(
+                time.monotonic() - started,
+                endpoint=request.endpoint or 'unmatched', method=request.method, status=response.status_code
+            )
+        return response
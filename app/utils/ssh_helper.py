@@ -1,9 +1,12 @@
 # app/utils/ssh_helper.py
 
 import os
+import time
 import paramiko
 from flask import current_app
-from paramiko import RSAKey
+from app.config import SSHConfig
+from app.utils.ssh_pool import SSHConnectionPool, load_private_key
+from app.utils.metrics import record_ssh_command
 
 
 def get_ssh_user():
@@ -59,12 +62,28 @@ def execute_ssh_command(host, command, ssh_user=None, timeout=30, port=22):
         return None, f"Invalid SSH port: {port}", -1
     
     ssh_key_file = get_ssh_key_file()
-    
+
+    started = time.monotonic()
+    output, error, exit_status = _run_ssh_command(host, command, ssh_user, ssh_key_file, timeout, port)
+    record_ssh_command(host, exit_status, time.monotonic() - started)
+    return output, error, exit_status
+
+
+def _run_ssh_command(host, command, ssh_user, ssh_key_file, timeout, port):
+    """执行 SSH 命令（参数已校验），返回 (output, error, exit_status)"""
+    # 连接池模式：复用已认证的 Transport，只新开 channel
+    if SSHConfig.SSH_POOL_ENABLED:
+        try:
+            return SSHConnectionPool().execute(host, command, ssh_user, ssh_key_file, timeout=timeout, port=port)
+        except Exception as e:
+            current_app.logger.error(f"SSH connection failed: host={host}, port={port}, username={ssh_user}, error={str(e)}")
+            return None, str(e), -1
+
     client = paramiko.SSHClient()
     client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    
+
     try:
-        private_key = RSAKey.from_private_key_file(ssh_key_file)
+        private_key = load_private_key(ssh_key_file)
         client.connect(
             hostname=host,
             username=ssh_user,
@@ -0,0 +1,475 @@
+"""
+SSHConnectionPool - 进程内 SSH 长连接池
+
+核心设计：
+1. 连接按 (host, port, user) 分组，复用已认证的 paramiko Transport，
+   每条命令只在已有 Transport 上新开一个 channel，避免重复 TCP+SSH 握手
+2. 每个 Transport 同时打开的 channel 数有上限（sshd 默认 MaxSessions=10）
+3. 每个 (host, port, user) 允许的 Transport 数有上限，超出时等待空闲 channel
+4. 空闲超时 / 最大存活时间淘汰，Transport 开启 keepalive
+5. 复用前做健康检查（is_active + 定期 send_ignore），失效连接自动剔除
+6. 私钥按文件 mtime 缓存，只在文件变化时重新解析
+
+进程安全：
+- 每个 gunicorn worker 持有独立的连接池
+- fork 后检测到 pid 变化时丢弃继承自父进程的连接（不关闭，避免干扰父进程的 socket）
+
+统计信息：
+- 命中/未命中次数、握手次数/失败次数/耗时、淘汰次数、存活连接数
+- 通过 /api/ssh/pool/stat 接口查询
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import paramiko
+from paramiko import RSAKey
+
+from app.config import SSHConfig
+
+logger = logging.getLogger(__name__)
+
+
+# ==================== 私钥缓存 ====================
+_key_cache: Dict[str, Tuple[float, RSAKey]] = {}
+_key_cache_lock = threading.Lock()
+
+
+def load_private_key(key_file: str) -> RSAKey:
+    """
+    加载 RSA 私钥（按文件 mtime 缓存）
+
+    Args:
+        key_file: 私钥文件路径
+
+    Returns:
+        RSAKey 对象
+    """
+    mtime = os.path.getmtime(key_file)
+    with _key_cache_lock:
+        cached = _key_cache.get(key_file)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+    private_key = RSAKey.from_private_key_file(key_file)
+    with _key_cache_lock:
+        _key_cache[key_file] = (mtime, private_key)
+    return private_key
+
+
+# ==================== 连接池统计器 ====================
+class SSHPoolStats:
+    """
+    SSH 连接池统计器
+    线程安全的内存计数器
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """重置统计数据"""
+        with self._lock:
+            self._hits = 0
+            self._misses = 0
+            self._handshakes = 0
+            self._handshake_failures = 0
+            self._handshake_total_ms = 0.0
+            self._handshake_max_ms = 0.0
+            self._evictions = 0
+            self._channel_failures = 0
+
+    def record_hit(self):
+        """记录复用已有连接"""
+        with self._lock:
+            self._hits += 1
+
+    def record_miss(self):
+        """记录需要新建连接"""
+        with self._lock:
+            self._misses += 1
+
+    def record_handshake(self, elapsed_ms: float, success: bool):
+        """记录一次握手及其耗时"""
+        with self._lock:
+            if success:
+                self._handshakes += 1
+                self._handshake_total_ms += elapsed_ms
+                self._handshake_max_ms = max(self._handshake_max_ms, elapsed_ms)
+            else:
+                self._handshake_failures += 1
+
+    def record_eviction(self, count: int = 1):
+        """记录淘汰的连接数"""
+        with self._lock:
+            self._evictions += count
+
+    def record_channel_failure(self):
+        """记录在已有连接上打开 channel 失败"""
+        with self._lock:
+            self._channel_failures += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        with self._lock:
+            total = self._hits + self._misses
+            hit_rate = (self._hits / total * 100) if total > 0 else 0.0
+            avg_ms = (self._handshake_total_ms / self._handshakes) if self._handshakes > 0 else 0.0
+            return {
+                'ssh_pool_hit_total': self._hits,
+                'ssh_pool_miss_total': self._misses,
+                'ssh_pool_hit_rate': f"{round(hit_rate, 2)}%",
+                'ssh_pool_hit_rate_value': round(hit_rate, 2),
+                'ssh_handshake_total': self._handshakes,
+                'ssh_handshake_failed_total': self._handshake_failures,
+                'ssh_handshake_avg_ms': round(avg_ms, 2),
+                'ssh_handshake_max_ms': round(self._handshake_max_ms, 2),
+                'ssh_pool_evicted_total': self._evictions,
+                'ssh_channel_failed_total': self._channel_failures
+            }
+
+
+# ==================== 池化连接 ====================
+class _PooledTransport:
+    """池中的单个已认证 SSH 连接"""
+
+    def __init__(self, key: Tuple[str, int, str], client: paramiko.SSHClient):
+        now = time.monotonic()
+        self.key = key
+        self.client = client
+        self.transport = client.get_transport()
+        self.created_at = now
+        self.last_used = now
+        self.last_checked = now
+        self.active_channels = 0
+        self.total_channels = 0
+
+    def is_alive(self) -> bool:
+        return self.transport is not None and self.transport.is_active()
+
+    def health_check(self) -> bool:
+        """
+        主动探测连接是否可用
+        send_ignore 在底层 socket 已断开时会抛出异常
+        """
+        if not self.is_alive():
+            return False
+        try:
+            self.transport.send_ignore()
+            self.last_checked = time.monotonic()
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        try:
+            self.client.close()
+        except Exception:
+            pass
+
+
+# ==================== 连接池 ====================
+class SSHConnectionPool:
+    """
+    SSH 连接池（进程内单例）
+
+    使用方式：
+        output, error, exit_status = SSHConnectionPool().execute(host, command, ssh_user, key_file, timeout, port)
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(SSHConnectionPool, cls).__new__(cls)
+                    cls._instance._init()
+        return cls._instance
+
+    def _init(self):
+        """初始化连接池"""
+        self._pid = os.getpid()
+        self._pools: Dict[Tuple[str, int, str], list] = {}
+        self._pending: Dict[Tuple[str, int, str], int] = {}
+        self._cond = threading.Condition(threading.Lock())
+        self._stats = SSHPoolStats()
+
+    # ---------- 内部方法（调用方需持有 self._cond） ----------
+
+    def _check_fork_locked(self):
+        """fork 后丢弃父进程的连接"""
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._pools = {}
+            self._pending = {}
+            self._stats.reset()
+
+    def _remove_locked(self, conn: _PooledTransport):
+        conns = self._pools.get(conn.key)
+        if conns and conn in conns:
+            conns.remove(conn)
+            if not conns:
+                self._pools.pop(conn.key, None)
+
+    def _evict_locked(self) -> list:
+        """
+        找出需要淘汰的连接并从池中移除
+
+        Returns:
+            需要关闭的连接列表（在锁外关闭）
+        """
+        now = time.monotonic()
+        evicted = []
+        for key in list(self._pools.keys()):
+            for conn in list(self._pools[key]):
+                if conn.active_channels > 0:
+                    continue
+                idle_expired = now - conn.last_used > SSHConfig.SSH_POOL_IDLE_TIMEOUT
+                life_expired = now - conn.created_at > SSHConfig.SSH_POOL_MAX_LIFETIME
+                if idle_expired or life_expired or not conn.is_alive():
+                    self._remove_locked(conn)
+                    evicted.append(conn)
+        if evicted:
+            self._stats.record_eviction(len(evicted))
+        return evicted
+
+    def _pick_locked(self, key) -> Optional[_PooledTransport]:
+        """选择一个还有空闲 channel 的健康连接"""
+        now = time.monotonic()
+        for conn in list(self._pools.get(key, [])):
+            if conn.active_channels >= SSHConfig.SSH_POOL_MAX_CHANNELS:
+                continue
+            if not conn.is_alive():
+                continue
+            if now - conn.last_checked > SSHConfig.SSH_POOL_HEALTH_CHECK_INTERVAL and not conn.health_check():
+                continue
+            return conn
+        return None
+
+    # ---------- 连接获取与归还 ----------
+
+    def _connect(self, key, key_file: str, timeout: int) -> _PooledTransport:
+        """建立新的 SSH 连接并完成认证"""
+        host, port, ssh_user = key
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+
+        start = time.monotonic()
+        try:
+            client.connect(
+                hostname=host,
+                username=ssh_user,
+                port=port,
+                pkey=load_private_key(key_file),
+                timeout=timeout,
+                banner_timeout=timeout,
+                auth_timeout=timeout,
+                allow_agent=False,
+                look_for_keys=False
+            )
+        except Exception:
+            self._stats.record_handshake((time.monotonic() - start) * 1000, False)
+            client.close()
+            raise
+
+        elapsed_ms = (time.monotonic() - start) * 1000
+        self._stats.record_handshake(elapsed_ms, True)
+
+        transport = client.get_transport()
+        if SSHConfig.SSH_POOL_KEEPALIVE > 0:
+            transport.set_keepalive(SSHConfig.SSH_POOL_KEEPALIVE)
+
+        logger.debug(f"SSH transport established: {host}:{port} user={ssh_user}, handshake={elapsed_ms:.1f}ms")
+        return _PooledTransport(key, client)
+
+    def acquire(self, host: str, port: int, ssh_user: str, key_file: str, timeout: int = 30) -> _PooledTransport:
+        """
+        获取一个可以打开 channel 的连接（已为调用方占用一个 channel 名额）
+
+        Args:
+            host: 宿主机 IP
+            port: SSH 端口
+            ssh_user: SSH 用户名
+            key_file: 私钥文件路径
+            timeout: 等待空闲 channel 及建立连接的超时时间（秒）
+
+        Returns:
+            _PooledTransport 对象，使用完毕后必须调用 release()
+        """
+        key = (host, port, ssh_user)
+        deadline = time.monotonic() + timeout
+
+        with self._cond:
+            self._check_fork_locked()
+            evicted = self._evict_locked()
+
+            while True:
+                conn = self._pick_locked(key)
+                if conn is not None:
+                    conn.active_channels += 1
+                    conn.total_channels += 1
+                    self._stats.record_hit()
+                    break
+
+                total = len(self._pools.get(key, [])) + self._pending.get(key, 0)
+                if total < SSHConfig.SSH_POOL_MAX_CONNECTIONS_PER_HOST:
+                    self._pending[key] = self._pending.get(key, 0) + 1
+                    self._stats.record_miss()
+                    conn = None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Timed out waiting for a free SSH channel to {host}:{port}")
+                self._cond.wait(remaining)
+
+        for old in evicted:
+            old.close()
+
+        if conn is not None:
+            return conn
+
+        # 在锁外完成握手，避免阻塞其他主机
+        try:
+            conn = self._connect(key, key_file, timeout)
+        except Exception:
+            with self._cond:
+                self._pending[key] -= 1
+                self._cond.notify_all()
+            raise
+
+        with self._cond:
+            self._pending[key] -= 1
+            conn.active_channels += 1
+            conn.total_channels += 1
+            self._pools.setdefault(key, []).append(conn)
+        return conn
+
+    def release(self, conn: _PooledTransport, broken: bool = False):
+        """
+        归还 channel 名额
+
+        Args:
+            conn: acquire() 返回的连接
+            broken: 连接是否已损坏（损坏的连接会被立即关闭并移出池）
+        """
+        close_it = False
+        with self._cond:
+            conn.active_channels = max(0, conn.active_channels - 1)
+            conn.last_used = time.monotonic()
+            if broken or not conn.is_alive():
+                self._remove_locked(conn)
+                close_it = conn.active_channels == 0
+                self._stats.record_eviction()
+            self._cond.notify_all()
+        if close_it:
+            conn.close()
+
+    # ---------- 命令执行 ----------
+
+    @staticmethod
+    def _run_on(channel, command: str, timeout: int):
+        try:
+            channel.settimeout(timeout)
+            channel.exec_command(command)
+            stdout = channel.makefile('rb', -1)
+            stderr = channel.makefile_stderr('rb', -1)
+            output = stdout.read().decode('utf-8').strip()
+            error = stderr.read().decode('utf-8').strip()
+            exit_status = channel.recv_exit_status()
+            return output, error, exit_status
+        finally:
+            channel.close()
+
+    def execute(self, host: str, command: str, ssh_user: str, key_file: str,
+                timeout: int = 30, port: int = 22):
+        """
+        在池化连接上执行命令
+
+        已有连接上打开 channel 失败时（例如服务端已关闭空闲连接），
+        丢弃该连接并使用新连接重试一次；channel 打开之后（exec_command 及读取输出）的任何失败都不重试，
+        避免开关机等命令在宿主机上执行两次
+
+        Returns:
+            (output, error, exit_status)
+        """
+        for attempt in range(2):
+            conn = self.acquire(host, port, ssh_user, key_file, timeout)
+            reused = conn.total_channels > 1
+            try:
+                channel = conn.transport.open_session(timeout=timeout)
+            except (paramiko.SSHException, EOFError, OSError) as e:
+                alive = conn.is_alive()
+                self.release(conn, broken=not alive)
+                if reused and attempt == 0 and not alive:
+                    self._stats.record_channel_failure()
+                    logger.debug(f"Stale SSH transport to {host}:{port}, reconnecting: {e}")
+                    continue
+                raise
+            except Exception:
+                self.release(conn)
+                raise
+
+            # 命令可能已经开始执行，失败时直接抛出
+            try:
+                result = self._run_on(channel, command, timeout)
+            except (paramiko.SSHException, EOFError, OSError):
+                self.release(conn, broken=not conn.is_alive())
+                raise
+            except Exception:
+                self.release(conn)
+                raise
+            self.release(conn)
+            return result
+
+    # ---------- 管理与统计 ----------
+
+    def close_all(self):
+        """关闭所有空闲连接（进程退出时调用）"""
+        with self._cond:
+            self._check_fork_locked()
+            idle = [c for conns in self._pools.values() for c in conns if c.active_channels == 0]
+            for conn in idle:
+                self._remove_locked(conn)
+        for conn in idle:
+            conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取连接池统计信息（含每个目标的存活连接数）"""
+        with self._cond:
+            self._check_fork_locked()
+            hosts = []
+            live = 0
+            active = 0
+            for (host, port, ssh_user), conns in self._pools.items():
+                alive = [c for c in conns if c.is_alive()]
+                channels = sum(c.active_channels for c in conns)
+                live += len(alive)
+                active += channels
+                hosts.append({
+                    'host': host,
+                    'port': port,
+                    'user': ssh_user,
+                    'connections': len(alive),
+                    'active_channels': channels
+                })
+
+        stats = self._stats.get_stats()
+        stats.update({
+            'ssh_pool_enabled': SSHConfig.SSH_POOL_ENABLED,
+            'ssh_pool_live_connections': live,
+            'ssh_pool_active_channels': active,
+            'ssh_pool_hosts': sorted(hosts, key=lambda h: (h['host'], h['port'])),
+            'pid': self._pid
+        })
+        return stats
+
+    def reset_stats(self):
+        """重置统计数据"""
+        self._stats.reset()
+        logger.info("SSH pool statistics reset")
@@ -1,13 +1,18 @@
 import logging
 import json
+import threading
 from typing import Optional, Any, Callable
 from functools import wraps
 
+from app.utils.cache_registry import register_keys, delete_pattern
+
 logger = logging.getLogger(__name__)
 
 _redis_client = None
 _redis_available = False
 _initialized = False
+# 多线程 worker 中首次访问可能并发，只初始化一次
+_init_lock = threading.Lock()
 
 
 def init_valkey():
@@ -53,18 +58,22 @@ def init_valkey():
         print(f"Redis initialization completed: available={_redis_available}")
 
 
+def _ensure_initialized():
+    if _initialized:
+        return
+    with _init_lock:
+        if not _initialized:
+            init_valkey()
+
+
 def get_valkey_client():
-    global _redis_client, _redis_available, _initialized
-    if not _initialized:
-        init_valkey()
+    _ensure_initialized()
     return _redis_client if _redis_available else None
 
 
 def is_cache_available() -> bool:
-    global _redis_available, _initialized
     print(f"=== is_cache_available called ===")
-    if not _initialized:
-        init_valkey()
+    _ensure_initialized()
     print(f"Cache available: {_redis_available}")
     return _redis_available
 
@@ -132,7 +141,11 @@ def cache_set(key: str, value: Any, timeout: Optional[int] = None) -> bool:
         from app.config import RedisConfig
         timeout = timeout or RedisConfig.CACHE_DEFAULT_TIMEOUT
         logger.info(f"Setting cache for key '{key}' with timeout {timeout}")
-        client.setex(key, timeout, json.dumps(value, default=str))
+        # 列表类键登记到命名空间集合，cache_delete_pattern 按集合删除
+        pipe = client.pipeline(transaction=False)
+        pipe.setex(key, timeout, json.dumps(value, default=str))
+        register_keys(pipe, [key], timeout)
+        pipe.execute()
         logger.info(f"Cache set successfully for key '{key}'")
         return True
     except Exception as e:
@@ -159,9 +172,8 @@ def cache_delete_pattern(pattern: str) -> bool:
         return False
     
     try:
-        keys = client.keys(pattern)
-        if keys:
-            client.delete(*keys)
+        # 登记命名空间按登记集合删除，其他模式增量 SCAN，不使用阻塞的 KEYS
+        delete_pattern(client, pattern)
         return True
     except Exception as e:
         logger.warning(f"Cache delete pattern failed for '{pattern}': {e}")
@@ -228,60 +240,114 @@ def cached(key_builder: Callable, timeout: Optional[int] = None):
     return decorator
 
 
-def _get_custom_field_values(resource_id: int, resource_type: str) -> dict:
+# 单条 IN 查询的资源ID数量上限
+CUSTOM_FIELD_BATCH_SIZE = 1000
+
+
+def load_custom_field_values(resource_type: str, resource_ids) -> dict:
     """
-    获取指定资源的自定义字段值
-    :param resource_id: 资源ID
+    批量获取多个资源的自定义字段值
+    
+    字段定义和枚举选项读取进程内缓存，只查询字段值（每 1000 个ID一个 IN）
+    
     :param resource_type: 资源类型 ('host' 或 'vm')
-    :return: 自定义字段值字典，key为字段ID字符串，value为字段值
+    :param resource_ids: 资源ID列表
+    :return: {resource_id: {字段ID字符串: 字段值}}，没有自定义字段值的资源对应空字典
     """
+    resource_ids = [rid for rid in dict.fromkeys(resource_ids) if rid is not None]
+    result = {rid: {} for rid in resource_ids}
+    if not resource_ids:
+        return result
+    
     try:
-        from app.models import CustomFieldValue, CustomField, CustomFieldEnumOption
-        
-        # 获取该资源的所有自定义字段值
-        field_values = CustomFieldValue.query.filter(
-            CustomFieldValue.resource_type == resource_type,
-            CustomFieldValue.resource_id == resource_id
-        ).all()
+        from app.models import CustomFieldValue
+        from app.utils.custom_field_schema import get_schema
         
         # 获取所有自定义字段配置（用于获取字段类型）
-        fields = CustomField.query.filter_by(resource_type=resource_type).all()
-        field_type_map = {str(f.id): f.field_type for f in fields}
+        schema = get_schema()
+        field_type_map = {f['id']: f['field_type'] for f in schema.get_fields(resource_type)}
+        if not field_type_map:
+            return result
+        
+        # 一次 IN 查询获取这批资源的所有自定义字段值
+        field_values = []
+        for i in range(0, len(resource_ids), CUSTOM_FIELD_BATCH_SIZE):
+            field_values.extend(CustomFieldValue.query.filter(
+                CustomFieldValue.resource_type == resource_type,
+                CustomFieldValue.resource_id.in_(resource_ids[i:i + CUSTOM_FIELD_BATCH_SIZE])
+            ).all())
         
-        result = {}
         for val in field_values:
-            field_type = field_type_map.get(str(val.field_id))
+            values = result.setdefault(val.resource_id, {})
+            field_type = field_type_map.get(val.field_id)
             if field_type == 'int':
-                result[str(val.field_id)] = val.int_value
+                values[str(val.field_id)] = val.int_value
             elif field_type == 'varchar':
-                result[str(val.field_id)] = val.varchar_value
+                values[str(val.field_id)] = val.varchar_value
             elif field_type == 'datetime':
-                result[str(val.field_id)] = val.datetime_value.isoformat() if val.datetime_value else None
+                values[str(val.field_id)] = val.datetime_value.isoformat() if val.datetime_value else None
             elif field_type == 'enum':
-                # 获取枚举选项的显示值
-                enum_opt = CustomFieldEnumOption.query.filter_by(
-                    field_id=val.field_id,
-                    value=val.enum_value
-                ).first()
-                if enum_opt:
-                    result[str(val.field_id)] = enum_opt.label
-                else:
-                    result[str(val.field_id)] = val.enum_value
+                # 枚举值转换为显示值，找不到选项时保留原始值
+                label = schema.get_option_label(val.field_id, val.enum_value)
+                values[str(val.field_id)] = label if label is not None else val.enum_value
             else:
-                result[str(val.field_id)] = None
+                values[str(val.field_id)] = None
         
         return result
     except Exception as e:
-        logger.warning(f"Failed to get custom field values for {resource_type}:{resource_id}: {e}")
-        return {}
+        logger.warning(f"Failed to load custom field values for {len(resource_ids)} {resource_type}(s): {e}")
+        return result
 
 
-def serialize_sqlalchemy_object(obj, include_custom_fields: bool = True) -> dict:
+def _get_custom_field_values(resource_id: int, resource_type: str) -> dict:
+    """
+    获取指定资源的自定义字段值
+    :param resource_id: 资源ID
+    :param resource_type: 资源类型 ('host' 或 'vm')
+    :return: 自定义字段值字典，key为字段ID字符串，value为字段值
+    """
+    return load_custom_field_values(resource_type, [resource_id]).get(resource_id, {})
+
+
+def _collect_custom_field_targets(obj, targets: dict):
+    """收集对象列表中需要加载自定义字段的 host / vm ID"""
+    if isinstance(obj, (list, tuple)):
+        for item in obj:
+            _collect_custom_field_targets(item, targets)
+        return
+    if not hasattr(obj, '__table__'):
+        return
+    
+    table_name = obj.__table__.name
+    if table_name in ('hosts', 'vms'):
+        resource_type = 'host' if table_name == 'hosts' else 'vm'
+        targets.setdefault(resource_type, set()).add(getattr(obj, 'id', None))
+
+
+def prefetch_custom_field_values(objs) -> dict:
+    """
+    为一批 SQLAlchemy 对象预取自定义字段值
+    
+    :param objs: host / vm 对象列表
+    :return: {(resource_type, resource_id): {字段ID字符串: 字段值}}，可传给 serialize_sqlalchemy_object
+    """
+    targets = {}
+    _collect_custom_field_targets(objs, targets)
+    prefetched = {}
+    for resource_type, resource_ids in targets.items():
+        for resource_id, values in load_custom_field_values(resource_type, list(resource_ids)).items():
+            prefetched[(resource_type, resource_id)] = values
+    return prefetched
+
+
+def serialize_sqlalchemy_object(obj, include_custom_fields: bool = True, custom_field_values: dict = None) -> dict:
     """
     将 SQLAlchemy 对象序列化为纯字典（去除所有方法）
     
     :param obj: SQLAlchemy 对象或其他可序列化对象
     :param include_custom_fields: 是否包含自定义字段（仅对 host 和 vm 有效）
+    :param custom_field_values: 预取的自定义字段值（prefetch_custom_field_values 的返回值）；
+                                为 None 且 obj 为列表时会自动批量预取
     :return: 序列化后的字典
     """
     if obj is None:
@@ -293,11 +359,14 @@ def serialize_sqlalchemy_object(obj, include_custom_fields: bool = True) -> dict
             # 跳过 pagination 对象，因为它无法序列化
             if key == 'pagination' and hasattr(value, 'iter_pages'):
                 continue
-            result[key] = serialize_sqlalchemy_object(value, include_custom_fields)
+            result[key] = serialize_sqlalchemy_object(value, include_custom_fields, custom_field_values)
         return result
     
     if isinstance(obj, (list, tuple)):
-        return [serialize_sqlalchemy_object(item, include_custom_fields) for item in obj]
+        # 整个列表一次性批量加载自定义字段，避免逐条查询
+        if include_custom_fields and custom_field_values is None:
+            custom_field_values = prefetch_custom_field_values(obj)
+        return [serialize_sqlalchemy_object(item, include_custom_fields, custom_field_values) for item in obj]
     
     if isinstance(obj, (str, bool)):
         return obj
@@ -334,7 +403,7 @@ def serialize_sqlalchemy_object(obj, include_custom_fields: bool = True) -> dict
         
         for c in obj.__table__.columns:
             value = getattr(obj, c.key)
-            result[c.key] = serialize_sqlalchemy_object(value, include_custom_fields)
+            result[c.key] = serialize_sqlalchemy_object(value, include_custom_fields, custom_field_values)
         
         # 处理关联对象（relationships）- 只处理已加载的关联
         try:
@@ -346,7 +415,7 @@ def serialize_sqlalchemy_object(obj, include_custom_fields: bool = True) -> dict
                     related_obj = obj.__dict__[attr]
                     if related_obj is not None:
                         # 递归序列化关联对象
-                        result[attr] = serialize_sqlalchemy_object(related_obj, include_custom_fields)
+                        result[attr] = serialize_sqlalchemy_object(related_obj, include_custom_fields, custom_field_values)
         except Exception:
             # 如果 inspection 失败，忽略关联对象处理
             pass
@@ -355,12 +424,15 @@ def serialize_sqlalchemy_object(obj, include_custom_fields: bool = True) -> dict
         # 自定义字段需要展平到顶层，以便模板可以通过 item[field.db_field] 访问
         if include_custom_fields and table_name in ['hosts', 'vms']:
             resource_type = 'host' if table_name == 'hosts' else 'vm'
-            custom_fields = _get_custom_field_values(result.get('id'), resource_type)
-            if custom_fields:
-                # 将自定义字段展平到顶层（字段ID作为key）
-                result.update(custom_fields)
-                # 同时保留 custom_fields 字典以便其他地方使用
-                result['custom_fields'] = custom_fields
+            prefetched_key = (resource_type, result.get('id'))
+            if custom_field_values is not None and prefetched_key in custom_field_values:
+                custom_fields = custom_field_values[prefetched_key]
+            else:
+                custom_fields = _get_custom_field_values(result.get('id'), resource_type)
+            # 将自定义字段展平到顶层（字段ID作为key）
+            result.update(custom_fields)
+            # 同时保留 custom_fields 字典以便其他地方使用（没有值时为空字典，表示已加载过）
+            result['custom_fields'] = custom_fields
         
         return result
     
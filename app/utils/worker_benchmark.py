@@ -0,0 +1,193 @@
+# app/utils/worker_benchmark.py
+
+"""
+gunicorn 并发模型压测
+
+依次以 sync / gthread / gevent 模式在本机启动 gunicorn（使用 gunicorn_config.py 和当前环境变量，
+监听 127.0.0.1 上的临时端口），登录后以固定并发请求 SSH 相关接口，报告各模式的吞吐量和延迟。
+默认请求 /control_vm/status?ip={ip}&refresh=1（跳过缓存，每个请求都通过 SSH 查询宿主机），
+{ip} 依次取数据库中的 VM IP。
+
+使用方式：python manage.py benchworkers --username admin [--worker-classes sync,gthread,gevent]
+"""
+
+import http.cookiejar
+import importlib.util
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WORKER_CLASSES = ('sync', 'gthread', 'gevent')
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_CSRF_PATTERN = re.compile(r'name="csrf_token" value="([^"]+)"')
+
+
+def sample_vm_ips(limit: int) -> List[str]:
+    """取数据库中的 VM IP 作为请求参数（需要应用上下文）"""
+    from app.models import db, VM
+    return [ip for (ip,) in db.session.query(VM.vm_ip).filter(VM.vm_ip.isnot(None)).order_by(VM.id).limit(limit)]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(worker_class: str, port: int, workers: int, threads: int, log_file):
+    env = dict(os.environ)
+    env.update({
+        'GUNICORN_WORKER_CLASS': worker_class,
+        'GUNICORN_BIND': f'127.0.0.1:{port}',
+        'GUNICORN_WORKERS': str(workers),
+        'GUNICORN_THREADS': str(threads),
+        # 压测实例不参与后台同步（gevent 模式不支持 asyncio 采集引擎）
+        'SYNC_SCHEDULER_ENABLED': 'false',
+        'SYNC_ENGINE': 'thread',
+    })
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py', 'run:app'],
+        cwd=_PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=log_file
+    )
+
+
+def _stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=40)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def _wait_ready(proc, base_url: str, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            return False
+        try:
+            urllib.request.urlopen(f'{base_url}/auth/login', timeout=2).close()
+            return True
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.5)
+    return False
+
+
+def _login(base_url: str, username: str, password: str):
+    """登录并返回带会话 cookie 的 opener"""
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    with opener.open(f'{base_url}/auth/login', timeout=10) as resp:
+        match = _CSRF_PATTERN.search(resp.read().decode('utf-8', 'replace'))
+    request = urllib.request.Request(
+        f'{base_url}/auth/login',
+        data=json.dumps({'username': username, 'password': password}).encode(),
+        headers={'Content-Type': 'application/json', 'X-CSRFToken': match.group(1) if match else ''},
+        method='POST'
+    )
+    opener.open(request, timeout=10).close()
+    return opener
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _run_load(opener, urls: List[str], concurrency: int, total: int, timeout: float) -> Dict[str, Any]:
+    def fetch(i):
+        started = time.monotonic()
+        try:
+            with opener.open(urls[i % len(urls)], timeout=timeout) as resp:
+                resp.read()
+                ok = resp.status == 200 and not resp.geturl().rstrip('/').endswith('/auth/login')
+        except Exception:
+            ok = False
+        return ok, time.monotonic() - started
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(fetch, range(total)))
+    duration = time.monotonic() - started
+
+    latencies = sorted(elapsed for _, elapsed in results)
+    errors = sum(1 for ok, _ in results if not ok)
+    return {
+        'requests': total,
+        'errors': errors,
+        'duration': round(duration, 2),
+        'throughput': round((total - errors) / duration, 2) if duration else 0.0,
+        'p50_ms': round(_percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(_percentile(latencies, 95) * 1000, 1),
+        'max_ms': round(latencies[-1] * 1000, 1) if latencies else 0.0
+    }
+
+
+def run_worker_benchmark(username: str, password: str, paths: List[str],
+                         worker_classes=WORKER_CLASSES, concurrency: int = 32, total: int = 200,
+                         workers: int = 2, threads: int = 8, timeout: float = 60,
+                         startup_timeout: float = 60) -> List[Dict[str, Any]]:
+    """
+    依次以各并发模型启动 gunicorn 并压测
+
+    Args:
+        username / password: 登录账号
+        paths: 请求路径（轮流使用）
+        worker_classes: 要对比的 worker 类型
+        concurrency: 客户端并发数
+        total: 每种模式的请求总数
+        workers / threads: gunicorn 进程数、gthread 模式每个进程的线程数
+        timeout: 单个请求超时（秒）
+
+    Returns:
+        [{'worker_class', 'error', 'requests', 'errors', 'duration', 'throughput', 'p50_ms', 'p95_ms', 'max_ms'}]
+    """
+    report = []
+    for worker_class in worker_classes:
+        entry: Dict[str, Any] = {'worker_class': worker_class, 'error': None}
+        report.append(entry)
+        if worker_class == 'gevent' and importlib.util.find_spec('gevent') is None:
+            entry['error'] = 'gevent is not installed'
+            continue
+
+        port = _free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        with tempfile.TemporaryFile() as log_file:
+            proc = _start_server(worker_class, port, workers, threads, log_file)
+            try:
+                if not _wait_ready(proc, base_url, startup_timeout):
+                    log_file.seek(0)
+                    tail = log_file.read().decode('utf-8', 'replace').strip().splitlines()[-5:]
+                    entry['error'] = 'gunicorn did not start: ' + ' | '.join(tail)
+                    continue
+                opener = _login(base_url, username, password)
+                # 预热：建立 SSH 连接池和数据库连接
+                _run_load(opener, [base_url + path for path in paths], min(concurrency, len(paths)), len(paths), timeout)
+                entry.update(_run_load(opener, [base_url + path for path in paths], concurrency, total, timeout))
+                logger.info(f"Benchmark {worker_class}: {entry}")
+            except Exception as e:
+                entry['error'] = str(e)
+            finally:
+                _stop_server(proc)
+    return report
+
+
+def build_paths(path: str, ips: Optional[List[str]]) -> List[str]:
+    """路径模板中的 {ip} 依次替换为 ips 中的值"""
+    if '{ip}' not in path:
+        return [path]
+    return [path.format(ip=ip) for ip in ips or []]
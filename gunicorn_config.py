@@ -12,19 +12,33 @@ os.environ["MALLOC_ARENA_MAX"] = "2"
 cores = multiprocessing.cpu_count()
 
 # 2. 网络绑定
-# 容器内部监听 5000 端口
-bind = "0.0.0.0:5000"
+# 容器内部监听 5000 端口（GUNICORN_BIND 可覆盖，例如并发模型压测时在本机其他端口启动）
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
 
 # 3. 动态工作进程设置 (关键优化)
 # 逻辑：核心数越多，进程数越多，但上限设为 6 以节省内存
-workers = max(2, min(cores, 6))
-
-# 4. 线程设置
-# 每个进程配合 8 个线程，总并发能力为 workers * threads (6 * 8 = 48)
-# 注：sync 模式下使用多线程需配合 gthread，若保持 pure sync，threads 建议设为 1
-# 若要启用多线程，需将 worker_class 改为 "gthread"
-threads = 8
-worker_class = "sync"  # 针对系统命令调用（qm/pvesh）保持 sync 模式最稳妥
+workers = int(os.environ.get("GUNICORN_WORKERS", max(2, min(cores, 6))))
+
+# 4. 并发模型（GUNICORN_WORKER_CLASS）
+# 电源操作、状态查询等接口的大部分时间在等待宿主机的 SSH 命令返回，需要每个进程能同时处理多个请求
+# - gthread（默认）：每个进程 GUNICORN_THREADS 个线程，总并发能力为 workers * threads (6 * 8 = 48)
+# - gevent：协程模式，每个进程最多 GUNICORN_WORKER_CONNECTIONS 个并发请求，适合大量 SSH 慢请求；需要安装 gevent。
+#   不支持与 SYNC_ENGINE=asyncio 组合（asyncio 事件循环运行在 monkey patch 之后的线程和 socket 上，未经验证），
+#   该组合拒绝启动，同步任务接口也不接受 engine=asyncio
+# - sync：每个进程同时只处理一个请求（threads 不生效）
+# 各模式的吞吐量可以用 python manage.py benchworkers 对比
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread").lower()
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 200))
+
+if worker_class == "gevent":
+    if os.environ.get("SYNC_ENGINE", "thread").lower() == "asyncio":
+        raise RuntimeError("SYNC_ENGINE=asyncio is not supported with GUNICORN_WORKER_CLASS=gevent, use SYNC_ENGINE=thread")
+    # preload_app 在 master 中导入应用，补丁必须在导入应用之前打上，
+    # 否则应用模块级创建的锁、线程池和 socket 仍是阻塞实现
+    from gevent import monkey
+    monkey.patch_all()
+
 preload_app = True  # 预加载应用代码，共享内存，节省资源并加快 worker 启动
 
 # 5. 核心：真实 IP 处理
@@ -42,6 +56,7 @@ access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"
 
 # 7. 超时与性能 (针对虚拟机操作优化)
 # 启动大内存 VM 可能耗时较长，设为 60 秒
+# 同步任务 SSE 推送的单次连接时长 SYNC_JOB_STREAM_TIMEOUT（默认 45 秒）必须小于该值
 timeout = 60
 keepalive = 5
 graceful_timeout = 30
@@ -51,4 +66,42 @@ max_requests_jitter = 100 # 随机抖动 0-100，避免所有 worker 同时重
 
 # 8. 进程管理
 proc_name = "vmcontrolhub_app"
-daemon = False  # Docker 模式必须为 False (由容器引擎管理生命周期)
\ No newline at end of file
+daemon = False  # Docker 模式必须为 False (由容器引擎管理生命周期)
+
+# 9. 进程钩子
+def post_worker_init(worker):
+    # 启用后台同步调度器时，每个 worker 都参与 leader 竞选，同一时间只有一个 worker 执行同步
+    from app.config import SyncConfig
+    if SyncConfig.SYNC_SCHEDULER_ENABLED:
+        from app.services.sync_scheduler import start_scheduler
+        start_scheduler(worker.wsgi)
+
+
+def worker_exit(server, worker):
+    # worker 退出前释放调度器 leader 锁，便于其他 worker 尽快接管
+    try:
+        from app.services.sync_scheduler import stop_scheduler
+        stop_scheduler()
+    except Exception as e:
+        server.log.warning(f"Failed to stop sync scheduler: {e}")
+
+    # 写完变更日志队列中剩余的日志（max_requests 重启、滚动发布时不丢审计记录）
+    try:
+        from app.services.change_log_writer import get_change_log_writer
+        get_change_log_writer().shutdown()
+    except Exception as e:
+        server.log.warning(f"Failed to flush change logs: {e}")
+
+    # 把本进程尚未写入 Valkey 的指标增量写完
+    try:
+        from app.utils.metrics import get_metrics_store
+        get_metrics_store().flush()
+    except Exception as e:
+        server.log.warning(f"Failed to flush metrics: {e}")
+
+    # 关闭 SSH 连接池中的空闲连接，向宿主机发送正常断开
+    try:
+        from app.utils.ssh_pool import SSHConnectionPool
+        SSHConnectionPool().close_all()
+    except Exception as e:
+        server.log.warning(f"Failed to close SSH pool: {e}")
@@ -84,12 +84,130 @@ def changepassword():
         print(f'✗ Change failed: {str(e)}')
         sys.exit(1)
 
+def runscheduler():
+    """Run the VM status sync scheduler in the foreground"""
+    import logging
+    from app.services.sync_scheduler import SyncScheduler
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    scheduler = SyncScheduler(app, standalone=True)
+    print(f'✓ Sync scheduler starting ({scheduler.identity}), press Ctrl+C to stop')
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        scheduler.stop()
+        print('\n✓ Sync scheduler stopped')
+
+def rebuildprojections():
+    """Rebuild the custom field projection tables for hosts and VMs"""
+    from app.config import CustomFieldConfig
+    from app.services.custom_field_projection import rebuild_projection
+    
+    if not CustomFieldConfig.CUSTOM_FIELD_PROJECTION_ENABLED:
+        print('✗ CUSTOM_FIELD_PROJECTION_ENABLED is not set, nothing to rebuild')
+        return
+    
+    try:
+        with app.app_context():
+            for resource_type in ('host', 'vm'):
+                rows = rebuild_projection(resource_type)
+                print(f'✓ Rebuilt {resource_type} custom field projection: {rows} rows')
+    except Exception as e:
+        print(f'✗ Rebuild failed: {str(e)}')
+        sys.exit(1)
+
+def rebuildsearchindex():
+    """Rebuild the list search index documents for hosts and VMs"""
+    from app.config import ListConfig
+    from app.services.search_index import rebuild_search_index
+    
+    if not ListConfig.SEARCH_INDEX_ENABLED:
+        print('✗ SEARCH_INDEX_ENABLED is not set, nothing to rebuild')
+        return
+    
+    try:
+        with app.app_context():
+            for resource_type in ('host', 'vm'):
+                rows = rebuild_search_index(resource_type)
+                print(f'✓ Rebuilt {resource_type} search index: {rows} documents')
+    except Exception as e:
+        print(f'✗ Rebuild failed: {str(e)}')
+        sys.exit(1)
+
+def indexadvisor():
+    """Run EXPLAIN on the application's hot queries and report full scans"""
+    from app.utils.index_advisor import run_index_advisor
+    
+    try:
+        with app.app_context():
+            report = run_index_advisor()
+    except Exception as e:
+        print(f'✗ Index advisor failed: {str(e)}')
+        sys.exit(1)
+    
+    flagged = 0
+    for entry in report:
+        if entry['error']:
+            print(f'✗ {entry["name"]}: EXPLAIN failed ({entry["error"]})')
+            continue
+        if not entry['problems']:
+            keys = ', '.join(str(row.get('key')) for row in entry['plan'])
+            print(f'✓ {entry["name"]}: key={keys}')
+            continue
+        flagged += 1
+        for problem in entry['problems']:
+            print(f'✗ {entry["name"]}: table={problem["table"]}, key={problem["key"]}, '
+                  f'rows={problem["rows"]}, {", ".join(problem["problems"])}')
+    
+    print(f'{flagged} of {len(report)} queries need attention')
+
+def benchworkers(args):
+    """Compare request throughput of SSH-bound endpoints under each gunicorn worker class"""
+    from app.utils.worker_benchmark import run_worker_benchmark, build_paths, sample_vm_ips
+    
+    username = args.username or input('Username: ').strip()
+    password = getpass('Password: ')
+    ips = [ip.strip() for ip in args.ips.split(',') if ip.strip()] if args.ips else None
+    if ips is None and '{ip}' in args.path:
+        with app.app_context():
+            ips = sample_vm_ips(args.concurrency)
+    paths = build_paths(args.path, ips)
+    if not paths:
+        print('✗ No VM IPs to request, pass --ips')
+        sys.exit(1)
+    
+    worker_classes = [w.strip() for w in args.worker_classes.split(',') if w.strip()]
+    print(f'Benchmarking {len(paths)} path(s), concurrency={args.concurrency}, requests={args.requests}, '
+          f'workers={args.workers}, threads={args.threads}')
+    report = run_worker_benchmark(
+        username, password, paths, worker_classes=worker_classes, concurrency=args.concurrency,
+        total=args.requests, workers=args.workers, threads=args.threads
+    )
+    
+    for entry in report:
+        if entry['error']:
+            print(f'✗ {entry["worker_class"]}: {entry["error"]}')
+            continue
+        print(f'✓ {entry["worker_class"]}: {entry["throughput"]} req/s, p50={entry["p50_ms"]}ms, '
+              f'p95={entry["p95_ms"]}ms, max={entry["max_ms"]}ms, errors={entry["errors"]}/{entry["requests"]}, '
+              f'duration={entry["duration"]}s')
+
 
 def main():
     try:
         parser = argparse.ArgumentParser(description='VM Control Hub CLI Manager')
-        parser.add_argument('command', choices=['createsuperuser', 'changepassword'],
-                            help='Available commands: createsuperuser, changepassword')
+        parser.add_argument('command', choices=['createsuperuser', 'changepassword', 'runscheduler', 'rebuildprojections', 'rebuildsearchindex', 'indexadvisor', 'benchworkers'],
+                            help='Available commands: createsuperuser, changepassword, runscheduler, rebuildprojections, rebuildsearchindex, indexadvisor, benchworkers')
+        # benchworkers 参数
+        parser.add_argument('--username', help='benchworkers: login username')
+        parser.add_argument('--path', default='/control_vm/status?ip={ip}&refresh=1',
+                            help='benchworkers: request path, {ip} is replaced by VM IPs')
+        parser.add_argument('--ips', help='benchworkers: comma separated VM IPs (default: sampled from the database)')
+        parser.add_argument('--worker-classes', default='sync,gthread,gevent', help='benchworkers: worker classes to compare')
+        parser.add_argument('--concurrency', type=int, default=32, help='benchworkers: concurrent client requests')
+        parser.add_argument('--requests', type=int, default=200, help='benchworkers: requests per worker class')
+        parser.add_argument('--workers', type=int, default=2, help='benchworkers: gunicorn worker processes')
+        parser.add_argument('--threads', type=int, default=8, help='benchworkers: threads per gthread worker')
         
         args = parser.parse_args()
         
@@ -97,6 +215,16 @@ def main():
             createsuperuser()
         elif args.command == 'changepassword':
             changepassword()
+        elif args.command == 'runscheduler':
+            runscheduler()
+        elif args.command == 'rebuildprojections':
+            rebuildprojections()
+        elif args.command == 'rebuildsearchindex':
+            rebuildsearchindex()
+        elif args.command == 'indexadvisor':
+            indexadvisor()
+        elif args.command == 'benchworkers':
+            benchworkers(args)
     except KeyboardInterrupt:
         print('\n✗ Operation cancelled by user')
         sys.exit(0)
@@ -8,6 +8,8 @@ let selectedIds = new Set();
 function updateUrlParams(modifier) {
   const urlParams = new URLSearchParams(window.location.search);
   modifier(urlParams);
+  // 搜索、过滤、排序变化后游标失效，回到第一页
+  urlParams.delete('cursor');
   // 不重置页码，除非是搜索或过滤操作
   if (!modifier.toString().includes('sort') && !modifier.toString().includes('order')) {
     urlParams.set('page', 1);
@@ -241,6 +243,10 @@ document.addEventListener('DOMContentLoaded', function() {
               errorHtml += '</ul>';
             }
             feedbackDiv.innerHTML = errorHtml;
+          } else if (response.status === 202 && data.data && data.data.status_url) {
+            // 大文件在后台导入，轮询任务进度
+            feedbackDiv.innerHTML = `<span class="text-blue-500">${data.message}</span>`;
+            return pollImportJob(data.data.status_url);
           } else {
             feedbackDiv.innerHTML = `<span class="text-green-500">${data.message}</span>`;
             setTimeout(() => window.location.reload(), 1500);
@@ -254,6 +260,37 @@ document.addEventListener('DOMContentLoaded', function() {
           confirmImportBtn.textContent = 'Start Import';
         });
       });
+
+      // 轮询后台导入任务，结束后返回
+      function pollImportJob(statusUrl) {
+        return new Promise(resolve => {
+          const poll = () => {
+            fetch(statusUrl)
+              .then(response => response.json())
+              .then(data => {
+                if (!data.success) {
+                  feedbackDiv.innerHTML = `<span class="text-red-500">${data.error}</span>`;
+                  resolve();
+                  return;
+                }
+                const job = data.data;
+                if (job.status === 'completed') {
+                  feedbackDiv.innerHTML = `<span class="text-green-500">Successfully imported ${job.processed} records.</span>`;
+                  setTimeout(() => window.location.reload(), 1500);
+                  resolve();
+                } else if (job.status === 'failed') {
+                  feedbackDiv.innerHTML = `<span class="text-red-500">${job.error || 'Import failed'}</span>`;
+                  resolve();
+                } else {
+                  feedbackDiv.innerHTML = `<span class="text-blue-500">Importing ${job.processed}/${job.total} records...</span>`;
+                  setTimeout(poll, 2000);
+                }
+              })
+              .catch(() => setTimeout(poll, 2000));
+          };
+          poll();
+        });
+      }
     });
   }
   